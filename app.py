@@ -6,8 +6,19 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from flask import Flask, request
-from queue import Queue
 from services.webhook import send_webhook
+from services.job_scheduler import JobScheduler, ScheduledJob
+from services.job_store import (get_job_store, current_owner, lease, find_orphaned_jobs, hold_leases,
+                                JOB_STORE_RETENTION_HOURS,
+                                JOB_STATUS_QUEUED, JOB_STATUS_RUNNING, JOB_STATUS_DONE, JOB_STATUS_FAILED,
+                                JOB_STATUS_CANCELLED)
+from services.whisper_models import preload_models
+from services.font_registry import get_font_registry
+from services import thai_tokenizer
+from services.job_context import job_context
+from services.job_control import job_scope, JobCancelled
+from app_utils import TASK_REGISTRY, task_name
+import logging
 import threading
 import uuid
 import time
@@ -15,46 +26,104 @@ from version import BUILD_NUMBER  # Import the BUILD_NUMBER
 
 MAX_QUEUE_LENGTH = int(os.environ.get('MAX_QUEUE_LENGTH', 0))
 
+# Name of the main request queue in the job store
+APP_QUEUE = "app"
+
+logger = logging.getLogger(__name__)
+
 def create_app():
     app = Flask(__name__)
 
-    # Create a queue to hold tasks
-    task_queue = Queue()
-    queue_id = id(task_queue)  # Generate a single queue_id for this worker
-
-    # Function to process tasks from the queue
-    def process_queue():
-        while True:
-            job_id, data, task_func, queue_start_time = task_queue.get()
-            queue_time = time.time() - queue_start_time
-            run_start_time = time.time()
-            pid = os.getpid()  # Get the PID of the actual processing thread
-            response = task_func()
-            run_time = time.time() - run_start_time
-            total_time = time.time() - queue_start_time
-
-            response_data = {
-                "endpoint": response[1],
-                "code": response[2],
-                "id": data.get("id"),
-                "job_id": job_id,
-                "response": response[0] if response[2] == 200 else None,
-                "message": "success" if response[2] == 200 else response[0],
-                "pid": pid,
-                "queue_id": queue_id,
-                "run_time": round(run_time, 3),
-                "queue_time": round(queue_time, 3),
-                "total_time": round(total_time, 3),
-                "queue_length": task_queue.qsize(),
-                "build_number": BUILD_NUMBER  # Add build number to response
-            }
-
-            send_webhook(data.get("webhook_url"), response_data)
-
-            task_queue.task_done()
-
-    # Start the queue processing in a separate thread
-    threading.Thread(target=process_queue, daemon=True).start()
+    # Shared job store, so job state is visible to every worker and survives restarts
+    job_store = get_job_store()
+    owner = current_owner()
+    last_purge = [0]
+
+    # Function to run a queued task and report the result to its webhook
+    def run_job(job):
+        queue_time = time.time() - job.queue_start_time
+        run_start_time = time.time()
+        pid = os.getpid()  # Get the PID of the actual processing thread
+        # Compare-and-set, because the job may have been cancelled while it was queued
+        if not job_store.update_job(job.job_id, {"status": JOB_STATUS_RUNNING, "run_start_time": run_start_time},
+                                    expected_status=JOB_STATUS_QUEUED):
+            logger.info(f"Job {job.job_id}: No longer queued, skipping")
+            return
+        try:
+            with job_context(job.job_id, job.data), job_scope(job.job_id) as control:
+                response = job.task_func()
+        except JobCancelled:
+            response = (control.reason, job.endpoint, None)
+        except Exception as e:
+            job_store.update_job(job.job_id, {"status": JOB_STATUS_FAILED, "error": str(e)})
+            raise
+        if control.cancelled.is_set():
+            # Tasks usually turn the JobCancelled error into a 500 response; report the cancellation instead
+            response = (control.reason, response[1], 504 if control.timed_out else 499)
+        run_time = time.time() - run_start_time
+        total_time = time.time() - job.queue_start_time
+
+        response_data = {
+            "endpoint": response[1],
+            "code": response[2],
+            "id": job.data.get("id"),
+            "job_id": job.job_id,
+            "response": response[0] if response[2] == 200 else None,
+            "message": "success" if response[2] == 200 else response[0],
+            "pid": pid,
+            "queue_id": queue_id,
+            "run_time": round(run_time, 3),
+            "queue_time": round(queue_time, 3),
+            "total_time": round(total_time, 3),
+            "queue_length": scheduler.qsize(),
+            "build_number": BUILD_NUMBER  # Add build number to response
+        }
+
+        if response[2] == 200:
+            status = JOB_STATUS_DONE
+        elif response[2] == 499:
+            status = JOB_STATUS_CANCELLED
+        else:
+            status = JOB_STATUS_FAILED
+        job_store.update_job(job.job_id, {"status": status, "result": response_data})
+
+        send_webhook(job.data.get("webhook_url"), response_data)
+
+        # Drop finished jobs past their retention period, at most once an hour per worker
+        if time.time() - last_purge[0] > 3600:
+            last_purge[0] = time.time()
+            job_store.purge_finished(JOB_STORE_RETENTION_HOURS * 3600,
+                                     [JOB_STATUS_DONE, JOB_STATUS_FAILED, JOB_STATUS_CANCELLED])
+
+    # Re-queue jobs left behind by workers that have exited (restart, crash or scale down)
+    def recover_jobs():
+        for record in find_orphaned_jobs(job_store, APP_QUEUE, [JOB_STATUS_QUEUED, JOB_STATUS_RUNNING]):
+            job_id = record["job_id"]
+            # Compare-and-set on the old owner so only one worker takes over each job
+            if not job_store.update_job(job_id, dict(lease(owner), status=JOB_STATUS_QUEUED),
+                                        expected_owner=record.get("owner")):
+                continue
+
+            if record.get("cancel_requested"):
+                job_store.update_job(job_id, {"status": JOB_STATUS_CANCELLED, "error": "Job cancelled by user"})
+                continue
+
+            task = TASK_REGISTRY.get(record.get("task"))
+            if task is None:
+                logger.error(f"Job {job_id}: Cannot recover, unknown task {record.get('task')}")
+                job_store.update_job(job_id, {"status": JOB_STATUS_FAILED, "error": "Task no longer available"})
+                continue
+
+            data = record.get("data") or {}
+            logger.info(f"Job {job_id}: Recovered {record.get('status')} job for {record.get('endpoint')}")
+            scheduler.submit(ScheduledJob(job_id, record.get("endpoint"), data,
+                                          lambda task=task, job_id=job_id, data=data: task(job_id=job_id, data=data),
+                                          record.get("queue_start_time", time.time())))
+
+    # Create the scheduler that drains queued tasks on a pool of worker threads
+    scheduler = JobScheduler(run_job)
+    queue_id = id(scheduler)  # Generate a single queue_id for this worker
+    scheduler.start()
 
     # Decorator to add tasks to the queue or bypass it
     def queue_task(bypass_queue=False):
@@ -67,7 +136,14 @@ def create_app():
                 
                 if bypass_queue or 'webhook_url' not in data:
                     
-                    response = f(job_id=job_id, data=data, *args, **kwargs)
+                    try:
+                        # The client waits on the request, so only a cancellation stops it
+                        with job_context(job_id, data), job_scope(job_id, timeout=0) as control:
+                            response = f(job_id=job_id, data=data, *args, **kwargs)
+                    except JobCancelled:
+                        response = (control.reason, request.path, None)
+                    if control.cancelled.is_set():
+                        response = (control.reason, response[1], 504 if control.timed_out else 499)
                     run_time = time.time() - start_time
                     return {
                         "code": response[2],
@@ -80,11 +156,11 @@ def create_app():
                         "total_time": round(run_time, 3),
                         "pid": pid,
                         "queue_id": queue_id,
-                        "queue_length": task_queue.qsize(),
+                        "queue_length": scheduler.qsize(),
                         "build_number": BUILD_NUMBER  # Add build number to response
                     }, response[2]
                 else:
-                    if MAX_QUEUE_LENGTH > 0 and task_queue.qsize() >= MAX_QUEUE_LENGTH:
+                    if MAX_QUEUE_LENGTH > 0 and scheduler.qsize() >= MAX_QUEUE_LENGTH:
                         return {
                             "code": 429,
                             "id": data.get("id"),
@@ -92,11 +168,19 @@ def create_app():
                             "message": f"MAX_QUEUE_LENGTH ({MAX_QUEUE_LENGTH}) reached",
                             "pid": pid,
                             "queue_id": queue_id,
-                            "queue_length": task_queue.qsize(),
+                            "queue_length": scheduler.qsize(),
                             "build_number": BUILD_NUMBER  # Add build number to response
                         }, 429
                     
-                    task_queue.put((job_id, data, lambda: f(job_id=job_id, data=data, *args, **kwargs), start_time))
+                    job_store.put_job(job_id, {
+                        "status": JOB_STATUS_QUEUED,
+                        "endpoint": request.path,
+                        "task": task_name(f),
+                        "data": data,
+                        **lease(owner),
+                        "queue_start_time": start_time
+                    }, queue=APP_QUEUE)
+                    scheduler.submit(ScheduledJob(job_id, request.path, data, lambda: f(job_id=job_id, data=data, *args, **kwargs), start_time))
                     
                     return {
                         "code": 202,
@@ -106,7 +190,7 @@ def create_app():
                         "pid": pid,
                         "queue_id": queue_id,
                         "max_queue_length": MAX_QUEUE_LENGTH if MAX_QUEUE_LENGTH > 0 else "unlimited",
-                        "queue_length": task_queue.qsize(),
+                        "queue_length": scheduler.qsize(),
                         "build_number": BUILD_NUMBER  # Add build number to response
                     }, 202
             return wrapper
@@ -153,6 +237,9 @@ def create_app():
     from routes.v1.image.transform.image_to_video import v1_image_transform_video_bp
     from routes.v1.toolkit.test import v1_toolkit_test_bp
     from routes.v1.toolkit.authenticate import v1_toolkit_auth_bp
+    from routes.v1.toolkit.job_status import v1_toolkit_job_status_bp
+    from routes.v1.toolkit.job_cancel import v1_toolkit_job_cancel_bp
+    from routes.v1.toolkit.metrics import v1_toolkit_metrics_bp
     from routes.v1.code.execute.execute_python import v1_code_execute_bp
 
     app.register_blueprint(v1_ffmpeg_compose_bp)
@@ -168,8 +255,25 @@ def create_app():
     app.register_blueprint(v1_image_transform_video_bp)
     app.register_blueprint(v1_toolkit_test_bp)
     app.register_blueprint(v1_toolkit_auth_bp)
+    app.register_blueprint(v1_toolkit_job_status_bp)
+    app.register_blueprint(v1_toolkit_job_cancel_bp)
+    app.register_blueprint(v1_toolkit_metrics_bp)
     app.register_blueprint(v1_code_execute_bp)
 
+    # All queued task functions are registered now that the blueprints are imported
+    recover_jobs()
+    # Keep this worker's jobs owned while it runs, and take over those of workers that stop
+    hold_leases(job_store, APP_QUEUE, [JOB_STATUS_QUEUED, JOB_STATUS_RUNNING], recover=recover_jobs)
+
+    # Warm up the Whisper models listed in WHISPER_PRELOAD without delaying startup
+    threading.Thread(target=preload_models, name="whisper-preload", daemon=True).start()
+
+    # Index the installed fonts in the background, so requests never scan the font directories
+    threading.Thread(target=get_font_registry, name="font-registry", daemon=True).start()
+
+    # Load the Thai word dictionary before the first caption job needs it
+    threading.Thread(target=thai_tokenizer.warm_up, name="thai-tokenizer-warmup", daemon=True).start()
+
     return app
 
 app = create_app()
@@ -2,14 +2,28 @@ from flask import request, jsonify, current_app
 from functools import wraps
 import jsonschema
 
+# Optional fields accepted by every endpoint, in addition to its own schema
+COMMON_FIELDS_SCHEMA = {
+    # Receives ffmpeg progress updates while the job runs
+    "progress_webhook_url": {"type": "string", "format": "uri"}
+}
+
 def validate_payload(schema):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             if not request.json:
                 return jsonify({"message": "Missing JSON in request"}), 400
+            payload = request.json
+            common = {}
+            if isinstance(payload, dict):
+                # Fields every endpoint accepts are validated here rather than in each schema
+                common = {k: v for k, v in payload.items() if k in COMMON_FIELDS_SCHEMA}
+                payload = {k: v for k, v in payload.items() if k not in COMMON_FIELDS_SCHEMA}
             try:
-                jsonschema.validate(instance=request.json, schema=schema)
+                for field, value in common.items():
+                    jsonschema.validate(instance=value, schema=COMMON_FIELDS_SCHEMA[field])
+                jsonschema.validate(instance=payload, schema=schema)
             except jsonschema.exceptions.ValidationError as validation_error:
                 return jsonify({"message": f"Invalid payload: {validation_error.message}"}), 400
             
@@ -17,8 +31,15 @@ def validate_payload(schema):
         return decorated_function
     return decorator
 
+# Queued task functions by name, so jobs persisted in the job store can be resumed after a restart
+TASK_REGISTRY = {}
+
+def task_name(f):
+    return f"{f.__module__}.{f.__qualname__}"
+
 def queue_task_wrapper(bypass_queue=False):
     def decorator(f):
+        TASK_REGISTRY[task_name(f)] = f
         def wrapper(*args, **kwargs):
             return current_app.queue_task(bypass_queue=bypass_queue)(f)(*args, **kwargs)
         return wrapper
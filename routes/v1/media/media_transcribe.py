@@ -4,7 +4,7 @@ import logging
 import os
 from services.v1.media.media_transcribe import process_transcribe_media
 from services.authentication import authenticate
-from services.cloud_storage import upload_file
+from services.cloud_storage import upload_files_concurrently
 
 v1_media_transcribe_bp = Blueprint('v1_media_transcribe', __name__)
 logger = logging.getLogger(__name__)
@@ -57,48 +57,24 @@ def transcribe(job_id, data):
             "segments_url": None,
         }
 
-        # Upload text file if it was generated
-        if include_text and result[0]:
-            try:
-                # Generate a destination path with a unique name
-                import uuid
-                filename = os.path.basename(result[0])
-                destination_path = f"transcriptions/{job_id}/{filename}"
-                cloud_urls["text_url"] = upload_file(result[0])
-                logger.info(f"Job {job_id}: Text file uploaded to cloud: {cloud_urls['text_url']}")
+        # Upload the generated files at the same time
+        outputs = [
+            (kind, path) for kind, include, path in (
+                ("text", include_text, result[0]),
+                ("srt", include_srt, result[1]),
+                ("segments", include_segments, result[2]),
+            ) if include and path
+        ]
+        urls = upload_files_concurrently([(path, None) for _, path in outputs], job_id)
+        for (kind, path), url in zip(outputs, urls):
+            if url:
+                cloud_urls[f"{kind}_url"] = url
+                logger.info(f"Job {job_id}: {kind} file uploaded to cloud: {url}")
                 # Keep the local file path for direct response type
-                cloud_urls["text"] = result[0] if response_type == "direct" else None
-            except Exception as e:
-                logger.error(f"Job {job_id}: Failed to upload text file to cloud: {str(e)}")
-                cloud_urls["text"] = result[0]
-
-        # Upload SRT file if it was generated
-        if include_srt and result[1]:
-            try:
-                # Generate a destination path with a unique name
-                filename = os.path.basename(result[1])
-                destination_path = f"transcriptions/{job_id}/{filename}"
-                cloud_urls["srt_url"] = upload_file(result[1])
-                logger.info(f"Job {job_id}: SRT file uploaded to cloud: {cloud_urls['srt_url']}")
-                # Keep the local file path for direct response type
-                cloud_urls["srt"] = result[1] if response_type == "direct" else None
-            except Exception as e:
-                logger.error(f"Job {job_id}: Failed to upload SRT file to cloud: {str(e)}")
-                cloud_urls["srt"] = result[1]
-
-        # Upload segments file if it was generated
-        if include_segments and result[2]:
-            try:
-                # Generate a destination path with a unique name
-                filename = os.path.basename(result[2])
-                destination_path = f"transcriptions/{job_id}/{filename}"
-                cloud_urls["segments_url"] = upload_file(result[2])
-                logger.info(f"Job {job_id}: Segments file uploaded to cloud: {cloud_urls['segments_url']}")
-                # Keep the local file path for direct response type
-                cloud_urls["segments"] = result[2] if response_type == "direct" else None
-            except Exception as e:
-                logger.error(f"Job {job_id}: Failed to upload segments file to cloud: {str(e)}")
-                cloud_urls["segments"] = result[2]
+                cloud_urls[kind] = path if response_type == "direct" else None
+            else:
+                logger.error(f"Job {job_id}: Failed to upload {kind} file to cloud")
+                cloud_urls[kind] = path
 
         # Clean up temporary files if not needed for direct response
         if response_type != "direct":
@@ -0,0 +1,51 @@
+import logging
+from flask import Blueprint
+from services.authentication import authenticate
+from services.job_store import get_job_store, JOB_STATUS_QUEUED, JOB_STATUS_RUNNING, JOB_STATUS_CANCELLED
+from services.job_control import request_cancel, cancel_running_job, CANCEL_REASON_USER
+from app_utils import validate_payload, queue_task_wrapper
+
+v1_toolkit_job_cancel_bp = Blueprint('v1_toolkit_job_cancel', __name__)
+logger = logging.getLogger(__name__)
+
+@v1_toolkit_job_cancel_bp.route('/v1/toolkit/job', methods=['DELETE'])
+@authenticate
+@validate_payload({
+    "type": "object",
+    "properties": {
+        "job_id": {"type": "string"}
+    },
+    "required": ["job_id"],
+    "additionalProperties": False
+})
+@queue_task_wrapper(bypass_queue=True)
+def cancel_job(job_id, data):
+    requested_job_id = data['job_id']
+    logger.info(f"Job {job_id}: Cancelling job {requested_job_id}")
+
+    try:
+        job_store = get_job_store()
+        record = job_store.get_job(requested_job_id)
+        if record is None:
+            # Requests without a webhook_url are not recorded, but may run in this worker
+            if cancel_running_job(requested_job_id):
+                return {"job_id": requested_job_id, "status": "cancelling"}, "/v1/toolkit/job", 200
+            return f"Job {requested_job_id} not found", "/v1/toolkit/job", 404
+
+        # A queued job is cancelled before it starts; compare-and-set in case it starts right now
+        if record.get('status') == JOB_STATUS_QUEUED and job_store.update_job(
+                requested_job_id, {"status": JOB_STATUS_CANCELLED, "error": CANCEL_REASON_USER},
+                expected_status=JOB_STATUS_QUEUED):
+            return {"job_id": requested_job_id, "status": JOB_STATUS_CANCELLED}, "/v1/toolkit/job", 200
+
+        record = job_store.get_job(requested_job_id) or record
+        if record.get('status') == JOB_STATUS_RUNNING:
+            # The worker running the job stops its ffmpeg and Whisper work and reports the cancellation
+            request_cancel(requested_job_id)
+            return {"job_id": requested_job_id, "status": "cancelling"}, "/v1/toolkit/job", 200
+
+        return f"Job {requested_job_id} has already finished with status {record.get('status')}", "/v1/toolkit/job", 409
+
+    except Exception as e:
+        logger.error(f"Job {job_id}: Error cancelling job - {str(e)}")
+        return str(e), "/v1/toolkit/job", 500
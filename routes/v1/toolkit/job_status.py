@@ -0,0 +1,37 @@
+import logging
+from flask import Blueprint
+from services.authentication import authenticate
+from services.job_store import get_job_store
+from app_utils import validate_payload, queue_task_wrapper
+
+v1_toolkit_job_status_bp = Blueprint('v1_toolkit_job_status', __name__)
+logger = logging.getLogger(__name__)
+
+@v1_toolkit_job_status_bp.route('/v1/toolkit/job/status', methods=['POST'])
+@authenticate
+@validate_payload({
+    "type": "object",
+    "properties": {
+        "job_id": {"type": "string"}
+    },
+    "required": ["job_id"],
+    "additionalProperties": False
+})
+@queue_task_wrapper(bypass_queue=True)
+def get_job_status(job_id, data):
+    requested_job_id = data['job_id']
+    logger.info(f"Job {job_id}: Looking up status of job {requested_job_id}")
+
+    try:
+        record = get_job_store().get_job(requested_job_id)
+        if record is None:
+            return f"Job {requested_job_id} not found", "/v1/toolkit/job/status", 404
+
+        # The original request payload can contain credentials, so it is not returned
+        record.pop('data', None)
+        record.pop('params', None)
+        return record, "/v1/toolkit/job/status", 200
+
+    except Exception as e:
+        logger.error(f"Job {job_id}: Error getting job status - {str(e)}")
+        return str(e), "/v1/toolkit/job/status", 500
@@ -0,0 +1,26 @@
+import logging
+from flask import Blueprint
+from services.authentication import authenticate
+from services import http_client
+from services.webhook import dispatcher
+from services import media_probe
+from services import thai_tokenizer
+from services.v1.media import transcription_cache
+from app_utils import queue_task_wrapper
+
+v1_toolkit_metrics_bp = Blueprint('v1_toolkit_metrics', __name__)
+logger = logging.getLogger(__name__)
+
+@v1_toolkit_metrics_bp.route('/v1/toolkit/metrics', methods=['GET'])
+@authenticate
+@queue_task_wrapper(bypass_queue=True)
+def get_metrics(job_id, data):
+    logger.info(f"Job {job_id}: Collecting metrics")
+
+    return {
+        "http": http_client.get_metrics(),
+        "webhooks": dispatcher.get_metrics(),
+        "probe_cache": media_probe.get_metrics(),
+        "thai_token_cache": thai_tokenizer.get_metrics(),
+        "transcription_cache": transcription_cache.get_metrics()
+    }, "/v1/toolkit/metrics", 200
@@ -18,7 +18,7 @@ def test_api(job_id, data):
     
     try:
         # Create test file
-        test_filename = os.path.join(STORAGE_PATH, "success.txt")
+        test_filename = os.path.join(STORAGE_PATH, f"{job_id}_success.txt")
         with open(test_filename, 'w') as f:
             f.write("You have successfully installed the NCA Toolkit API, great job!")
         
@@ -4,7 +4,7 @@ import json
 import logging
 import uuid
 from services.v1.media.openai_transcribe import transcribe_with_openai
-from services.cloud_storage import upload_to_cloud_storage
+from services.cloud_storage import upload_files_concurrently
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -90,22 +90,20 @@ def openai_auto_caption():
             file_uuid = str(uuid.uuid4())
             srt_filename = os.path.basename(srt_path)
             srt_cloud_path = f"subtitles/{file_uuid}_{srt_filename}"
+            text_cloud_path = f"transcriptions/{file_uuid}_{os.path.basename(text_path)}"
+            segments_cloud_path = f"segments/{file_uuid}_{os.path.basename(segments_path)}"
             
-            # Upload the SRT file to cloud storage
-            logger.info(f"Uploading SRT file to cloud storage: {srt_cloud_path}")
-            srt_cloud_url = upload_to_cloud_storage(srt_path, srt_cloud_path)
+            # Upload the SRT, text and segments files to cloud storage at the same time
+            logger.info(f"Uploading SRT, text and segments files to cloud storage: {srt_cloud_path}")
+            srt_cloud_url, text_cloud_url, segments_cloud_url = upload_files_concurrently([
+                (srt_path, srt_cloud_path),
+                (text_path, text_cloud_path),
+                (segments_path, segments_cloud_path)
+            ])
+            if not (srt_cloud_url and text_cloud_url and segments_cloud_url):
+                raise Exception("One or more files could not be uploaded")
             logger.info(f"SRT file uploaded to cloud storage: {srt_cloud_url}")
-            
-            # Upload the text file to cloud storage as well
-            text_filename = os.path.basename(text_path)
-            text_cloud_path = f"transcriptions/{file_uuid}_{text_filename}"
-            text_cloud_url = upload_to_cloud_storage(text_path, text_cloud_path)
             logger.info(f"Text file uploaded to cloud storage: {text_cloud_url}")
-            
-            # Upload the segments file to cloud storage as well
-            segments_filename = os.path.basename(segments_path)
-            segments_cloud_path = f"segments/{file_uuid}_{segments_filename}"
-            segments_cloud_url = upload_to_cloud_storage(segments_path, segments_cloud_path)
             logger.info(f"Segments file uploaded to cloud storage: {segments_cloud_url}")
             
             # Load segments data
@@ -12,7 +12,7 @@ from services.file_management import download_file
 from services.v1.transcription.replicate_whisper import transcribe_with_replicate
 from services.v1.media.script_enhanced_subtitles import enhance_subtitles_from_segments
 from services.v1.video.caption_video import add_subtitles_to_video
-from services.cloud_storage import upload_to_cloud_storage
+from services.cloud_storage import upload_files_concurrently
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -214,32 +214,28 @@ def process_replicate_auto_caption(video_url, script_text, language="en", settin
             logger.error(f"Error adding subtitles to video: {str(e)}")
             raise ValueError(f"Error adding subtitles to video: {str(e)}")
         
-        # Step 6: Upload the captioned video to cloud storage
+        # Step 6: Upload the captioned video, and the SRT file if requested, to cloud storage at the same time
         logger.info(f"Job {job_id}: Uploading captioned video to cloud storage")
-        
-        try:
-            # Use a UUID for the filename to avoid collisions
-            file_uuid = str(uuid.uuid4())
-            cloud_path = f"videos/captioned/{file_uuid}_{os.path.basename(captioned_video_path)}"
-            output_video_url = upload_to_cloud_storage(captioned_video_path, cloud_path)
-            logger.info(f"Job {job_id}: Captioned video uploaded to cloud storage: {output_video_url}")
-        except Exception as e:
-            logger.error(f"Job {job_id}: Failed to upload captioned video to cloud storage: {str(e)}")
-            raise ValueError(f"Failed to upload captioned video: {str(e)}")
-        
-        # Step 7: Upload SRT file to cloud storage if requested
         include_srt = settings_obj.get("include_srt", False)
         srt_cloud_url = None
         
+        # Use a UUID for the filenames to avoid collisions
+        uploads = [(captioned_video_path, f"videos/captioned/{uuid.uuid4()}_{os.path.basename(captioned_video_path)}")]
         if srt_path and include_srt:
-            try:
-                file_uuid = str(uuid.uuid4())
-                srt_cloud_path = f"subtitles/{file_uuid}_{os.path.basename(srt_path)}"
-                srt_cloud_url = upload_to_cloud_storage(srt_path, srt_cloud_path)
+            uploads.append((srt_path, f"subtitles/{uuid.uuid4()}_{os.path.basename(srt_path)}"))
+        cloud_urls = upload_files_concurrently(uploads, job_id)
+        
+        output_video_url = cloud_urls[0]
+        if not output_video_url:
+            raise ValueError("Failed to upload captioned video")
+        logger.info(f"Job {job_id}: Captioned video uploaded to cloud storage: {output_video_url}")
+        
+        # Step 7: Report the SRT file
+        if len(cloud_urls) > 1:
+            srt_cloud_url = cloud_urls[1]
+            if srt_cloud_url:
                 logger.info(f"Job {job_id}: Successfully uploaded SRT to cloud storage: {srt_cloud_url}")
-            except Exception as e:
-                logger.error(f"Job {job_id}: Failed to upload SRT to cloud storage: {str(e)}")
-                logger.error(traceback.format_exc())
+            else:
                 # Fall back to local file path if upload fails
                 srt_cloud_url = f"file://{srt_path}"
         
@@ -11,7 +11,6 @@ import shutil
 import uuid
 import sys
 import re
-import subprocess
 
 from services.v1.media.transcribe import transcribe_with_whisper
 from services.v1.media.script_enhanced_subtitles import enhance_subtitles_from_segments
@@ -388,23 +387,16 @@ def process_script_enhanced_auto_caption(video_url, script_text, language="en",
         padding_right = settings.get("padding_right", padding)
         padding_color = settings.get("padding_color", "white")
         
-        if padding_top > 0 or padding_bottom > 0 or padding_left > 0 or padding_right > 0:
-            logger.info(f"Job {job_id}: Applying padding - top: {padding_top}, bottom: {padding_bottom}, left: {padding_left}, right: {padding_right}, color: {padding_color}")
-            padded_video_path = apply_padding_to_video(
-                downloaded_video_path,
-                padding_top=padding_top,
-                padding_bottom=padding_bottom,
-                padding_left=padding_left,
-                padding_right=padding_right,
-                padding_color=padding_color,
-                job_id=job_id
-            )
-            
-            if padded_video_path:
-                logger.info(f"Job {job_id}: Padding applied successfully, new video path: {padded_video_path}")
-                downloaded_video_path = padded_video_path
-            else:
-                logger.warning(f"Job {job_id}: Failed to apply padding, using original video")
+        # Padding is applied in the same ffmpeg pass that burns in the subtitles
+        padding_filter = build_padding_filter(
+            padding_top=padding_top,
+            padding_bottom=padding_bottom,
+            padding_left=padding_left,
+            padding_right=padding_right,
+            padding_color=padding_color
+        )
+        if padding_filter:
+            logger.info(f"Job {job_id}: Padding - top: {padding_top}, bottom: {padding_bottom}, left: {padding_left}, right: {padding_right}, color: {padding_color}")
         
         # Transcribe the video or audio
         logger.info(f"Job {job_id}: Starting transcription with {transcription_tool}")
@@ -563,6 +555,7 @@ def process_script_enhanced_auto_caption(video_url, script_text, language="en",
             "video_path": downloaded_video_path,
             "subtitle_path": ass_path, 
             "output_path": output_path, # Now guaranteed to be non-empty
+            "video_filters": padding_filter,
         }
         logger.info(f"Job {job_id}: Parameters for add_subtitles_to_video: {{'video_path': '{downloaded_video_path}', 'subtitle_path': '{ass_path}', 'output_path': '{output_path}'}}")
 
@@ -597,39 +590,31 @@ def process_script_enhanced_auto_caption(video_url, script_text, language="en",
             "transcription_tool": transcription_tool if not script_text else None # Indicate tool only if used
         }
         
-        # If we need to upload to cloud storage
-        try:
-            from services.cloud_storage import upload_to_cloud_storage
-            # Use a UUID for the filename to avoid collisions
-            file_uuid = str(uuid.uuid4())
-            cloud_path = f"captioned_videos/{file_uuid}_{os.path.basename(output_video_path)}"
-            cloud_url = upload_to_cloud_storage(output_video_path, cloud_path)
-            
-            # Log the upload success
+        # Upload the video and, if requested, the SRT to cloud storage at the same time
+        from services.cloud_storage import upload_files_concurrently
+        # Use a UUID for the filenames to avoid collisions
+        uploads = [(output_video_path, f"captioned_videos/{uuid.uuid4()}_{os.path.basename(output_video_path)}")]
+        upload_srt = bool(srt_path and include_srt)
+        if upload_srt:
+            uploads.append((srt_path, f"subtitles/{uuid.uuid4()}_{os.path.basename(srt_path)}"))
+        cloud_urls = upload_files_concurrently(uploads, job_id)
+
+        cloud_url = cloud_urls[0]
+        if cloud_url:
             logger.info(f"Job {job_id}: Successfully uploaded video to cloud storage: {cloud_url}")
-            
             # Update the response with the cloud URL
             response["response"][0]["file_url"] = cloud_url
-        except Exception as e:
-            logger.error(f"Job {job_id}: Failed to upload captioned video to cloud storage: {str(e)}")
-            logger.error(f"Job {job_id}: {traceback.format_exc()}")
+        elif response_type != "local":
             # Fall back to local file path if upload fails
-            if response_type != "local":
-                response["response"][0]["file_url"] = f"file://{output_video_path}"
+            response["response"][0]["file_url"] = f"file://{output_video_path}"
         
         # Add SRT URL to the response only if explicitly requested
-        if srt_path and include_srt:
-            try:
-                from services.cloud_storage import upload_to_cloud_storage
-                # Use a UUID for the filename to avoid collisions
-                file_uuid = str(uuid.uuid4())
-                srt_cloud_path = f"subtitles/{file_uuid}_{os.path.basename(srt_path)}"
-                srt_cloud_url = upload_to_cloud_storage(srt_path, srt_cloud_path)
+        if upload_srt:
+            srt_cloud_url = cloud_urls[1]
+            if srt_cloud_url:
                 logger.info(f"Job {job_id}: Successfully uploaded SRT to cloud storage: {srt_cloud_url}")
                 response["srt_url"] = srt_cloud_url
-            except Exception as e:
-                logger.error(f"Job {job_id}: Failed to upload SRT to cloud storage: {str(e)}")
-                logger.error(f"Job {job_id}: {traceback.format_exc()}")
+            else:
                 # Fall back to local file path if upload fails
                 response["srt_url"] = f"file://{srt_path}"
         
@@ -661,66 +646,23 @@ def process_script_enhanced_auto_caption(video_url, script_text, language="en",
             except Exception as e:
                 logger.warning(f"Job {job_id}: Failed to clean up temporary directory: {str(e)}")
 
-def apply_padding_to_video(video_path, padding_top=0, padding_bottom=0, padding_left=0, padding_right=0, padding_color="white", job_id=None):
+def build_padding_filter(padding_top=0, padding_bottom=0, padding_left=0, padding_right=0, padding_color="white"):
     """
-    Apply padding to a video.
+    Build the ffmpeg pad filter for the given padding.
     
     Args:
-        video_path: Path to the video file
         padding_top: Top padding in pixels
         padding_bottom: Bottom padding in pixels
         padding_left: Left padding in pixels
         padding_right: Right padding in pixels
         padding_color: Color of the padding
-        job_id: Unique identifier for the job
         
     Returns:
-        Path to the padded video
+        The pad filter, or None if there is no padding
     """
-    logger.info(f"Job {job_id}: Applying padding to video: {video_path}")
-    logger.info(f"Job {job_id}: Padding values: Top={padding_top}, Bottom={padding_bottom}, Left={padding_left}, Right={padding_right}")
-    logger.info(f"Job {job_id}: Padding color: {padding_color}")
-    
-    # Create output path
-    output_path = f"/tmp/{uuid.uuid4()}_padded.mp4"
-    logger.info(f"Job {job_id}: Output path: {output_path}")
-    
-    # Get video dimensions
-    video_info = get_video_info(video_path)
-    width = int(video_info.get("width", 1280))
-    height = int(video_info.get("height", 720))
-    logger.info(f"Job {job_id}: Original video dimensions: {width}x{height}")
+    if not (padding_top > 0 or padding_bottom > 0 or padding_left > 0 or padding_right > 0):
+        return None
     
-    # Calculate new dimensions
-    new_width = width + padding_left + padding_right
-    new_height = height + padding_top + padding_bottom
-    logger.info(f"Job {job_id}: New video dimensions: {new_width}x{new_height}")
-    
-    # Create FFmpeg command
-    ffmpeg_cmd = [
-        "ffmpeg", "-y",
-        "-i", video_path,
-        "-vf", f"pad={new_width}:{new_height}:{padding_left}:{padding_top}:color={padding_color}",
-        "-c:v", "libx264", "-crf", "18",
-        "-c:a", "copy",
-        output_path
-    ]
-    
-    # Execute FFmpeg command
-    logger.info(f"Job {job_id}: Executing FFmpeg command: {' '.join(ffmpeg_cmd)}")
-    try:
-        result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True, check=True)
-        logger.info(f"Job {job_id}: FFmpeg command executed successfully")
-        logger.debug(f"Job {job_id}: FFmpeg stdout: {result.stdout}")
-        
-        # Check if output file exists
-        if os.path.exists(output_path):
-            logger.info(f"Job {job_id}: Padded video created successfully: {output_path}")
-            return output_path
-        else:
-            logger.error(f"Job {job_id}: Padded video was not created: {output_path}")
-            raise FileNotFoundError(f"Padded video was not created: {output_path}")
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Job {job_id}: Error executing FFmpeg command: {e}")
-        logger.error(f"Job {job_id}: FFmpeg stderr: {e.stderr}")
-        raise Exception(f"Error applying padding to video: {e.stderr}")
\ No newline at end of file
+    # Sizes relative to the input, so the video does not have to be probed first
+    return (f"pad=iw+{padding_left + padding_right}:ih+{padding_top + padding_bottom}:"
+            f"{padding_left}:{padding_top}:color={padding_color}")
\ No newline at end of file
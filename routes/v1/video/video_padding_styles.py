@@ -5,19 +5,12 @@ import re
 from flask import Blueprint, request, jsonify
 from services.v1.ffmpeg.ffmpeg_compose import process_ffmpeg_compose
 from services.file_management import get_temp_file_path
+from services.font_registry import get_font_registry, find_font_path
+from services.thai_tokenizer import tokenize, PYTHAINLP_AVAILABLE
 import uuid
 
 logger = logging.getLogger(__name__)
 
-try:
-    import pythainlp
-    from pythainlp.tokenize import word_tokenize
-    PYTHAINLP_AVAILABLE = True
-    logger.info("PyThaiNLP is available for Thai word segmentation")
-except ImportError:
-    PYTHAINLP_AVAILABLE = False
-    logger.warning("PyThaiNLP not available. Falling back to basic Thai text splitting.")
-
 v1_video_padding_styles_bp = Blueprint('v1_video_padding_styles', __name__)
 
 def is_thai(text):
@@ -41,7 +34,7 @@ def split_thai_text(text, num_lines):
     if PYTHAINLP_AVAILABLE:
         try:
             # Tokenize the text into words
-            words = word_tokenize(text, engine='newmm')
+            words = tokenize(text)
             
             # Calculate words per line
             words_per_line = max(1, len(words) // num_lines)
@@ -324,6 +317,12 @@ def process_video_padding_styles():
         # Add title text if provided
         if title_text:
             logger.info(f"Job {job_id}: Processing title text: '{title_text}'")
+            # Resolve the font file once; unknown names fall back to the default Thai font
+            font_path = find_font_path(font_name)
+            if not font_path:
+                thai_font = get_font_registry().default_font("thai")
+                font_path = thai_font.path if thai_font else f"/usr/share/fonts/truetype/thai-tlwg/{font_name}.ttf"
+                logger.warning(f"Job {job_id}: Font {font_name} not found, using {font_path}")
             # Process title text for better line breaks using server-side function
             lines = smart_text_layout(title_text, input_width, padding_top, font_size)
             logger.info(f"Job {job_id}: Split title into {len(lines)} lines: {lines}")
@@ -367,7 +366,7 @@ def process_video_padding_styles():
                     # For 3D effect, we need to add multiple drawtext filters
                     logger.info(f"Job {job_id}: Using 3D text style for line {i+1}")
                     filter_complex += f",drawtext=text='{escaped_line}':" + \
-                        f"fontfile=/usr/share/fonts/truetype/thai-tlwg/{font_name}.ttf:" + \
+                        f"fontfile={font_path}:" + \
                         f"fontsize={font_size}:fontcolor={border_color}:" + \
                         f"x={position_x}+1:y={y_start + i * line_height}+1"
                     
@@ -377,7 +376,7 @@ def process_video_padding_styles():
                     text_effect = f":fontcolor={font_color}:bordercolor={border_color}:borderw={border_w}"
                 
                 filter_complex += f",drawtext=text='{escaped_line}':" + \
-                    f"fontfile=/usr/share/fonts/truetype/thai-tlwg/{font_name}.ttf:" + \
+                    f"fontfile={font_path}:" + \
                     f"fontsize={font_size}{text_effect}:" + \
                     f"x={position_x}:y={y_start + i * line_height}"
         
@@ -1,21 +1,20 @@
 import os
-import subprocess
-from services.file_management import download_file
+from services.file_management import MediaInput, get_job_file_path
+from services.ffmpeg_runner import run_ffmpeg
+from services.media_probe import probe_media
 
 STORAGE_PATH = "/tmp/"
 
 def get_duration(file_path):
-    cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', file_path]
-    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    return float(result.stdout)
+    return float(probe_media(file_path).duration)
 
 def process_audio_mixing(video_url, audio_url, video_vol, audio_vol, output_length, job_id, webhook_url=None):
-    video_path = download_file(video_url, STORAGE_PATH)
-    audio_path = download_file(audio_url, STORAGE_PATH)
+    video_input = MediaInput(video_url, get_job_file_path(job_id, video_url))
+    audio_input = MediaInput(audio_url, get_job_file_path(f"{job_id}_audio", audio_url))
     output_path = os.path.join(STORAGE_PATH, f"{job_id}.mp4")
 
-    video_duration = get_duration(video_path)
-    audio_duration = get_duration(audio_path)
+    video_duration = get_duration(video_input.source)
+    audio_duration = get_duration(audio_input.source)
 
     # Explicitly set output duration based on output_length
     output_duration = video_duration if output_length == 'video' else audio_duration
@@ -24,10 +23,10 @@ def process_audio_mixing(video_url, audio_url, video_vol, audio_vol, output_leng
     cmd = ['ffmpeg', '-y']
 
     # Input video
-    cmd.extend(['-i', video_path])
+    cmd.extend(video_input.input_args())
 
     # Input audio
-    cmd.extend(['-i', audio_path])
+    cmd.extend(audio_input.input_args())
 
     # Video settings
     if output_length == 'audio' and audio_duration > video_duration:
@@ -57,10 +56,10 @@ def process_audio_mixing(video_url, audio_url, video_vol, audio_vol, output_leng
     cmd.append(output_path)
 
     # Run FFmpeg command
-    subprocess.run(cmd, check=True)
+    run_ffmpeg(cmd, job_id=job_id, duration=output_duration, label="audio_mixing")
 
     # Clean up input files
-    os.remove(video_path)
-    os.remove(audio_path)
+    video_input.cleanup()
+    audio_input.cleanup()
 
     return output_path
\ No newline at end of file
@@ -1,9 +1,9 @@
 import os
 import ffmpeg
 import logging
-import requests
+from services import http_client
 import subprocess
-from services.file_management import download_file
+from services.file_management import download_file, get_job_file_path
 
 # Set the default local storage directory
 STORAGE_PATH = "/tmp/"
@@ -90,7 +90,7 @@ def process_captioning(file_url, caption_srt, caption_type, options, job_id):
     """Process video captioning using FFmpeg."""
     try:
         logger.info(f"Job {job_id}: Starting download of file from {file_url}")
-        video_path = download_file(file_url, STORAGE_PATH)
+        video_path = download_file(file_url, get_job_file_path(job_id, file_url))
         logger.info(f"Job {job_id}: File downloaded to {video_path}")
 
         subtitle_extension = '.' + caption_type
@@ -115,7 +115,7 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
         if caption_srt.startswith("https"):
             # Download the file if caption_srt is a URL
             logger.info(f"Job {job_id}: Downloading caption file from {caption_srt}")
-            response = requests.get(caption_srt)
+            response = http_client.get(caption_srt)
             response.raise_for_status()  # Raise an exception for bad status codes
             if caption_type in ['srt','vtt']:
                 with open(srt_path, 'wb') as srt_file:
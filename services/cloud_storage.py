@@ -1,12 +1,21 @@
 import os
 import logging
+import threading
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from services.gcp_toolkit import upload_to_gcs
 from services.s3_toolkit import upload_to_s3
 from config import validate_env_vars
 
 logger = logging.getLogger(__name__)
 
+# Number of files uploaded at the same time by upload_files_concurrently()
+UPLOAD_WORKERS = int(os.environ.get('UPLOAD_WORKERS', 4))
+
+# The provider only depends on environment variables, so it is resolved once per process
+_provider = None
+_provider_lock = threading.Lock()
+
 class CloudStorageProvider(ABC):
     @abstractmethod
     def upload_file(self, file_path: str) -> str:
@@ -29,6 +38,13 @@ class S3CompatibleProvider(CloudStorageProvider):
         return upload_to_s3(file_path, self.endpoint_url, self.access_key, self.secret_key)
 
 def get_storage_provider() -> CloudStorageProvider:
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = _create_storage_provider()
+        return _provider
+
+def _create_storage_provider() -> CloudStorageProvider:
     storage_path = os.getenv('STORAGE_PATH', 'GCP').upper()
     
     if storage_path == 'S3':
@@ -84,4 +100,32 @@ def upload_to_cloud_storage(file_path: str, destination_path: str = None) -> str
         return url
     except Exception as e:
         logger.error(f"Error uploading file to cloud storage: {e}")
-        raise
\ No newline at end of file
+        raise
+
+def upload_files_concurrently(uploads, job_id=None) -> list:
+    """
+    Upload several files to cloud storage at the same time.
+    
+    Args:
+        uploads: List of (file_path, destination_path) tuples; destination_path may be None
+        job_id: Optional job ID for logging
+        
+    Returns:
+        List of URLs in the same order as uploads, with None for files that failed to upload
+    """
+    if not uploads:
+        return []
+
+    def upload(item):
+        file_path, destination_path = item
+        try:
+            return upload_to_cloud_storage(file_path, destination_path)
+        except Exception as e:
+            logger.error(f"Job {job_id}: Failed to upload {file_path} to cloud storage: {str(e)}")
+            return None
+
+    if len(uploads) == 1:
+        return [upload(uploads[0])]
+
+    with ThreadPoolExecutor(max_workers=min(UPLOAD_WORKERS, len(uploads))) as executor:
+        return list(executor.map(upload, uploads))
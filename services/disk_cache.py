@@ -0,0 +1,359 @@
+"""
+Content-addressed file cache on local disk.
+
+Entries are stored as files named by their key and shared by every worker
+process on the node. The cache is size bounded: once it grows past its limit
+the least recently used entries (by mtime, refreshed on every hit) are removed.
+The total size is kept as a running count in the cache directory, so the
+directory is only scanned when the count passes the limit (or has not been
+checked against the disk for SIZE_RESCAN_SECONDS).
+Cross-process locking uses fcntl.flock on lock files inside the cache directory;
+the lock file of an entry is removed together with the entry. Entries read in
+place can be pinned with a shared flock on the entry itself, which evict()
+respects.
+"""
+
+import os
+import time
+import shutil
+import fcntl
+import hashlib
+import logging
+import tempfile
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# The running size count is checked against the disk at least this often
+SIZE_RESCAN_SECONDS = 3600
+# Temp files and unused lock files older than this were left behind by crashed writers
+STALE_SECONDS = 3600
+# How often a lock(key, wait=...) caller retries a lock held by another process, in seconds
+LOCK_POLL_SECONDS = 0.5
+
+
+def hash_file(path, hasher=None):
+    """Return the sha256 hex digest of a file's contents (or feed them into hasher)."""
+    own_hasher = hasher is None
+    if own_hasher:
+        hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest() if own_hasher else None
+
+
+class DiskCache:
+    """Size-bounded LRU file cache shared between processes."""
+
+    def __init__(self, directory, max_bytes):
+        """
+        Args:
+            directory: Directory holding the cache entries
+            max_bytes: Maximum total size of the entries; 0 disables the cache
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = max_bytes > 0
+        if self.enabled:
+            os.makedirs(os.path.join(directory, 'locks'), exist_ok=True)
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _lock_path(self, name):
+        return os.path.join(self.directory, 'locks', f"{name}.lock")
+
+    @contextmanager
+    def _flock(self, name, wait=None):
+        lock_path = self._lock_path(name)
+        while True:
+            lock_file = open(lock_path, 'a')
+            try:
+                self._acquire(lock_file, wait)
+            except BaseException:
+                lock_file.close()
+                raise
+            # evict() removes the lock file of an evicted entry; if that happened while
+            # we waited, the lock is on a removed file and the current one must be locked
+            try:
+                if os.fstat(lock_file.fileno()).st_ino == os.stat(lock_path).st_ino:
+                    break
+            except FileNotFoundError:
+                pass
+            lock_file.close()
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    @staticmethod
+    def _acquire(lock_file, wait):
+        if wait is None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            return
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                wait()
+                time.sleep(LOCK_POLL_SECONDS)
+
+    @contextmanager
+    def lock(self, key, wait=None):
+        """
+        Hold an exclusive cross-process lock for a key.
+
+        Used around "check cache, compute, store" so concurrent requests for the
+        same content compute it once and the others get the cached result.
+
+        Args:
+            key: Cache key
+            wait: Function called every LOCK_POLL_SECONDS while another process
+                  holds the lock; it can raise to stop waiting
+        """
+        if not self.enabled:
+            yield
+            return
+        with self._flock(key, wait):
+            yield
+
+    def get_file(self, key, target_path):
+        """
+        Copy a cached entry to target_path.
+
+        Returns:
+            True on a cache hit, False otherwise
+        """
+        if not self.enabled:
+            return False
+        entry_path = self._entry_path(key)
+        try:
+            # Refresh the mtime so eviction treats the entry as recently used
+            os.utime(entry_path, None)
+            shutil.copyfile(entry_path, target_path)
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.warning(f"Error reading cache entry {key}: {str(e)}")
+            return False
+        return True
+
+    def get_bytes(self, key):
+        """
+        Read a cached entry.
+
+        Returns:
+            The entry's contents, or None on a cache miss
+        """
+        if not self.enabled:
+            return None
+        entry_path = self._entry_path(key)
+        try:
+            os.utime(entry_path, None)
+            with open(entry_path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Error reading cache entry {key}: {str(e)}")
+            return None
+
+    def get_path(self, key):
+        """
+        Return the path of a cached entry, to be read in place.
+
+        Returns:
+            The entry's path, or None on a cache miss
+        """
+        if not self.enabled:
+            return None
+        entry_path = self._entry_path(key)
+        try:
+            os.utime(entry_path, None)
+        except FileNotFoundError:
+            return None
+        return entry_path
+
+    def pin(self, key):
+        """
+        Open a cached entry and keep it from being evicted while the file is open.
+
+        The entry holds a shared lock until the returned file is closed (or
+        garbage collected), and evict() skips locked entries. Open the file
+        while holding lock(key), so the entry cannot be evicted before it is
+        pinned.
+
+        Returns:
+            The entry opened for binary reading, or None on a cache miss
+        """
+        if not self.enabled:
+            return None
+        entry_path = self._entry_path(key)
+        try:
+            entry_file = open(entry_path, 'rb')
+        except FileNotFoundError:
+            return None
+        fcntl.flock(entry_file, fcntl.LOCK_SH)
+        os.utime(entry_path, None)
+        return entry_file
+
+    def put(self, key, write):
+        """
+        Store the file that write(tmp_path) creates under key, then evict old entries if needed.
+
+        Returns:
+            The entry's path, or None if the cache is disabled or the entry could not be stored
+
+        Raises:
+            Any error of write() other than OSError
+        """
+        if not self.enabled:
+            return None
+        entry_path = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        tmp_path = None
+        try:
+            # Write to a temp file first so readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), prefix='.tmp-')
+            os.close(fd)
+            write(tmp_path)
+            added = os.path.getsize(tmp_path)
+            try:
+                added -= os.path.getsize(entry_path)
+            except FileNotFoundError:
+                pass
+            os.replace(tmp_path, entry_path)
+        except OSError as e:
+            logger.warning(f"Error writing cache entry {key}: {str(e)}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+        except Exception:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._add_size(added)
+        return entry_path
+
+    def put_file(self, key, source_path):
+        """Store a copy of source_path under key, then evict old entries if needed."""
+        self.put(key, lambda tmp_path: shutil.copyfile(source_path, tmp_path))
+
+    def put_bytes(self, key, data):
+        """Store data under key, then evict old entries if needed."""
+        def write(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+
+        self.put(key, write)
+
+    def _size_path(self):
+        return os.path.join(self.directory, 'size')
+
+    def _add_size(self, added):
+        """Add to the running size count, and evict once it passes max_bytes."""
+        with self._flock('evict'):
+            size_path = self._size_path()
+            try:
+                with open(size_path) as f:
+                    total = int(f.read() or 0) + added
+                stale = time.time() - os.path.getmtime(size_path) > SIZE_RESCAN_SECONDS
+            except (OSError, ValueError):
+                total, stale = None, True
+            if stale or total > self.max_bytes:
+                self._evict_locked()
+            else:
+                self._write_size(total)
+
+    def _write_size(self, total):
+        with open(self._size_path(), 'w') as f:
+            f.write(str(total))
+
+    def _remove_entry(self, path):
+        """
+        Remove an entry and its lock file, unless its key is locked or the entry is pinned.
+
+        Returns:
+            True if the entry was removed
+        """
+        lock_path = self._lock_path(os.path.basename(path))
+        with open(lock_path, 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Being read or written right now
+                return False
+            try:
+                with open(path, 'rb') as entry_file:
+                    try:
+                        fcntl.flock(entry_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        # Pinned
+                        return False
+                    os.remove(path)
+            except FileNotFoundError:
+                os.remove(lock_path)
+                return False
+            os.remove(lock_path)
+        return True
+
+    def _remove_stale_locks(self, entry_names):
+        """Remove the lock files of keys that have no entry, e.g. after failed computations."""
+        lock_dir = os.path.join(self.directory, 'locks')
+        for name in os.listdir(lock_dir):
+            if not name.endswith('.lock') or name == 'evict.lock' or name[:-5] in entry_names:
+                continue
+            lock_path = os.path.join(lock_dir, name)
+            try:
+                if time.time() - os.path.getmtime(lock_path) <= STALE_SECONDS:
+                    continue
+                with open(lock_path, 'a') as lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    os.remove(lock_path)
+            except (BlockingIOError, FileNotFoundError):
+                continue
+
+    def evict(self):
+        """Scan the cache and remove least recently used entries until it fits in max_bytes."""
+        with self._flock('evict'):
+            self._evict_locked()
+
+    def _evict_locked(self):
+        entries = []
+        total = 0
+        for root, dirs, files in os.walk(self.directory):
+            # The top level only holds the size count
+            if os.path.basename(root) == 'locks' or root == self.directory:
+                continue
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                # Leftover temp files from crashed writers
+                if name.startswith('.tmp-'):
+                    if time.time() - stat.st_mtime > STALE_SECONDS:
+                        os.remove(path)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        entries.sort()
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if self._remove_entry(path):
+                total -= size
+                removed += 1
+        if removed:
+            logger.info(f"Evicted {removed} entries from cache {self.directory}")
+
+        self._remove_stale_locks({os.path.basename(path) for _, _, path in entries})
+        self._write_size(total)
@@ -1,18 +1,18 @@
 import os
 import subprocess
 import json
-from services.file_management import download_file
+from services.file_management import MediaInput, get_job_file_path
 
 STORAGE_PATH = "/tmp/"
 
 def process_keyframe_extraction(video_url, job_id):
-    video_path = download_file(video_url, STORAGE_PATH)
+    video_input = MediaInput(video_url, get_job_file_path(job_id, video_url))
 
     # Extract keyframes
     output_pattern = os.path.join(STORAGE_PATH, f"{job_id}_%03d.jpg")
     cmd = [
         'ffmpeg',
-        '-i', video_path,
+        *video_input.input_args(),
         '-vf', f"select='eq(pict_type,I)',scale=iw*sar:ih,setsar=1",
         '-vsync', 'vfr',
         output_pattern
@@ -30,6 +30,6 @@ def process_keyframe_extraction(video_url, job_id):
             output_filenames.append(file_path)
 
     # Clean up input file
-    os.remove(video_path)
+    video_input.cleanup()
 
     return output_filenames
\ No newline at end of file
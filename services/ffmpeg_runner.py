@@ -0,0 +1,254 @@
+"""
+Shared ffmpeg runner with live progress reporting.
+
+run_ffmpeg() runs an ffmpeg command with `-progress pipe:1` and parses the
+progress blocks ffmpeg writes while it encodes: frames, fps, bitrate, speed
+factor and output position. Together with the duration of the input this gives
+a percentage and an ETA. The latest progress of a queued job is stored in its
+job record (see /v1/toolkit/job/status), and optionally posted to the job's
+progress_webhook_url.
+"""
+
+import os
+import time
+import logging
+import threading
+import subprocess
+from services.job_context import get_current_job
+from services.job_store import get_job_store
+from services.webhook import send_webhook
+from services.job_control import tracked_process, check_cancelled
+from services.media_probe import get_duration, ProbeError
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between progress updates in the job store
+FFMPEG_PROGRESS_INTERVAL = float(os.environ.get('FFMPEG_PROGRESS_INTERVAL', 5))
+# Minimum seconds between progress webhooks
+PROGRESS_WEBHOOK_INTERVAL = float(os.environ.get('PROGRESS_WEBHOOK_INTERVAL', 10))
+
+
+def probe_duration(path):
+    """Return the duration of a local media file in seconds, or None if it is unknown."""
+    if not path or not os.path.isfile(path):
+        return None
+    try:
+        return get_duration(path)
+    except ProbeError:
+        return None
+
+
+def _first_input(cmd):
+    for i, arg in enumerate(cmd[:-1]):
+        if arg == '-i':
+            return cmd[i + 1]
+    return None
+
+
+def _parse_number(value, suffix=''):
+    try:
+        return float(value.strip().rstrip(suffix))
+    except (AttributeError, ValueError):
+        return None
+
+
+class FFmpegProgress:
+    """Progress of one ffmpeg run, built from ffmpeg's -progress key=value blocks."""
+
+    def __init__(self, duration=None, label=None):
+        self.duration = duration
+        self.label = label
+        self.started_at = time.time()
+        self.frame = 0
+        self.fps = None
+        self.bitrate = None
+        self.speed = None
+        self.out_time = 0.0
+        self.finished = False
+
+    def update(self, values):
+        if 'frame' in values:
+            self.frame = int(_parse_number(values['frame']) or 0)
+        if 'fps' in values:
+            self.fps = _parse_number(values['fps'])
+        if 'bitrate' in values:
+            self.bitrate = values['bitrate'].strip() if values['bitrate'].strip() != 'N/A' else None
+        if 'speed' in values:
+            self.speed = _parse_number(values['speed'], 'x')
+        # out_time_us is in microseconds (older ffmpeg versions also call it out_time_ms)
+        out_time_us = _parse_number(values.get('out_time_us', values.get('out_time_ms')))
+        if out_time_us is not None and out_time_us >= 0:
+            self.out_time = out_time_us / 1000000
+        if values.get('progress') == 'end':
+            self.finished = True
+
+    def to_dict(self):
+        percent = None
+        eta = None
+        if self.finished:
+            percent = 100.0
+            eta = 0
+        elif self.duration:
+            percent = round(min(100.0, self.out_time / self.duration * 100), 1)
+            if self.speed:
+                eta = round(max(0.0, self.duration - self.out_time) / self.speed, 1)
+        return {
+            "step": self.label,
+            "frame": self.frame,
+            "fps": self.fps,
+            "bitrate": self.bitrate,
+            "speed": self.speed,
+            "out_time": round(self.out_time, 3),
+            "duration": round(self.duration, 3) if self.duration else None,
+            "percent": percent,
+            "eta": eta,
+            "elapsed": round(time.time() - self.started_at, 1),
+            "finished": self.finished
+        }
+
+
+class _ProgressReporter:
+    """Stores progress in the job record and sends progress webhooks, throttled."""
+
+    def __init__(self, job_id, webhook_url, request_id):
+        self.job_id = job_id
+        self.webhook_url = webhook_url
+        self.request_id = request_id
+        self.last_store = 0
+        self.last_webhook = 0
+
+    def report(self, progress, force=False):
+        now = time.time()
+        data = None
+        if self.job_id and (force or now - self.last_store >= FFMPEG_PROGRESS_INTERVAL):
+            self.last_store = now
+            data = progress.to_dict()
+            try:
+                # Only queued jobs have a record; the update is a no-op for others
+                get_job_store().update_job(self.job_id, {"progress": data})
+            except Exception as e:
+                logger.warning(f"Job {self.job_id}: Failed to store ffmpeg progress: {str(e)}")
+        if self.webhook_url and (force or now - self.last_webhook >= PROGRESS_WEBHOOK_INTERVAL):
+            self.last_webhook = now
+            send_webhook(self.webhook_url, {
+                "id": self.request_id,
+                "job_id": self.job_id,
+                "status": "progress",
+                "progress": data or progress.to_dict()
+            })
+
+
+def _reporter_for(job_id=None):
+    """Progress reporter for a job, defaulting to the job running in this thread."""
+    job = get_current_job()
+    if job_id is None and job is not None:
+        job_id = job.job_id
+    webhook_url = job.progress_webhook_url if job is not None else None
+    request_id = job.data.get('id') if job is not None else None
+    return _ProgressReporter(job_id, webhook_url, request_id)
+
+
+class SegmentedProgress:
+    """
+    Combined progress of several ffmpeg runs that encode parts of one output in parallel.
+
+    Create it in the job's thread, and pass part_callback(i) as on_progress to the
+    run_ffmpeg() call of part i.
+    """
+
+    def __init__(self, durations, label=None, job_id=None):
+        self.label = label
+        self.started_at = time.time()
+        self.parts = [FFmpegProgress(duration, label) for duration in durations]
+        self.duration = sum(durations) if all(durations) else None
+        self.reporter = _reporter_for(job_id)
+        self._lock = threading.Lock()
+
+    def combined(self):
+        progress = FFmpegProgress(self.duration, self.label)
+        progress.started_at = self.started_at
+        progress.frame = sum(part.frame for part in self.parts)
+        progress.out_time = sum(part.out_time for part in self.parts)
+        active = [part for part in self.parts if not part.finished]
+        # Parts run at the same time, so their rates add up
+        progress.fps = round(sum(part.fps or 0 for part in active), 2) if active else None
+        progress.speed = round(sum(part.speed or 0 for part in active), 3) if active else None
+        progress.finished = all(part.finished for part in self.parts)
+        return progress
+
+    def part_callback(self, index):
+        def on_progress(progress):
+            with self._lock:
+                self.parts[index] = progress
+                combined = self.combined()
+                self.reporter.report(combined, force=combined.finished)
+        return on_progress
+
+
+def run_ffmpeg(cmd, job_id=None, duration=None, label=None, on_progress=None, env=None):
+    """
+    Run an ffmpeg command and report its progress.
+
+    Args:
+        cmd: ffmpeg command as a list, starting with the ffmpeg binary
+        job_id: Job to report on; defaults to the job running in this thread
+        duration: Expected output duration in seconds, for the percentage and ETA;
+                  defaults to the duration of the first input if it is a local file
+        label: Name of this step in the progress report
+        on_progress: Optional callback that receives every FFmpegProgress update
+                     instead of it being reported on the job
+        env: Optional environment for the ffmpeg process
+
+    Returns:
+        subprocess.CompletedProcess with ffmpeg's log output in stderr
+
+    Raises:
+        subprocess.CalledProcessError: If ffmpeg exits with an error
+        JobCancelled: If the job was cancelled or timed out
+    """
+    if duration is None:
+        duration = probe_duration(_first_input(cmd))
+
+    # Machine-readable progress on stdout instead of the status line on stderr
+    full_cmd = [cmd[0], '-progress', 'pipe:1', '-nostats'] + list(cmd[1:])
+    progress = FFmpegProgress(duration, label)
+    reporter = _reporter_for(job_id) if on_progress is None else None
+
+    check_cancelled()
+    process = subprocess.Popen(full_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env)
+
+    # Drain stderr in the background so ffmpeg never blocks on a full pipe
+    stderr_lines = []
+    stderr_thread = threading.Thread(target=lambda: stderr_lines.extend(process.stderr), daemon=True)
+    stderr_thread.start()
+
+    # The process is terminated if the job is cancelled or times out
+    with tracked_process(process):
+        values = {}
+        for line in process.stdout:
+            key, sep, value = line.strip().partition('=')
+            if not sep:
+                continue
+            values[key] = value
+            if key == 'progress':
+                # One progress block is complete
+                progress.update(values)
+                values = {}
+                if on_progress is not None:
+                    on_progress(progress)
+                else:
+                    reporter.report(progress, force=progress.finished)
+
+        returncode = process.wait()
+    stderr_thread.join()
+    stderr = ''.join(stderr_lines)
+
+    if returncode != 0:
+        # Report a cancellation rather than the error of the terminated process
+        check_cancelled()
+        raise subprocess.CalledProcessError(returncode, cmd, '', stderr)
+
+    stats = progress.to_dict()
+    logger.info(f"ffmpeg {label or 'command'} finished in {stats['elapsed']}s "
+                f"({stats['frame']} frames, speed {stats['speed']}x)")
+    return subprocess.CompletedProcess(cmd, returncode, '', stderr)
@@ -1,8 +1,11 @@
 import uuid
 import requests
+from services import http_client
 import os
 import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from urllib.parse import urlparse, parse_qs
 
 # Set up logger
@@ -37,20 +40,28 @@ def get_temp_file_path(prefix="", suffix="", directory=None):
     # Return the full path
     return os.path.join(directory, filename)
 
-def download_file(url, target_path):
+def get_job_file_path(job_id, url, directory=None):
     """
-    Download a file from a URL to a specific target path.
+    Download path for a job's input: the URL's file name prefixed with the job ID,
+    so jobs that download the same URL (or another URL with the same file name)
+    at the same time never share a file.
     
     Args:
-        url: The URL to download from
-        target_path: The full path where the file should be saved or a directory
-                    where the file should be saved with its original name
+        job_id (str): Job ID (a random ID is used if None)
+        url (str): URL of the file
+        directory (str): Directory to store the file (defaults to STORAGE_PATH)
     
     Returns:
-        The path to the downloaded file
+        str: Path to download the file to
+    """
+    filename = os.path.basename(urlparse(url).path) or "input"
+    return os.path.join(directory or STORAGE_PATH, f"{job_id or uuid.uuid4()}_{filename}")
+
+def _resolve_target_path(url, target_path):
+    """
+    Resolve a download target: a directory means "save under the URL's file name".
+    Creates the target directory if needed.
     """
-    logger.info(f"Downloading file from {url}")
-    
     # Check if target_path is a directory
     if os.path.isdir(target_path):
         # Extract filename from URL
@@ -76,10 +87,27 @@ def download_file(url, target_path):
         logger.info(f"Creating directory: {target_dir}")
         os.makedirs(target_dir, exist_ok=True)
     
+    return full_path
+
+def download_file(url, target_path):
+    """
+    Download a file from a URL to a specific target path.
+    
+    Args:
+        url: The URL to download from
+        target_path: The full path where the file should be saved or a directory
+                    where the file should be saved with its original name
+    
+    Returns:
+        The path to the downloaded file
+    """
+    logger.info(f"Downloading file from {url}")
+    full_path = _resolve_target_path(url, target_path)
+    
     # Download the file
     try:
         logger.info(f"Starting download from {url}")
-        response = requests.get(url, stream=True)
+        response = http_client.get(url, stream=True)
         response.raise_for_status()
         
         file_size = int(response.headers.get('content-length', 0))
@@ -101,6 +129,120 @@ def download_file(url, target_path):
         logger.error(f"Error downloading file: {str(e)}")
         raise
 
+# Concurrent downloads used by multi-input operations
+DOWNLOAD_WORKERS = int(os.environ.get('DOWNLOAD_WORKERS', 4))
+DOWNLOAD_RETRIES = int(os.environ.get('DOWNLOAD_RETRIES', 3))
+# Limits for all files of one download_files() call; 0 means unlimited
+DOWNLOAD_MAX_BYTES = int(os.environ.get('DOWNLOAD_MAX_BYTES', 0))
+DOWNLOAD_MAX_SECONDS = int(os.environ.get('DOWNLOAD_MAX_SECONDS', 0))
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+class DownloadBudgetExceeded(Exception):
+    """Raised when a download stage goes over its size or time budget."""
+    pass
+
+class _DownloadBudget:
+    """Size and time budget shared by the downloads of one download_files() call."""
+
+    def __init__(self, max_bytes, max_seconds):
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.deadline = time.monotonic() + max_seconds if max_seconds > 0 else None
+        self.total = 0
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def consume(self, size):
+        if self.cancelled.is_set():
+            raise DownloadBudgetExceeded("Download cancelled")
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise DownloadBudgetExceeded(f"Downloads exceeded the time budget of {self.max_seconds}s")
+        with self._lock:
+            self.total += size
+            if self.max_bytes > 0 and self.total > self.max_bytes:
+                raise DownloadBudgetExceeded(f"Downloads exceeded the size budget of {self.max_bytes} bytes")
+
+def _download_with_resume(url, full_path, budget):
+    """Download url to full_path, resuming with a Range request after connection errors."""
+    downloaded = 0
+    attempt = 0
+    while True:
+        headers = {'Range': f"bytes={downloaded}-"} if downloaded else {}
+        try:
+            with http_client.get(url, stream=True, headers=headers) as response:
+                response.raise_for_status()
+                if downloaded and response.status_code != 206:
+                    # The server ignored the Range header, start over
+                    logger.info(f"Server does not support resume, restarting download of {url}")
+                    budget.consume(-downloaded)
+                    downloaded = 0
+
+                with open(full_path, 'ab' if downloaded else 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        budget.consume(len(chunk))
+                        f.write(chunk)
+                        downloaded += len(chunk)
+            return full_path
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            error = e
+        except requests.HTTPError as e:
+            # Only server errors are worth retrying
+            if e.response is None or e.response.status_code < 500:
+                raise
+            error = e
+
+        attempt += 1
+        if attempt > DOWNLOAD_RETRIES:
+            raise error
+        delay = 2 ** (attempt - 1)
+        logger.warning(f"Download of {url} failed at {downloaded} bytes ({str(error)}), retrying in {delay}s")
+        time.sleep(delay)
+
+def download_files(downloads, job_id=None, max_workers=DOWNLOAD_WORKERS,
+                   max_bytes=DOWNLOAD_MAX_BYTES, max_seconds=DOWNLOAD_MAX_SECONDS):
+    """
+    Download several files concurrently.
+    
+    Args:
+        downloads: List of (url, target_path) tuples; target_path can be a file or a directory
+        job_id: Job ID for logging
+        max_workers: Maximum number of concurrent downloads
+        max_bytes: Size budget for all downloads together (0 = unlimited)
+        max_seconds: Time budget for all downloads together (0 = unlimited)
+    
+    Returns:
+        List of downloaded file paths, in the same order as downloads
+    
+    Raises:
+        DownloadBudgetExceeded: If the size or time budget is exceeded
+    """
+    full_paths = [_resolve_target_path(url, target_path) for url, target_path in downloads]
+    budget = _DownloadBudget(max_bytes, max_seconds)
+    start_time = time.time()
+    logger.info(f"Job {job_id}: Downloading {len(downloads)} files with {max_workers} workers")
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(downloads)))) as executor:
+        futures = [executor.submit(_download_with_resume, url, full_path, budget)
+                   for (url, _), full_path in zip(downloads, full_paths)]
+        try:
+            for future in futures:
+                future.result()
+        except Exception as e:
+            # Stop the other downloads and remove what was written so far
+            budget.cancelled.set()
+            for future in futures:
+                future.cancel()
+            wait(futures)
+            for full_path in full_paths:
+                if os.path.exists(full_path):
+                    os.remove(full_path)
+            logger.error(f"Job {job_id}: Error downloading files: {str(e)}")
+            raise
+
+    logger.info(f"Job {job_id}: Downloaded {len(downloads)} files ({budget.total} bytes) in {time.time() - start_time:.1f}s")
+    return full_paths
+
 def delete_old_files():
     """
     Delete files older than 1 hour from the storage directory
@@ -120,3 +262,103 @@ def delete_old_files():
         logger.info(f"Deleted {deleted_count} old files")
     except Exception as e:
         logger.error(f"Error deleting old files: {str(e)}")
+
+# Let ffmpeg read http(s) inputs directly, so decoding overlaps with the download
+STREAM_INPUTS = os.environ.get('STREAM_INPUTS', 'true').lower() == 'true'
+
+# Input options that make ffmpeg's http reader survive dropped connections
+FFMPEG_RECONNECT_OPTIONS = {
+    'reconnect': '1',
+    'reconnect_streamed': '1',
+    'reconnect_on_network_error': '1',
+    'reconnect_delay_max': '5'
+}
+
+# Bytes fetched from the start of a file to check whether it can be streamed
+STREAM_PROBE_BYTES = 64 * 1024
+
+def _mp4_is_streamable(head):
+    """Check that the 'moov' atom of an MP4/MOV file comes before 'mdat' in the given leading bytes."""
+    offset = 0
+    while offset + 8 <= len(head):
+        size = int.from_bytes(head[offset:offset + 4], 'big')
+        atom = head[offset + 4:offset + 8]
+        if atom == b'moov':
+            return True
+        if atom == b'mdat':
+            return False
+        if size == 1:
+            # 64-bit box size
+            if offset + 16 > len(head):
+                break
+            size = int.from_bytes(head[offset + 8:offset + 16], 'big')
+        if size < 8:
+            break
+        offset += size
+    # moov not found near the start of the file
+    return False
+
+def is_streamable_url(url):
+    """
+    Check whether ffmpeg can read a URL front to back without seeking.
+
+    Only http(s) URLs qualify. MP4/MOV family files (detected from their 'ftyp'
+    atom) qualify only if their index ('moov' atom) is at the start of the file.
+    """
+    if urlparse(url).scheme not in ('http', 'https'):
+        return False
+    try:
+        response = http_client.get(url, headers={'Range': f"bytes=0-{STREAM_PROBE_BYTES - 1}"}, stream=True, timeout=15)
+        try:
+            response.raise_for_status()
+            head = response.raw.read(STREAM_PROBE_BYTES)
+        finally:
+            response.close()
+    except Exception as e:
+        logger.warning(f"Could not probe {url} for streaming, downloading instead: {str(e)}")
+        return False
+
+    if head[4:8] == b'ftyp':
+        return _mp4_is_streamable(head)
+    return True
+
+class MediaInput:
+    """
+    An ffmpeg input that is either streamed from its URL or read from a downloaded copy.
+
+    Use input_args() when building an ffmpeg command line, or source and options with
+    ffmpeg-python, and call cleanup() once ffmpeg has finished.
+    """
+
+    def __init__(self, url, target_path, stream=None):
+        """
+        Args:
+            url: The media URL
+            target_path: Where to download the file if it can't be streamed (file or directory)
+            stream: Force streaming on or off; defaults to STREAM_INPUTS and a streamability check
+        """
+        if stream is None:
+            stream = STREAM_INPUTS and is_streamable_url(url)
+
+        if stream:
+            logger.info(f"Streaming input from {url}")
+            self.source = url
+            self.options = dict(FFMPEG_RECONNECT_OPTIONS)
+            self.local_path = None
+        else:
+            self.local_path = download_file(url, target_path)
+            self.source = self.local_path
+            self.options = {}
+
+    def input_args(self):
+        """ffmpeg command line arguments for this input, including '-i'."""
+        args = []
+        for key, value in self.options.items():
+            args.extend([f"-{key}", value])
+        args.extend(['-i', self.source])
+        return args
+
+    def cleanup(self):
+        """Remove the downloaded copy, if any."""
+        if self.local_path and os.path.exists(self.local_path):
+            os.remove(self.local_path)
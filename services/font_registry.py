@@ -0,0 +1,313 @@
+"""
+Index of the installed fonts.
+
+The registry scans the repo's fonts/ directory and the system font directories
+once, reads the family, style and Unicode coverage of every TrueType/OpenType
+font from its name and OS/2 tables, and keeps dictionaries for O(1) lookups by
+family (or file name) and by script. Requests look fonts up here instead of
+globbing the font directories or calling fc-list.
+
+The directories are checked for changes at most every FONT_REGISTRY_CHECK_INTERVAL
+seconds; only added or modified files are parsed again.
+"""
+
+import os
+import time
+import struct
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+REPO_FONTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fonts')
+SYSTEM_FONT_DIRS = ['/usr/share/fonts', '/usr/local/share/fonts', os.path.expanduser('~/.fonts')]
+
+# Extra font directories, separated by ':'
+FONT_DIRS = [d for d in os.environ.get('FONT_DIRS', '').split(':') if d]
+# Minimum seconds between checks of the font directories for changes
+FONT_REGISTRY_CHECK_INTERVAL = float(os.environ.get('FONT_REGISTRY_CHECK_INTERVAL', 60))
+
+FONT_EXTENSIONS = ('.ttf', '.otf', '.ttc', '.otc')
+
+# Bits of the OS/2 ulUnicodeRange fields
+SCRIPT_RANGE_BITS = {
+    "latin": 0,        # Basic Latin
+    "greek": 7,        # Greek and Coptic
+    "cyrillic": 9,     # Cyrillic
+    "hebrew": 11,      # Hebrew
+    "arabic": 13,      # Arabic
+    "devanagari": 15,  # Devanagari
+    "thai": 24,        # Thai
+    "hangul": 56,      # Hangul Syllables
+    "cjk": 59          # CJK Unified Ideographs
+}
+
+# Preferred fonts per script, best first; other fonts covering the script follow
+PREFERRED_FAMILIES = {
+    "thai": ["Sarabun", "Noto Sans Thai", "TH Sarabun New", "Garuda", "Norasi", "Waree", "Loma", "Kinnari"],
+    "latin": ["Arial", "DejaVu Sans", "Liberation Sans", "Roboto"],
+    "cjk": ["Noto Sans CJK SC", "Noto Sans CJK JP", "Noto Sans CJK KR"],
+    "hangul": ["Noto Sans CJK KR", "Noto Sans KR", "NanumGothic"]
+}
+
+
+class FontFace:
+    """One face of a font file."""
+
+    def __init__(self, path, index, family, style, names, weight, width, italic, scripts):
+        self.path = path
+        self.index = index
+        self.family = family
+        self.style = style
+        self.names = names
+        self.weight = weight
+        self.width = width
+        self.italic = italic
+        self.scripts = scripts
+
+    @property
+    def bold(self):
+        return self.weight >= 600
+
+    def __repr__(self):
+        return f"FontFace({self.family!r}, {self.style!r}, {self.path!r})"
+
+
+def _decode_name(platform_id, raw):
+    if platform_id in (0, 3):
+        return raw.decode('utf-16-be', errors='ignore')
+    return raw.decode('mac_roman', errors='ignore')
+
+
+def _read_names(f, offset):
+    """Return {nameID: string} from the name table, preferring English Windows names."""
+    f.seek(offset)
+    _, count, string_offset = struct.unpack('>HHH', f.read(6))
+    records = [struct.unpack('>HHHHHH', f.read(12)) for _ in range(count)]
+    names = {}
+    ranks = {}
+    for platform_id, _, language_id, name_id, length, name_offset in records:
+        if name_id not in (1, 2, 4, 6, 16, 17):
+            continue
+        if platform_id == 3:
+            rank = 0 if language_id == 0x409 else 1
+        elif platform_id == 0:
+            rank = 2
+        elif platform_id == 1 and language_id == 0:
+            rank = 3
+        else:
+            continue
+        if name_id in ranks and ranks[name_id] <= rank:
+            continue
+        f.seek(offset + string_offset + name_offset)
+        value = _decode_name(platform_id, f.read(length)).strip()
+        if value:
+            names[name_id] = value
+            ranks[name_id] = rank
+    return names
+
+
+def _read_face(f, path, index, face_offset):
+    f.seek(face_offset)
+    _, num_tables = struct.unpack('>IH', f.read(6))
+    f.seek(face_offset + 12)
+    tables = {}
+    for _ in range(num_tables):
+        tag, _, offset, length = struct.unpack('>4sIII', f.read(16))
+        tables[tag] = (offset, length)
+    if b'name' not in tables:
+        return None
+
+    names = _read_names(f, tables[b'name'][0])
+    family = names.get(16) or names.get(1)
+    if not family:
+        return None
+    style = names.get(17) or names.get(2) or 'Regular'
+
+    weight, width, italic, scripts = 400, 5, 'italic' in style.lower(), set()
+    if b'OS/2' in tables and tables[b'OS/2'][1] >= 64:
+        f.seek(tables[b'OS/2'][0])
+        data = f.read(64)
+        weight, width = struct.unpack('>HH', data[4:8])
+        ranges = struct.unpack('>IIII', data[42:58])
+        fs_selection = struct.unpack('>H', data[62:64])[0]
+        italic = bool(fs_selection & 0x01) or italic
+        for script, bit in SCRIPT_RANGE_BITS.items():
+            if ranges[bit // 32] & (1 << (bit % 32)):
+                scripts.add(script)
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    aliases = {family, names.get(1), names.get(4), names.get(6), stem}
+    return FontFace(path, index, family, style, frozenset(a for a in aliases if a),
+                    weight, width, italic, frozenset(scripts))
+
+
+def read_font_faces(path):
+    """Parse the faces of a font file (a collection has several)."""
+    faces = []
+    with open(path, 'rb') as f:
+        tag = f.read(4)
+        if tag == b'ttcf':
+            f.seek(8)
+            count = struct.unpack('>I', f.read(4))[0]
+            offsets = struct.unpack(f'>{count}I', f.read(4 * count))
+        else:
+            offsets = (0,)
+        for index, offset in enumerate(offsets):
+            face = _read_face(f, path, index, offset)
+            if face is not None:
+                faces.append(face)
+    return faces
+
+
+class FontRegistry:
+    def __init__(self, directories):
+        self.directories = []
+        seen = set()
+        for directory in directories:
+            real = os.path.realpath(directory)
+            if real not in seen:
+                seen.add(real)
+                self.directories.append(directory)
+        self._lock = threading.Lock()
+        self._files = {}
+        self._dir_mtimes = {}
+        self._by_name = {}
+        self._by_script = {}
+        self._faces = []
+        self._last_check = 0
+        self.refresh()
+
+    def _dirs_changed(self):
+        # Adding or removing a file or subdirectory changes the mtime of its directory
+        for directory, mtime in self._dir_mtimes.items():
+            try:
+                if os.stat(directory).st_mtime_ns != mtime:
+                    return True
+            except OSError:
+                return True
+        return any(os.path.isdir(d) and d not in self._dir_mtimes for d in self.directories)
+
+    def refresh(self, force=True):
+        """Rescan the font directories if they changed (or always, with force)."""
+        with self._lock:
+            self._last_check = time.time()
+            if not force and not self._dirs_changed():
+                return
+            started = time.time()
+
+            files = {}
+            dir_mtimes = {}
+            seen = set()
+            for root_dir in self.directories:
+                for dirpath, _, filenames in os.walk(root_dir, followlinks=True):
+                    try:
+                        dir_mtimes[dirpath] = os.stat(dirpath).st_mtime_ns
+                    except OSError:
+                        continue
+                    for filename in filenames:
+                        if not filename.lower().endswith(FONT_EXTENSIONS):
+                            continue
+                        path = os.path.join(dirpath, filename)
+                        real = os.path.realpath(path)
+                        if real in seen:
+                            continue
+                        seen.add(real)
+                        try:
+                            stat = os.stat(path)
+                        except OSError:
+                            continue
+                        key = (stat.st_size, stat.st_mtime_ns)
+                        cached = self._files.get(path)
+                        if cached is not None and cached[0] == key:
+                            files[path] = cached
+                            continue
+                        try:
+                            files[path] = (key, read_font_faces(path))
+                        except (OSError, struct.error, ValueError) as e:
+                            logger.warning(f"Skipping unreadable font {path}: {str(e)}")
+
+            # Repo fonts come first, so they win over system fonts of the same name
+            faces = [face for _, file_faces in files.values() for face in file_faces]
+            by_name = {}
+            for face in faces:
+                for name in face.names:
+                    by_name.setdefault(name.lower(), []).append(face)
+            by_script = {}
+            for script in SCRIPT_RANGE_BITS:
+                covering = [face for face in faces if script in face.scripts]
+                preferred = [name.lower() for name in PREFERRED_FAMILIES.get(script, [])]
+
+                def rank(face, preferred=preferred):
+                    family = face.family.lower()
+                    order = preferred.index(family) if family in preferred else len(preferred)
+                    return (order, abs(face.weight - 400), face.italic, abs(face.width - 5))
+                by_script[script] = sorted(covering, key=rank)
+
+            self._files = files
+            self._dir_mtimes = dir_mtimes
+            self._faces = faces
+            self._by_name = by_name
+            self._by_script = by_script
+            logger.info(f"Indexed {len(faces)} font faces from {len(files)} files in {time.time() - started:.2f}s")
+
+    def _check(self):
+        if time.time() - self._last_check >= FONT_REGISTRY_CHECK_INTERVAL:
+            self.refresh(force=False)
+
+    def find_font(self, name, bold=False, italic=False):
+        """
+        Find a face by family name, full name, PostScript name or file name.
+
+        Returns:
+            The FontFace closest to the requested style, or None
+        """
+        if not name:
+            return None
+        self._check()
+        candidates = self._by_name.get(name.strip().lower())
+        if not candidates:
+            return None
+        target = 700 if bold else 400
+        return min(candidates, key=lambda face: (face.italic != italic, abs(face.width - 5), abs(face.weight - target)))
+
+    def find_fonts(self, name):
+        """All faces matching a family, full, PostScript or file name (e.g. every style of a family)."""
+        if not name:
+            return []
+        self._check()
+        return list(self._by_name.get(name.strip().lower(), []))
+
+    def fonts_for_script(self, script):
+        """Faces covering a script (a key of SCRIPT_RANGE_BITS, e.g. 'thai'), preferred fonts first."""
+        self._check()
+        return list(self._by_script.get(script, []))
+
+    def default_font(self, script):
+        """The preferred face for a script, or None if no installed font covers it."""
+        fonts = self.fonts_for_script(script)
+        return fonts[0] if fonts else None
+
+    def families(self):
+        self._check()
+        return sorted({face.family for face in self._faces})
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_font_registry():
+    """Return the shared registry, scanning the font directories on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = FontRegistry([REPO_FONTS_DIR] + FONT_DIRS + SYSTEM_FONT_DIRS)
+    return _registry
+
+
+def find_font_path(name, bold=False, italic=False):
+    """Return the file of a font by name, or None if it is not installed."""
+    face = get_font_registry().find_font(name, bold=bold, italic=italic)
+    return face.path if face else None
@@ -4,6 +4,13 @@ import logging
 from google.oauth2 import service_account
 from google.cloud import storage
 
+try:
+    # Parallel XML multipart uploads (google-cloud-storage >= 2.14)
+    from google.cloud.storage import transfer_manager
+    TRANSFER_MANAGER_AVAILABLE = True
+except ImportError:
+    TRANSFER_MANAGER_AVAILABLE = False
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -13,6 +20,12 @@ GCP_BUCKET_NAME = os.getenv('GCP_BUCKET_NAME')
 STORAGE_PATH = "/tmp/"
 gcs_client = None
 
+# Files larger than UPLOAD_MULTIPART_THRESHOLD are uploaded in parts of
+# UPLOAD_PART_SIZE bytes, UPLOAD_PART_CONCURRENCY parts at a time
+UPLOAD_MULTIPART_THRESHOLD = int(os.getenv('UPLOAD_MULTIPART_THRESHOLD', 32 * 1024 * 1024))
+UPLOAD_PART_SIZE = int(os.getenv('UPLOAD_PART_SIZE', 16 * 1024 * 1024))
+UPLOAD_PART_CONCURRENCY = int(os.getenv('UPLOAD_PART_CONCURRENCY', 8))
+
 def initialize_gcp_client():
     GCP_SA_CREDENTIALS = os.getenv('GCP_SA_CREDENTIALS')
 
@@ -37,6 +50,20 @@ def initialize_gcp_client():
 # Initialize the GCS client
 gcs_client = initialize_gcp_client()
 
+def _upload_blob(blob, file_path):
+    """Upload a file to a blob, in parallel parts if it is large."""
+    if TRANSFER_MANAGER_AVAILABLE and os.path.getsize(file_path) > UPLOAD_MULTIPART_THRESHOLD:
+        # Threads rather than processes: the client and credentials are shared
+        transfer_manager.upload_chunks_concurrently(
+            file_path,
+            blob,
+            chunk_size=UPLOAD_PART_SIZE,
+            max_workers=UPLOAD_PART_CONCURRENCY,
+            worker_type=transfer_manager.THREAD
+        )
+    else:
+        blob.upload_from_filename(file_path)
+
 def upload_to_gcs(file_path, bucket_name=GCP_BUCKET_NAME):
     if not gcs_client:
         raise ValueError("GCS client is not initialized. Skipping file upload.")
@@ -45,7 +72,7 @@ def upload_to_gcs(file_path, bucket_name=GCP_BUCKET_NAME):
         logger.info(f"Uploading file to Google Cloud Storage: {file_path}")
         bucket = gcs_client.bucket(bucket_name)
         blob = bucket.blob(os.path.basename(file_path))
-        blob.upload_from_filename(file_path)
+        _upload_blob(blob, file_path)
         logger.info(f"File uploaded successfully to GCS: {blob.public_url}")
         return blob.public_url
     except Exception as e:
@@ -75,7 +102,7 @@ def upload_to_gcs_with_path(file_path, bucket_name=GCP_BUCKET_NAME, destination_
         blob_path = destination_path if destination_path else os.path.basename(file_path)
         blob = bucket.blob(blob_path)
         
-        blob.upload_from_filename(file_path)
+        _upload_blob(blob, file_path)
         logger.info(f"File uploaded successfully to GCS: {blob.public_url}")
         return blob.public_url
     except Exception as e:
@@ -0,0 +1,182 @@
+"""
+Shared HTTP client for outbound requests.
+
+Keeps one requests.Session per host, so connections (TCP + TLS) are pooled and
+reused between calls and jobs. Media and webhook hosts come from user input, so
+only the HTTP_MAX_HOSTS most recently used hosts keep a session (and metrics);
+the sessions of other hosts are closed. Each session has default timeouts and a retry
+policy with exponential backoff for connection errors and retryable status codes,
+and per-host request metrics are collected for monitoring.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# Default timeouts in seconds
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 10))
+HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 120))
+
+# Retries for connection errors and retryable status codes, with exponential backoff
+HTTP_RETRIES = int(os.environ.get('HTTP_RETRIES', 3))
+HTTP_BACKOFF_FACTOR = float(os.environ.get('HTTP_BACKOFF_FACTOR', 0.5))
+
+# Maximum pooled connections per host
+HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 10))
+
+# Maximum number of hosts with a pooled session and metrics
+HTTP_MAX_HOSTS = int(os.environ.get('HTTP_MAX_HOSTS', 64))
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# POST and PATCH are not idempotent, so they are only retried when the connection could not be made
+RETRY_METHODS = frozenset(['HEAD', 'GET', 'PUT', 'DELETE', 'OPTIONS'])
+
+
+def _make_retry(retries):
+    return Retry(
+        total=retries,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=RETRY_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+
+
+class HostMetrics:
+    """Request counters for one host."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_time = 0.0
+
+    def to_dict(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avg_time": round(self.total_time / self.requests, 3) if self.requests else 0
+        }
+
+
+# Least recently used first
+_sessions = OrderedDict()
+_metrics = OrderedDict()
+_lock = threading.Lock()
+
+
+def _host_key(url):
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+def _get_host(url):
+    """Return the pooled session and the metrics of the URL's host."""
+    key = _host_key(url)
+    evicted = []
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_MAXSIZE,
+                                  max_retries=_make_retry(HTTP_RETRIES))
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _sessions[key] = session
+            while len(_sessions) > max(1, HTTP_MAX_HOSTS):
+                evicted.append(_sessions.popitem(last=False)[1])
+        else:
+            _sessions.move_to_end(key)
+
+        metrics = _metrics.get(key)
+        if metrics is None:
+            metrics = _metrics[key] = HostMetrics()
+            while len(_metrics) > max(1, HTTP_MAX_HOSTS):
+                _metrics.popitem(last=False)
+        else:
+            _metrics.move_to_end(key)
+
+    # Requests still running on an evicted session finish; its idle connections are closed
+    for old_session in evicted:
+        old_session.close()
+    return session, metrics
+
+
+def get_session(url):
+    """Return the pooled session for the URL's host."""
+    return _get_host(url)[0]
+
+
+def request(method, url, timeout=None, **kwargs):
+    """
+    Send a request through the host's pooled session.
+
+    Args:
+        method: HTTP method
+        url: Request URL
+        timeout: (connect, read) timeout or a single value; defaults to
+                 (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        **kwargs: Passed on to requests.Session.request
+
+    Returns:
+        requests.Response
+    """
+    session, metrics = _get_host(url)
+    if timeout is None:
+        timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+    start_time = time.time()
+    try:
+        response = session.request(method, url, timeout=timeout, **kwargs)
+    except requests.RequestException:
+        with _lock:
+            metrics.requests += 1
+            metrics.errors += 1
+            metrics.total_time += time.time() - start_time
+        raise
+
+    retries = getattr(response.raw, 'retries', None)
+    with _lock:
+        metrics.requests += 1
+        metrics.total_time += time.time() - start_time
+        if response.status_code >= 400:
+            metrics.errors += 1
+        if retries is not None:
+            metrics.retries += len(retries.history)
+    return response
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def put(url, **kwargs):
+    return request('PUT', url, **kwargs)
+
+
+def head(url, **kwargs):
+    # Like requests.head, don't follow redirects unless asked to
+    kwargs.setdefault('allow_redirects', False)
+    return request('HEAD', url, **kwargs)
+
+
+def get_metrics():
+    """Return a snapshot of the per-host request metrics."""
+    with _lock:
+        return {host: metrics.to_dict() for host, metrics in _metrics.items()}
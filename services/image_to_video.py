@@ -1,7 +1,8 @@
 import os
 import subprocess
 import logging
-from services.file_management import download_file
+from services.file_management import download_file, get_job_file_path
+from services.ffmpeg_runner import run_ffmpeg
 from PIL import Image
 
 STORAGE_PATH = "/tmp/"
@@ -10,7 +11,7 @@ logger = logging.getLogger(__name__)
 def process_image_to_video(image_url, length, frame_rate, zoom_speed, job_id, webhook_url=None):
     try:
         # Download the image file
-        image_path = download_file(image_url, STORAGE_PATH)
+        image_path = download_file(image_url, get_job_file_path(job_id, image_url))
         logger.info(f"Downloaded image to {image_path}")
 
         # Get image dimensions using Pillow
@@ -47,10 +48,11 @@ def process_image_to_video(image_url, length, frame_rate, zoom_speed, job_id, we
         logger.info(f"Running FFmpeg command: {' '.join(cmd)}")
 
         # Run FFmpeg command
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            logger.error(f"FFmpeg command failed. Error: {result.stderr}")
-            raise subprocess.CalledProcessError(result.returncode, cmd, result.stdout, result.stderr)
+        try:
+            run_ffmpeg(cmd, job_id=job_id, duration=length, label="image_to_video")
+        except subprocess.CalledProcessError as e:
+            logger.error(f"FFmpeg command failed. Error: {e.stderr}")
+            raise
 
         logger.info(f"Video created successfully: {output_path}")
 
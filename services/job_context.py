@@ -0,0 +1,36 @@
+"""
+The job the current thread is working on.
+
+The request handler and the queue worker set it around each task, so deeply
+nested helpers (like the ffmpeg runner) can report on the job without the job
+ID being passed through every function.
+"""
+
+import contextvars
+from contextlib import contextmanager
+
+_current_job = contextvars.ContextVar('current_job', default=None)
+
+
+class JobContext:
+    def __init__(self, job_id, data):
+        self.job_id = job_id
+        self.data = data or {}
+
+    @property
+    def progress_webhook_url(self):
+        return self.data.get('progress_webhook_url')
+
+
+@contextmanager
+def job_context(job_id, data):
+    token = _current_job.set(JobContext(job_id, data))
+    try:
+        yield
+    finally:
+        _current_job.reset(token)
+
+
+def get_current_job():
+    """Return the JobContext of the running job, or None outside of a job."""
+    return _current_job.get()
@@ -0,0 +1,265 @@
+"""
+Cancellation and timeouts for running jobs.
+
+Every job runs inside job_scope(). Work that can be stopped registers itself on
+the job: ffmpeg subprocesses with tracked_process(), other work (like a pool of
+Whisper processes) with on_cancel(), and long loops call check_cancelled()
+between steps. When a job is cancelled or exceeds JOB_TIMEOUT, its processes
+are terminated (and killed if they do not exit), its callbacks run, and the next
+check_cancelled() raises JobCancelled. Scratch files of the job are removed.
+
+Cancellation requests are stored on the job record, so a request handled by one
+gunicorn worker reaches a job running in another; a watchdog thread in each
+worker polls the records of its running jobs.
+"""
+
+import os
+import glob
+import time
+import shutil
+import logging
+import threading
+from contextlib import contextmanager
+from services.job_context import get_current_job
+from services.job_store import get_job_store
+
+logger = logging.getLogger(__name__)
+
+# Maximum run time of a queued job in seconds (0, the default, disables the timeout)
+JOB_TIMEOUT = int(os.environ.get('JOB_TIMEOUT', 0))
+# How often the watchdog checks deadlines and cancellation requests, in seconds
+JOB_CANCEL_POLL_INTERVAL = float(os.environ.get('JOB_CANCEL_POLL_INTERVAL', 2))
+
+# Seconds a terminated process gets to exit before it is killed
+KILL_GRACE_SECONDS = 5
+
+# Services write their scratch files here, named after the job ID
+SCRATCH_DIR = "/tmp"
+
+CANCEL_REASON_USER = "Job cancelled by user"
+
+
+class JobCancelled(Exception):
+    """Raised inside a job that was cancelled or timed out."""
+
+    def __init__(self, job_id, reason):
+        super().__init__(reason)
+        self.job_id = job_id
+        self.reason = reason
+
+
+class RunningJob:
+    """Control state of a job running in this worker."""
+
+    def __init__(self, job_id, timeout):
+        self.job_id = job_id
+        self.started_at = time.time()
+        self.timeout = timeout
+        self.deadline = self.started_at + timeout if timeout else None
+        self.reason = None
+        self.timed_out = False
+        self.cancelled = threading.Event()
+        self.processes = set()
+        self.callbacks = []
+        self.scratch_paths = []
+        self.lock = threading.Lock()
+
+
+_running = {}
+_lock = threading.Lock()
+_watchdog_started = False
+
+
+def _terminate(process):
+    """Terminate a subprocess, and kill it if it is still running after the grace period."""
+    if process.poll() is not None:
+        return
+    try:
+        process.terminate()
+    except OSError:
+        return
+
+    def kill():
+        if process.poll() is None:
+            try:
+                process.kill()
+            except OSError:
+                pass
+
+    timer = threading.Timer(KILL_GRACE_SECONDS, kill)
+    timer.daemon = True
+    timer.start()
+
+
+def _current_handle():
+    job = get_current_job()
+    if job is None:
+        return None
+    with _lock:
+        return _running.get(job.job_id)
+
+
+def cancel_running_job(job_id, reason=CANCEL_REASON_USER, timed_out=False):
+    """
+    Cancel a job if it runs in this worker.
+
+    Returns:
+        True if the job was running here
+    """
+    with _lock:
+        handle = _running.get(job_id)
+    if handle is None:
+        return False
+
+    with handle.lock:
+        if handle.cancelled.is_set():
+            return True
+        handle.reason = reason
+        handle.timed_out = timed_out
+        handle.cancelled.set()
+        processes = list(handle.processes)
+        callbacks = list(handle.callbacks)
+
+    logger.warning(f"Job {job_id}: {reason}, stopping {len(processes)} process(es)")
+    for process in processes:
+        _terminate(process)
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Job {job_id}: Error in cancel callback: {str(e)}")
+    return True
+
+
+def request_cancel(job_id):
+    """
+    Ask for a running job to be cancelled, wherever it runs.
+
+    Returns:
+        True if the request was recorded
+    """
+    cancel_running_job(job_id)
+    return get_job_store().update_job(job_id, {"cancel_requested": True})
+
+
+def check_cancelled():
+    """Raise JobCancelled if the job running in this thread was cancelled or timed out."""
+    handle = _current_handle()
+    if handle is not None and handle.cancelled.is_set():
+        raise JobCancelled(handle.job_id, handle.reason)
+
+
+def is_cancelled(job_id):
+    with _lock:
+        handle = _running.get(job_id)
+    return handle is not None and handle.cancelled.is_set()
+
+
+@contextmanager
+def tracked_process(process):
+    """Terminate the subprocess if the current job is cancelled while it runs."""
+    handle = _current_handle()
+    if handle is None:
+        yield
+        return
+    with handle.lock:
+        handle.processes.add(process)
+        cancelled = handle.cancelled.is_set()
+    if cancelled:
+        _terminate(process)
+    try:
+        yield
+    finally:
+        with handle.lock:
+            handle.processes.discard(process)
+
+
+@contextmanager
+def on_cancel(callback):
+    """Call callback if the current job is cancelled within the block."""
+    handle = _current_handle()
+    if handle is None:
+        yield
+        return
+    with handle.lock:
+        handle.callbacks.append(callback)
+        cancelled = handle.cancelled.is_set()
+    if cancelled:
+        callback()
+    try:
+        yield
+    finally:
+        with handle.lock:
+            handle.callbacks.remove(callback)
+
+
+def register_scratch(path):
+    """Remove path (a file or directory) if the current job is cancelled."""
+    handle = _current_handle()
+    if handle is not None:
+        with handle.lock:
+            handle.scratch_paths.append(path)
+
+
+def _remove_scratch(handle):
+    paths = list(handle.scratch_paths)
+    # Most services name their temporary files after the job ID
+    paths.extend(glob.glob(os.path.join(SCRATCH_DIR, f"{glob.escape(handle.job_id)}*")))
+    for path in paths:
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            logger.warning(f"Job {handle.job_id}: Failed to remove scratch file {path}: {str(e)}")
+    if paths:
+        logger.info(f"Job {handle.job_id}: Removed {len(paths)} scratch file(s)")
+
+
+def _watchdog():
+    store = get_job_store()
+    while True:
+        time.sleep(JOB_CANCEL_POLL_INTERVAL)
+        with _lock:
+            handles = list(_running.values())
+        now = time.time()
+        for handle in handles:
+            if handle.cancelled.is_set():
+                continue
+            if handle.deadline and now > handle.deadline:
+                cancel_running_job(handle.job_id, f"Job exceeded maximum execution time of {handle.timeout}s",
+                                   timed_out=True)
+                continue
+            try:
+                record = store.get_job(handle.job_id)
+            except Exception as e:
+                logger.warning(f"Job {handle.job_id}: Failed to check for cancellation: {str(e)}")
+                continue
+            if record and record.get("cancel_requested"):
+                cancel_running_job(handle.job_id)
+
+
+def _start_watchdog():
+    global _watchdog_started
+    with _lock:
+        if _watchdog_started:
+            return
+        _watchdog_started = True
+    threading.Thread(target=_watchdog, name="job-watchdog", daemon=True).start()
+
+
+@contextmanager
+def job_scope(job_id, timeout=JOB_TIMEOUT):
+    """Run a job under cancellation and timeout control. Yields its RunningJob."""
+    handle = RunningJob(job_id, timeout)
+    with _lock:
+        _running[job_id] = handle
+    _start_watchdog()
+    try:
+        yield handle
+    finally:
+        with _lock:
+            _running.pop(job_id, None)
+        if handle.cancelled.is_set():
+            _remove_scratch(handle)
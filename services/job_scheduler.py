@@ -0,0 +1,120 @@
+"""
+Multi-worker job scheduler used by app.queue_task.
+
+Jobs are kept in a single FIFO list and drained by a pool of worker threads.
+Each endpoint can be capped with its own concurrency limit, in which case a
+worker skips over jobs for a saturated endpoint and picks the next runnable one.
+"""
+
+import os
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Number of worker threads per gunicorn worker (1 keeps the old strictly serial behaviour)
+QUEUE_WORKERS = int(os.environ.get('QUEUE_WORKERS', 1))
+
+# Per-endpoint limits, e.g. "/v1/video/caption=2,/v1/media/transcribe=1"
+ENDPOINT_CONCURRENCY = os.environ.get('ENDPOINT_CONCURRENCY', '')
+
+
+def parse_endpoint_limits(spec):
+    """Parse an ENDPOINT_CONCURRENCY string into a {endpoint: limit} dict."""
+    limits = {}
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            endpoint, limit = item.rsplit('=', 1)
+            limits[endpoint.strip()] = max(1, int(limit))
+        except ValueError:
+            logger.warning(f"Ignoring invalid ENDPOINT_CONCURRENCY entry: {item}")
+    return limits
+
+
+class ScheduledJob:
+    """A queued unit of work."""
+
+    def __init__(self, job_id, endpoint, data, task_func, queue_start_time):
+        self.job_id = job_id
+        self.endpoint = endpoint
+        self.data = data
+        self.task_func = task_func
+        self.queue_start_time = queue_start_time
+
+
+class JobScheduler:
+    """Thread pool that runs queued jobs with optional per-endpoint concurrency limits."""
+
+    def __init__(self, run_job, max_workers=QUEUE_WORKERS, endpoint_limits=None):
+        """
+        Args:
+            run_job: Callable invoked as run_job(job) on a worker thread
+            max_workers: Number of worker threads
+            endpoint_limits: Optional {endpoint: max concurrent jobs} mapping
+        """
+        self.run_job = run_job
+        self.max_workers = max(1, max_workers)
+        self.endpoint_limits = endpoint_limits if endpoint_limits is not None else parse_endpoint_limits(ENDPOINT_CONCURRENCY)
+        self._pending = deque()
+        self._running = {}  # {endpoint: number of running jobs}
+        self._condition = threading.Condition()
+        self._threads = []
+
+    def start(self):
+        """Start the worker threads."""
+        logger.info(f"Starting job scheduler with {self.max_workers} workers, endpoint limits: {self.endpoint_limits or 'none'}")
+        for i in range(self.max_workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, job):
+        """Add a job to the end of the queue."""
+        with self._condition:
+            self._pending.append(job)
+            self._condition.notify()
+
+    def qsize(self):
+        """Number of jobs waiting to start."""
+        with self._condition:
+            return len(self._pending)
+
+    def running_count(self):
+        """Number of jobs currently running."""
+        with self._condition:
+            return sum(self._running.values())
+
+    def _has_capacity(self, endpoint):
+        limit = self.endpoint_limits.get(endpoint)
+        return limit is None or self._running.get(endpoint, 0) < limit
+
+    def _next_job(self):
+        """Pop the oldest job whose endpoint has free capacity. Caller holds the lock."""
+        for index, job in enumerate(self._pending):
+            if self._has_capacity(job.endpoint):
+                del self._pending[index]
+                self._running[job.endpoint] = self._running.get(job.endpoint, 0) + 1
+                return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None:
+                    self._condition.wait()
+                    job = self._next_job()
+
+            try:
+                self.run_job(job)
+            except Exception as e:
+                logger.error(f"Job {job.job_id}: Unhandled error in scheduled job: {str(e)}", exc_info=True)
+            finally:
+                with self._condition:
+                    self._running[job.endpoint] -= 1
+                    # A slot freed up, so jobs skipped for this endpoint may now run
+                    self._condition.notify_all()
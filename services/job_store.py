@@ -0,0 +1,384 @@
+"""
+Persistent job store shared by every gunicorn worker.
+
+Job records are JSON documents keyed by job_id. The default backend is a
+SQLite database in WAL mode on local disk, which lets all workers on a node
+see the same jobs and keeps queued jobs across restarts. A Redis backend can
+be selected with JOB_STORE_BACKEND=redis for multi-node deployments.
+
+A job is owned by the process that queued or claimed it for as long as that
+process keeps renewing the job's lease (see hold_leases()). Jobs whose lease
+has expired are orphaned, wherever their owner ran, and can be taken over.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Optional Redis support
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# Job store configuration
+JOB_STORE_BACKEND = os.environ.get('JOB_STORE_BACKEND', 'sqlite').lower()
+JOB_STORE_PATH = os.environ.get('JOB_STORE_PATH', '/tmp/nca_jobs.db')
+JOB_STORE_REDIS_URL = os.environ.get('JOB_STORE_REDIS_URL', 'redis://localhost:6379/0')
+JOB_STORE_RETENTION_HOURS = float(os.environ.get('JOB_STORE_RETENTION_HOURS', 24))
+# Seconds a job stays owned without its owner renewing the lease
+JOB_LEASE_SECONDS = float(os.environ.get('JOB_LEASE_SECONDS', 60))
+
+# Job status constants for the main request queue
+JOB_STATUS_QUEUED = "queued"
+JOB_STATUS_RUNNING = "running"
+JOB_STATUS_DONE = "done"
+JOB_STATUS_FAILED = "failed"
+JOB_STATUS_CANCELLED = "cancelled"
+
+# Identifies the process that owns (is running) a job
+HOSTNAME = socket.gethostname()
+
+# (pid, owner) of this process; the random part keeps owners unique when a PID is reused
+_owner = (None, None)
+
+
+def current_owner():
+    """Owner string for jobs claimed by this process."""
+    global _owner
+    pid = os.getpid()
+    if _owner[0] != pid:
+        _owner = (pid, f"{HOSTNAME}:{pid}:{uuid.uuid4().hex[:8]}")
+    return _owner[1]
+
+
+def lease(owner=None):
+    """Record fields that give a job to owner (default this process) for JOB_LEASE_SECONDS."""
+    return {'owner': owner or current_owner(), 'lease_expires_at': time.time() + JOB_LEASE_SECONDS}
+
+
+def lease_expired(record, now=None):
+    """Check whether a job's owner has stopped renewing its lease."""
+    if not record.get('owner'):
+        return True
+    expires_at = record.get('lease_expires_at')
+    if expires_at is None:
+        # Written before leases existed
+        expires_at = record.get('updated_at', 0) + JOB_LEASE_SECONDS
+    return expires_at < (time.time() if now is None else now)
+
+
+class JobStore:
+    """Abstract job store."""
+
+    def put_job(self, job_id, record, queue="default"):
+        """Insert or replace a job record."""
+        raise NotImplementedError("put_job must be implemented by subclasses")
+
+    def get_job(self, job_id):
+        """Return the job record, or None if it does not exist."""
+        raise NotImplementedError("get_job must be implemented by subclasses")
+
+    def update_job(self, job_id, fields, expected_status=None, expected_owner=None):
+        """
+        Merge fields into a job record.
+
+        If expected_status or expected_owner are given, the update is only applied
+        when the stored record matches them (compare-and-set).
+
+        Returns:
+            True if the record was updated, False otherwise
+        """
+        raise NotImplementedError("update_job must be implemented by subclasses")
+
+    def delete_job(self, job_id):
+        raise NotImplementedError("delete_job must be implemented by subclasses")
+
+    def list_jobs(self, queue=None, statuses=None):
+        """Return all job records, optionally filtered by queue and status."""
+        raise NotImplementedError("list_jobs must be implemented by subclasses")
+
+    def renew_leases(self, owner, queue, statuses):
+        """
+        Extend the leases of owner's jobs in one of statuses by JOB_LEASE_SECONDS.
+
+        Returns:
+            Number of leases renewed
+        """
+        renewed = 0
+        fields = {'lease_expires_at': time.time() + JOB_LEASE_SECONDS}
+        for record in self.list_jobs(queue=queue, statuses=statuses):
+            # Compare-and-set, so a job another worker has taken over stays with it
+            if record.get('owner') == owner and self.update_job(record['job_id'], fields, expected_owner=owner):
+                renewed += 1
+        return renewed
+
+    def purge_finished(self, max_age_seconds, statuses):
+        """Delete jobs in one of statuses whose last update is older than max_age_seconds."""
+        removed = 0
+        cutoff = time.time() - max_age_seconds
+        for record in self.list_jobs(statuses=statuses):
+            if record.get('updated_at', 0) < cutoff:
+                self.delete_job(record['job_id'])
+                removed += 1
+        return removed
+
+
+class SQLiteJobStore(JobStore):
+    """Job store backed by a SQLite database in WAL mode."""
+
+    def __init__(self, path=JOB_STORE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # The journal mode cannot be changed inside a transaction
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+        finally:
+            conn.close()
+        with self._connect(immediate=True) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, queue TEXT, status TEXT, owner TEXT, "
+                "updated_at REAL, record TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue_status ON jobs (queue, status)")
+        logger.info(f"Using SQLite job store at {path}")
+
+    def _connect(self, immediate=False):
+        # A short-lived connection per call keeps the store safe to use from any thread
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return _Transaction(conn, immediate)
+
+    def put_job(self, job_id, record, queue="default"):
+        record = dict(record, job_id=job_id, queue=queue, updated_at=time.time())
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, queue, status, owner, updated_at, record) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, queue, record.get('status'), record.get('owner'), record['updated_at'],
+                 json.dumps(record, default=str, ensure_ascii=False))
+            )
+
+    def get_job(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT record FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update_job(self, job_id, fields, expected_status=None, expected_owner=None):
+        # Compare-and-set (and claiming a job): take the write lock before reading the record
+        with self._connect(immediate=True) as conn:
+            row = conn.execute("SELECT record FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if not row:
+                return False
+            record = json.loads(row[0])
+            if expected_status is not None and record.get('status') != expected_status:
+                return False
+            if expected_owner is not None and record.get('owner') != expected_owner:
+                return False
+            record.update(fields)
+            record['updated_at'] = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, updated_at = ?, record = ? WHERE job_id = ?",
+                (record.get('status'), record.get('owner'), record['updated_at'],
+                 json.dumps(record, default=str, ensure_ascii=False), job_id)
+            )
+            return True
+
+    def delete_job(self, job_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def list_jobs(self, queue=None, statuses=None):
+        query = "SELECT record FROM jobs"
+        clauses = []
+        params = []
+        if queue is not None:
+            clauses.append("queue = ?")
+            params.append(queue)
+        if statuses:
+            clauses.append(f"status IN ({', '.join('?' for _ in statuses)})")
+            params.extend(statuses)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+
+class _Transaction:
+    """
+    Context manager that wraps a SQLite connection in a transaction.
+
+    Transactions are deferred, so reads run on a WAL snapshot without blocking
+    (or waiting for) writers. Immediate transactions take the write lock up
+    front; they are only needed when a record is read and then written back.
+    """
+
+    def __init__(self, conn, immediate=False):
+        self.conn = conn
+        self.immediate = immediate
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE" if self.immediate else "BEGIN DEFERRED")
+        return self.conn
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.conn.close()
+
+
+class RedisJobStore(JobStore):
+    """Job store backed by a Redis (or Redis-compatible) server."""
+
+    KEY_PREFIX = "nca:job:"
+    INDEX_KEY = "nca:jobs"
+
+    def __init__(self, url=JOB_STORE_REDIS_URL):
+        if not REDIS_AVAILABLE:
+            raise ValueError("The redis package is not installed. Install it or use JOB_STORE_BACKEND=sqlite.")
+        self.client = redis.Redis.from_url(url)
+        logger.info(f"Using Redis job store at {url}")
+
+    def _key(self, job_id):
+        return f"{self.KEY_PREFIX}{job_id}"
+
+    def put_job(self, job_id, record, queue="default"):
+        record = dict(record, job_id=job_id, queue=queue, updated_at=time.time())
+        pipe = self.client.pipeline()
+        pipe.set(self._key(job_id), json.dumps(record, default=str, ensure_ascii=False))
+        pipe.sadd(self.INDEX_KEY, job_id)
+        pipe.execute()
+
+    def get_job(self, job_id):
+        value = self.client.get(self._key(job_id))
+        return json.loads(value) if value else None
+
+    def update_job(self, job_id, fields, expected_status=None, expected_owner=None):
+        key = self._key(job_id)
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    value = pipe.get(key)
+                    if not value:
+                        pipe.unwatch()
+                        return False
+                    record = json.loads(value)
+                    if expected_status is not None and record.get('status') != expected_status:
+                        pipe.unwatch()
+                        return False
+                    if expected_owner is not None and record.get('owner') != expected_owner:
+                        pipe.unwatch()
+                        return False
+                    record.update(fields)
+                    record['updated_at'] = time.time()
+                    pipe.multi()
+                    pipe.set(key, json.dumps(record, default=str, ensure_ascii=False))
+                    pipe.execute()
+                    return True
+                except redis.WatchError:
+                    # Another worker changed the record, retry with the fresh value
+                    continue
+
+    def delete_job(self, job_id):
+        pipe = self.client.pipeline()
+        pipe.delete(self._key(job_id))
+        pipe.srem(self.INDEX_KEY, job_id)
+        pipe.execute()
+
+    def list_jobs(self, queue=None, statuses=None):
+        job_ids = [job_id.decode('utf-8') for job_id in self.client.smembers(self.INDEX_KEY)]
+        if not job_ids:
+            return []
+        records = []
+        for value in self.client.mget([self._key(job_id) for job_id in job_ids]):
+            if not value:
+                continue
+            record = json.loads(value)
+            if queue is not None and record.get('queue') != queue:
+                continue
+            if statuses and record.get('status') not in statuses:
+                continue
+            records.append(record)
+        return records
+
+
+_job_store = None
+_job_store_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    """Get the process-wide job store selected by JOB_STORE_BACKEND."""
+    global _job_store
+    if _job_store is None:
+        with _job_store_lock:
+            if _job_store is None:
+                if JOB_STORE_BACKEND == 'redis':
+                    _job_store = RedisJobStore()
+                else:
+                    _job_store = SQLiteJobStore()
+    return _job_store
+
+
+def find_orphaned_jobs(store, queue, statuses):
+    """Return jobs in the given statuses whose lease has expired, except this process's own."""
+    now = time.time()
+    owner = current_owner()
+    return [record for record in store.list_jobs(queue=queue, statuses=statuses)
+            if record.get('owner') != owner and lease_expired(record, now)]
+
+
+# (store, queue, statuses, recover) registered by hold_leases()
+_lease_holders = []
+_lease_lock = threading.Lock()
+_lease_thread_started = False
+
+
+def _renew_leases():
+    while True:
+        time.sleep(JOB_LEASE_SECONDS / 3)
+        with _lease_lock:
+            holders = list(_lease_holders)
+        for store, queue, statuses, recover in holders:
+            try:
+                store.renew_leases(current_owner(), queue, statuses)
+                if recover is not None:
+                    recover()
+            except Exception as e:
+                logger.error(f"Failed to renew the job leases of queue {queue}: {str(e)}")
+
+
+def hold_leases(store, queue, statuses, recover=None):
+    """
+    Keep the leases of this process's jobs in queue alive while it runs.
+
+    Leases are renewed three times per JOB_LEASE_SECONDS from a background thread,
+    which also calls recover() each time, so jobs whose owner has died are taken
+    over once their lease expires rather than only when a worker starts.
+
+    Args:
+        store: The job store
+        queue: Queue of the jobs
+        statuses: Statuses in which a job needs its owner
+        recover: Function that takes over orphaned jobs (see find_orphaned_jobs())
+    """
+    global _lease_thread_started
+    with _lease_lock:
+        _lease_holders.append((store, queue, list(statuses), recover))
+        if _lease_thread_started:
+            return
+        _lease_thread_started = True
+    threading.Thread(target=_renew_leases, name="job-leases", daemon=True).start()
@@ -0,0 +1,187 @@
+"""
+Shared, cached ffprobe.
+
+probe_media() runs ffprobe once per file, parses the full JSON (format and
+streams) into MediaInfo / StreamInfo objects and keeps the result in a bounded
+in-memory LRU cache. Local files are keyed by path, size and modification time,
+so a file that is rewritten is probed again. Remote URLs are not cached.
+"""
+
+import os
+import json
+import logging
+import threading
+import subprocess
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of probe results kept in memory per worker
+PROBE_CACHE_SIZE = int(os.environ.get('PROBE_CACHE_SIZE', 256))
+
+
+def _float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _int(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _frame_rate(value) -> Optional[float]:
+    """Parse an ffprobe rate like '30000/1001'."""
+    if not value or value == '0/0':
+        return None
+    numerator, _, denominator = value.partition('/')
+    try:
+        return float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+@dataclass
+class StreamInfo:
+    index: int
+    codec_type: str
+    codec_name: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    pix_fmt: Optional[str] = None
+    frame_rate: Optional[float] = None
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+    duration: Optional[float] = None
+    bit_rate: Optional[int] = None
+    tags: Dict[str, str] = field(default_factory=dict)
+    raw: Dict[str, Any] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_ffprobe(cls, stream):
+        return cls(
+            index=stream.get('index', 0),
+            codec_type=stream.get('codec_type', 'unknown'),
+            codec_name=stream.get('codec_name'),
+            width=_int(stream.get('width')),
+            height=_int(stream.get('height')),
+            pix_fmt=stream.get('pix_fmt'),
+            frame_rate=_frame_rate(stream.get('avg_frame_rate')) or _frame_rate(stream.get('r_frame_rate')),
+            sample_rate=_int(stream.get('sample_rate')),
+            channels=_int(stream.get('channels')),
+            duration=_float(stream.get('duration')),
+            bit_rate=_int(stream.get('bit_rate')),
+            tags=stream.get('tags', {}),
+            raw=stream
+        )
+
+
+@dataclass
+class MediaInfo:
+    path: str
+    format_name: Optional[str] = None
+    duration: Optional[float] = None
+    size: Optional[int] = None
+    bit_rate: Optional[int] = None
+    streams: List[StreamInfo] = field(default_factory=list)
+    tags: Dict[str, str] = field(default_factory=dict)
+    raw: Dict[str, Any] = field(default_factory=dict, repr=False)
+
+    @property
+    def video(self) -> Optional[StreamInfo]:
+        """First video stream, or None."""
+        return next((s for s in self.streams if s.codec_type == 'video'), None)
+
+    @property
+    def audio(self) -> Optional[StreamInfo]:
+        """First audio stream, or None."""
+        return next((s for s in self.streams if s.codec_type == 'audio'), None)
+
+    @classmethod
+    def from_ffprobe(cls, path, data):
+        fmt = data.get('format', {})
+        return cls(
+            path=path,
+            format_name=fmt.get('format_name'),
+            duration=_float(fmt.get('duration')),
+            size=_int(fmt.get('size')),
+            bit_rate=_int(fmt.get('bit_rate')),
+            streams=[StreamInfo.from_ffprobe(stream) for stream in data.get('streams', [])],
+            tags=fmt.get('tags', {}),
+            raw=data
+        )
+
+
+class ProbeError(Exception):
+    """ffprobe could not read the media."""
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def _cache_key(path):
+    """(path, size, mtime) for local files, or None if the result must not be cached."""
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError, ValueError):
+        return None
+    return (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+
+
+def _run_ffprobe(path):
+    logger.debug(f"Probing {path}")
+    cmd = ['ffprobe', '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', path]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise ProbeError(f"ffprobe failed for {path}: {result.stderr.strip()}")
+    try:
+        return json.loads(result.stdout)
+    except ValueError as e:
+        raise ProbeError(f"Invalid ffprobe output for {path}: {str(e)}")
+
+
+def probe_media(path) -> MediaInfo:
+    """
+    Probe a media file or URL.
+
+    Raises:
+        ProbeError: If ffprobe fails
+    """
+    key = _cache_key(path)
+    if key is not None and PROBE_CACHE_SIZE > 0:
+        with _cache_lock:
+            info = _cache.get(key)
+            if info is not None:
+                _cache.move_to_end(key)
+                _stats["hits"] += 1
+                return info
+
+    info = MediaInfo.from_ffprobe(path, _run_ffprobe(path))
+
+    if key is not None and PROBE_CACHE_SIZE > 0:
+        with _cache_lock:
+            _stats["misses"] += 1
+            _cache[key] = info
+            _cache.move_to_end(key)
+            while len(_cache) > PROBE_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return info
+
+
+def get_duration(path) -> Optional[float]:
+    """Return the duration of a media file in seconds, or None if it has none."""
+    return probe_media(path).duration
+
+
+def get_metrics():
+    """Return the size and hit counts of the probe cache."""
+    with _cache_lock:
+        return {"entries": len(_cache), "hits": _stats["hits"], "misses": _stats["misses"]}
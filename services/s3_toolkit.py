@@ -1,10 +1,31 @@
 import os
 import boto3
 import logging
+import threading
 from urllib.parse import urlparse
+from botocore.config import Config
+from boto3.s3.transfer import TransferConfig
 
 logger = logging.getLogger(__name__)
 
+# Files larger than UPLOAD_MULTIPART_THRESHOLD are uploaded in parts of
+# UPLOAD_PART_SIZE bytes, UPLOAD_PART_CONCURRENCY parts at a time; the threshold
+# defaults to boto3's own, so files from 8 MB up keep uploading in parallel
+UPLOAD_MULTIPART_THRESHOLD = int(os.environ.get('UPLOAD_MULTIPART_THRESHOLD', 8 * 1024 * 1024))
+UPLOAD_PART_SIZE = int(os.environ.get('UPLOAD_PART_SIZE', 16 * 1024 * 1024))
+UPLOAD_PART_CONCURRENCY = int(os.environ.get('UPLOAD_PART_CONCURRENCY', 8))
+
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=UPLOAD_MULTIPART_THRESHOLD,
+    multipart_chunksize=UPLOAD_PART_SIZE,
+    max_concurrency=UPLOAD_PART_CONCURRENCY,
+    use_threads=True
+)
+
+# Clients are thread-safe and expensive to create, so keep one per endpoint and key
+_clients = {}
+_clients_lock = threading.Lock()
+
 def parse_s3_url(s3_url):
     """Parse S3 URL to extract bucket name, region, and endpoint URL."""
     parsed_url = urlparse(s3_url)
@@ -20,22 +41,36 @@ def parse_s3_url(s3_url):
     
     return bucket_name, region, endpoint_url
 
+def get_s3_client(endpoint_url, region, access_key, secret_key):
+    """Return the cached S3 client for the endpoint and credentials."""
+    key = (endpoint_url, region, access_key, secret_key)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            session = boto3.Session(
+                aws_access_key_id=access_key,
+                aws_secret_access_key=secret_key,
+                region_name=region
+            )
+            # Enough pooled connections for the parallel parts of a few concurrent uploads
+            client = session.client(
+                's3',
+                endpoint_url=endpoint_url,
+                config=Config(max_pool_connections=max(10, UPLOAD_PART_CONCURRENCY * 4))
+            )
+            _clients[key] = client
+        return client
+
 def upload_to_s3(file_path, s3_url, access_key, secret_key):
     # Parse the S3 URL into bucket, region, and endpoint
     bucket_name, region, endpoint_url = parse_s3_url(s3_url)
     
-    session = boto3.Session(
-        aws_access_key_id=access_key,
-        aws_secret_access_key=secret_key,
-        region_name=region
-    )
-    
-    client = session.client('s3', endpoint_url=endpoint_url)
+    client = get_s3_client(endpoint_url, region, access_key, secret_key)
 
     try:
-        # Upload the file to the specified S3 bucket
-        with open(file_path, 'rb') as data:
-            client.upload_fileobj(data, bucket_name, os.path.basename(file_path), ExtraArgs={'ACL': 'public-read'})
+        # Upload the file to the specified S3 bucket (multipart for large files)
+        client.upload_file(file_path, bucket_name, os.path.basename(file_path),
+                           ExtraArgs={'ACL': 'public-read'}, Config=TRANSFER_CONFIG)
 
         file_url = f"{endpoint_url}/{bucket_name}/{os.path.basename(file_path)}"
         return file_url
@@ -60,13 +95,7 @@ def upload_to_s3_with_path(file_path, s3_url, access_key, secret_key, destinatio
     # Parse the S3 URL into bucket, region, and endpoint
     bucket_name, region, endpoint_url = parse_s3_url(s3_url)
     
-    session = boto3.Session(
-        aws_access_key_id=access_key,
-        aws_secret_access_key=secret_key,
-        region_name=region
-    )
-    
-    client = session.client('s3', endpoint_url=endpoint_url)
+    client = get_s3_client(endpoint_url, region, access_key, secret_key)
 
     try:
         # Use destination_path if provided, otherwise use the basename
@@ -74,9 +103,9 @@ def upload_to_s3_with_path(file_path, s3_url, access_key, secret_key, destinatio
         
         logger.info(f"Uploading file to S3 with custom path: {file_path} -> {object_key}")
         
-        # Upload the file to the specified S3 bucket with the custom path
-        with open(file_path, 'rb') as data:
-            client.upload_fileobj(data, bucket_name, object_key, ExtraArgs={'ACL': 'public-read'})
+        # Upload the file to the specified S3 bucket with the custom path (multipart for large files)
+        client.upload_file(file_path, bucket_name, object_key,
+                           ExtraArgs={'ACL': 'public-read'}, Config=TRANSFER_CONFIG)
 
         file_url = f"{endpoint_url}/{bucket_name}/{object_key}"
         logger.info(f"File uploaded successfully to S3: {file_url}")
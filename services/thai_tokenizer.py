@@ -0,0 +1,93 @@
+"""
+Shared Thai word segmentation.
+
+All caption and subtitle paths tokenize Thai text through this module. Results
+are memoized in a bounded LRU cache keyed by the NFC-normalized text, since the
+same subtitle lines are tokenized several times per job (wrapping, line
+splitting, ASS conversion, alignment). warm_up() builds PyThaiNLP's dictionary
+trie ahead of the first request.
+"""
+
+import os
+import logging
+import unicodedata
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+try:
+    from pythainlp.tokenize import word_tokenize
+    PYTHAINLP_AVAILABLE = True
+except ImportError:
+    PYTHAINLP_AVAILABLE = False
+    logger.warning("PyThaiNLP not available. Thai word segmentation will be limited.")
+
+# Number of tokenized texts kept in memory per worker
+THAI_TOKEN_CACHE_SIZE = int(os.environ.get('THAI_TOKEN_CACHE_SIZE', 8192))
+
+DEFAULT_ENGINE = "newmm"
+
+
+def normalize(text):
+    return unicodedata.normalize('NFC', text)
+
+
+@lru_cache(maxsize=THAI_TOKEN_CACHE_SIZE)
+def _tokenize(text, engine):
+    return tuple(word_tokenize(text, engine=engine))
+
+
+def tokenize(text, engine=DEFAULT_ENGINE):
+    """
+    Split Thai text into words.
+
+    Returns:
+        List of words (a new list, so callers may modify it)
+
+    Raises:
+        ImportError: If PyThaiNLP is not installed
+    """
+    if not PYTHAINLP_AVAILABLE:
+        raise ImportError("PyThaiNLP is not installed")
+    if not text:
+        return []
+    return list(_tokenize(normalize(text), engine))
+
+
+def tokenize_batch(texts, engine=DEFAULT_ENGINE):
+    """Tokenize several texts; repeated texts are tokenized once."""
+    return [tokenize(text, engine) for text in texts]
+
+
+def tokenize_subtitles(subtitles, engine=DEFAULT_ENGINE):
+    """
+    Tokenize the content of every subtitle of a subtitle file in one call.
+
+    Args:
+        subtitles: srt.Subtitle objects, or the path of an SRT file
+
+    Returns:
+        List of word lists, one per subtitle
+    """
+    if isinstance(subtitles, str):
+        import srt
+        with open(subtitles, 'r', encoding='utf-8-sig') as f:
+            subtitles = list(srt.parse(f.read()))
+    return tokenize_batch([sub.content for sub in subtitles], engine)
+
+
+def warm_up():
+    """Load the tokenizer's dictionary, which otherwise happens on the first request."""
+    if not PYTHAINLP_AVAILABLE:
+        return
+    try:
+        word_tokenize("สวัสดีครับ", engine=DEFAULT_ENGINE)
+        logger.info("Thai word tokenizer is ready")
+    except Exception as e:
+        logger.warning(f"Failed to warm up the Thai word tokenizer: {str(e)}")
+
+
+def get_metrics():
+    """Return the size and hit counts of the tokenization cache."""
+    info = _tokenize.cache_info()
+    return {"entries": info.currsize, "hits": info.hits, "misses": info.misses}
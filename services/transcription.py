@@ -1,13 +1,4 @@
 import os
-try:
-    import whisper
-    WHISPER_AVAILABLE = True
-except (ImportError, TypeError) as e:
-    print(f"Warning: Could not import Whisper properly: {str(e)}")
-    print("Using dummy Whisper implementation for testing")
-    from whisper_patch import DummyWhisper as whisper
-    WHISPER_AVAILABLE = False
-
 import srt
 from datetime import timedelta
 try:
@@ -31,6 +22,9 @@ except (ImportError, TypeError) as e:
             return "DUMMY VTT CONTENT"
 
 from services.file_management import download_file
+from services.whisper_models import checkout_model
+from services.v1.media.vad import speech_only
+from services.v1.media.transcription_cache import cached_transcription
 import logging
 import uuid
 
@@ -44,23 +38,35 @@ STORAGE_PATH = "/tmp/"
 def process_transcription(media_url, output_type, max_chars=56, language=None,):
     """Transcribe media and return the transcript, SRT or ASS file path."""
     logger.info(f"Starting transcription for media URL: {media_url} with output type: {output_type}")
-    input_filename = download_file(media_url, os.path.join(STORAGE_PATH, 'input_media'))
+    input_filename = download_file(media_url, os.path.join(STORAGE_PATH, f"{uuid.uuid4()}_input_media"))
     logger.info(f"Downloaded media to local file: {input_filename}")
 
     try:
-        model = whisper.load_model("base")
-        logger.info("Loaded Whisper model")
+        def transcribe(media_path, **kwargs):
+            def run():
+                # Transcribe the speech only, then map the timestamps back to the media
+                with speech_only(media_path) as speech:
+                    # Whisper gets the decoded samples instead of running ffmpeg again
+                    samples = speech.samples()
+                    # Check out the warm "base" model only for the duration of the call
+                    with checkout_model("base") as model:
+                        result = model.transcribe(samples, **kwargs)
+                    speech.remap(result['segments'])
+                return result
+
+            return cached_transcription(media_path, run, "whisper", "base", language=kwargs.get('language'),
+                                        word_timestamps=kwargs.get('word_timestamps', False), options=kwargs)
 
         # result = model.transcribe(input_filename)
         # logger.info("Transcription completed")
 
         if output_type == 'transcript':
-            result = model.transcribe(input_filename, language=language)
+            result = transcribe(input_filename, language=language)
             output = result['text']
             logger.info("Generated transcript output")
         elif output_type in ['srt', 'vtt']:
 
-            result = model.transcribe(input_filename)
+            result = transcribe(input_filename)
             srt_subtitles = []
             for i, segment in enumerate(result['segments'], start=1):
                 start = timedelta(seconds=segment['start'])
@@ -79,7 +85,7 @@ def process_transcription(media_url, output_type, max_chars=56, language=None,):
             logger.info(f"Generated {output_type.upper()} output: {output}")
 
         elif output_type == 'ass':
-            result = model.transcribe(
+            result = transcribe(
                 input_filename,
                 word_timestamps=True,
                 task='transcribe',
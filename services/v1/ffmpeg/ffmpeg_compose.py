@@ -1,10 +1,11 @@
 import os
 import subprocess
-import json
 import logging
 import uuid
-import glob
-from services.file_management import download_file
+from services.file_management import download_files
+from services.ffmpeg_runner import run_ffmpeg
+from services.media_probe import probe_media
+from services.font_registry import get_font_registry
 
 # Set up logger
 logger = logging.getLogger(__name__)
@@ -57,29 +58,18 @@ def get_metadata(filename, metadata_requests, job_id):
         metadata['filesize'] = os.path.getsize(filename)
 
     if metadata_requests.get('encoder') or metadata_requests.get('duration') or metadata_requests.get('bitrate'):
-        ffprobe_command = [
-            'ffprobe',
-            '-v', 'quiet',
-            '-print_format', 'json',
-            '-show_format',
-            '-show_streams',
-            filename
-        ]
-        result = subprocess.run(ffprobe_command, capture_output=True, text=True)
-        probe_data = json.loads(result.stdout)
+        media_info = probe_media(filename)
         
         if metadata_requests.get('duration'):
-            metadata['duration'] = float(probe_data['format']['duration'])
+            metadata['duration'] = media_info.duration
         if metadata_requests.get('bitrate'):
-            metadata['bitrate'] = int(probe_data['format']['bit_rate'])
+            metadata['bitrate'] = media_info.bit_rate
         
         if metadata_requests.get('encoder'):
             metadata['encoder'] = {}
-            for stream in probe_data['streams']:
-                if stream['codec_type'] == 'video':
-                    metadata['encoder']['video'] = stream.get('codec_name', 'unknown')
-                elif stream['codec_type'] == 'audio':
-                    metadata['encoder']['audio'] = stream.get('codec_name', 'unknown')
+            for stream in media_info.streams:
+                if stream.codec_type in ('video', 'audio'):
+                    metadata['encoder'][stream.codec_type] = stream.codec_name or 'unknown'
 
     return metadata
 
@@ -88,58 +78,9 @@ def find_thai_font():
     Find an available Thai font on the system.
     Returns the path to the font file if found, or None if not found.
     """
-    # Common paths for Thai fonts
-    possible_paths = [
-        # Thai-specific fonts
-        "/usr/share/fonts/truetype/thai-tlwg/Sarabun*.ttf",
-        "/usr/share/fonts/truetype/tlwg/Sarabun*.ttf",
-        "/usr/share/fonts/TTF/Sarabun*.ttf",
-        "/usr/share/fonts/thai-tlwg/Sarabun*.ttf",
-        # General font directories
-        "/usr/share/fonts/truetype/*/Sarabun*.ttf",
-        "/usr/share/fonts/*/Sarabun*.ttf",
-        # Noto Sans Thai (alternative)
-        "/usr/share/fonts/truetype/noto/NotoSansThai*.ttf",
-        "/usr/share/fonts/noto-cjk/NotoSansThai*.ttf",
-        # Fallback to any Thai font
-        "/usr/share/fonts/**/Thai*.ttf",
-        "/usr/share/fonts/**/*Thai*.ttf"
-    ]
-    
-    # Try to find a Thai font
-    for path_pattern in possible_paths:
-        try:
-            matches = glob.glob(path_pattern, recursive=True)
-            if matches:
-                logger.info(f"Found Thai font: {matches[0]}")
-                return matches[0]
-        except Exception as e:
-            logger.warning(f"Error checking font path {path_pattern}: {str(e)}")
-    
-    # If glob doesn't work, try using find command
-    try:
-        result = subprocess.run(
-            ["find", "/usr/share/fonts", "-name", "*Thai*", "-o", "-name", "*Sarabun*", "-type", "f"],
-            capture_output=True, text=True, check=False
-        )
-        if result.stdout.strip():
-            font_path = result.stdout.strip().split("\n")[0]
-            logger.info(f"Found Thai font using find command: {font_path}")
-            return font_path
-    except Exception as e:
-        logger.warning(f"Error using find command to locate Thai font: {str(e)}")
-    
-    # Last resort - check if we can list any fonts
-    try:
-        result = subprocess.run(["fc-list"], capture_output=True, text=True, check=False)
-        if "Thai" in result.stdout or "Sarabun" in result.stdout:
-            for line in result.stdout.split("\n"):
-                if "Thai" in line or "Sarabun" in line:
-                    font_path = line.split(":")[0]
-                    logger.info(f"Found Thai font using fc-list: {font_path}")
-                    return font_path
-    except Exception as e:
-        logger.warning(f"Error using fc-list to locate Thai font: {str(e)}")
+    font = get_font_registry().default_font("thai")
+    if font:
+        return font.path
     
     logger.error("No Thai font found on the system")
     return None
@@ -169,40 +110,34 @@ def process_ffmpeg_compose(data, job_id):
         if "argument" in option and option["argument"] is not None:
             command.append(str(option["argument"]))
     
-    # Add inputs
-    input_paths = []
+    # Download all inputs concurrently before building the rest of the command
+    downloads = []
     for i, input_data in enumerate(data["inputs"]):
-        logger.info(f"Job {job_id}: Processing input {i+1}/{len(data['inputs'])}: {input_data['file_url']}")
-        
-        if "options" in input_data:
-            for option in input_data["options"]:
-                command.append(option["option"])
-                if "argument" in option and option["argument"] is not None:
-                    command.append(str(option["argument"]))
-        
         # Generate a unique filename for the downloaded file
         file_ext = os.path.splitext(os.path.basename(input_data["file_url"]))[1]
         if not file_ext:
             file_ext = ".mp4"  # Default extension if none is found
         
         unique_filename = f"{job_id}_input_{i}{file_ext}"
-        input_file_path = os.path.join(STORAGE_PATH, unique_filename)
+        downloads.append((input_data["file_url"], os.path.join(STORAGE_PATH, unique_filename)))
+    
+    try:
+        input_paths = download_files(downloads, job_id=job_id)
+    except Exception as e:
+        logger.error(f"Job {job_id}: Error downloading input files: {str(e)}")
+        raise
+    
+    # Add inputs
+    for i, (input_data, input_file_path) in enumerate(zip(data["inputs"], input_paths)):
+        logger.info(f"Job {job_id}: Adding input {i+1}/{len(data['inputs'])}: {input_file_path}")
         
-        logger.info(f"Job {job_id}: Downloading input file to {input_file_path}")
-        try:
-            # Download the file to the specific path
-            download_file(input_data["file_url"], input_file_path)
-            logger.info(f"Job {job_id}: Successfully downloaded input file to {input_file_path}")
-            
-            # Verify the file exists
-            if not os.path.exists(input_file_path):
-                raise FileNotFoundError(f"Downloaded file not found at {input_file_path}")
-            
-            input_paths.append(input_file_path)
-            command.extend(["-i", input_file_path])
-        except Exception as e:
-            logger.error(f"Job {job_id}: Error downloading input file: {str(e)}")
-            raise
+        if "options" in input_data:
+            for option in input_data["options"]:
+                command.append(option["option"])
+                if "argument" in option and option["argument"] is not None:
+                    command.append(str(option["argument"]))
+        
+        command.extend(["-i", input_file_path])
     
     # Add filters
     if data.get("filters"):
@@ -247,7 +182,7 @@ def process_ffmpeg_compose(data, job_id):
     # Execute FFmpeg command
     logger.info(f"Job {job_id}: Executing FFmpeg command: {' '.join(command)}")
     try:
-        result = subprocess.run(command, check=True, capture_output=True, text=True)
+        result = run_ffmpeg(command, job_id=job_id, label="compose")
         logger.info(f"Job {job_id}: FFmpeg command completed successfully")
         logger.debug(f"Job {job_id}: FFmpeg stdout: {result.stdout}")
     except subprocess.CalledProcessError as e:
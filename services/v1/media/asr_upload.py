@@ -0,0 +1,129 @@
+"""
+Compact audio for remote transcription APIs.
+
+OpenAI and Replicate only need speech, so instead of 16-bit WAV (about 1.9 MB
+per minute) or the original media (video included), uploads are mono Opus (or
+AAC) at a speech bitrate, encoded from the shared decoded audio. The bitrate is
+lowered when needed so the file stays under the provider's size limit.
+
+Encoded files are kept in the audio artifact cache, keyed by their source audio,
+format and bitrate, so the same audio sent to a second provider (or again after
+a failure) is not encoded twice. With the cache disabled they are encoded to
+temporary files that the caller removes.
+"""
+
+import os
+import hashlib
+import tempfile
+import logging
+import subprocess
+from services.v1.media.audio_artifacts import SAMPLE_RATE, artifact_cache, write_wav
+
+logger = logging.getLogger(__name__)
+
+# Upload format (opus, aac or wav) and its bitrate in bits per second
+ASR_UPLOAD_FORMAT = os.environ.get('ASR_UPLOAD_FORMAT', 'opus').lower()
+ASR_UPLOAD_BITRATE = int(os.environ.get('ASR_UPLOAD_BITRATE', 32000))
+# Largest file the transcription APIs accept (OpenAI allows 25 MB)
+ASR_UPLOAD_MAX_BYTES = int(os.environ.get('ASR_UPLOAD_MAX_BYTES', 25 * 1000 * 1000))
+
+# ffmpeg encoder arguments, file extension and lowest usable bitrate of each format
+UPLOAD_FORMATS = {
+    'opus': (['-c:a', 'libopus', '-application', 'voip', '-f', 'ogg'], '.ogg', 6000),
+    'aac': (['-c:a', 'aac', '-f', 'ipod'], '.m4a', 16000),
+    'wav': (None, '.wav', None),
+}
+
+# Share of the size limit the audio itself may use; the rest is container overhead
+SIZE_MARGIN = 0.95
+
+
+def upload_bitrate(duration, max_bytes=None, fmt=None):
+    """
+    Return the bitrate to encode audio of this duration with, in bits per second.
+
+    The configured ASR_UPLOAD_BITRATE, lowered to keep the file under max_bytes
+    but not below the lowest bitrate of the format.
+    """
+    fmt = fmt or ASR_UPLOAD_FORMAT
+    max_bytes = ASR_UPLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    lowest = UPLOAD_FORMATS[fmt][2]
+    bitrate = ASR_UPLOAD_BITRATE
+    if duration > 0 and max_bytes > 0:
+        bitrate = min(bitrate, int(max_bytes * 8 * SIZE_MARGIN / duration))
+    return max(bitrate, lowest)
+
+
+def _encode(pcm, output_path, codec_args, bitrate, start, end):
+    cmd = ['ffmpeg', '-nostdin', '-v', 'error', '-y', '-f', 's16le', '-ar', str(pcm.sample_rate), '-ac', '1']
+    if start:
+        # Seeking in raw PCM is exact to the sample
+        cmd += ['-ss', repr(start)]
+    if end is not None:
+        cmd += ['-t', repr(end - (start or 0))]
+    cmd += ['-i', pcm.path, *codec_args, '-b:a', str(bitrate), output_path]
+    subprocess.run(cmd, capture_output=True, check=True)
+
+
+def prepare_upload(pcm, source_key=None, max_bytes=None, start=None, end=None, private_paths=None):
+    """
+    Encode audio, or the part of it from start to end seconds, for upload to a transcription API.
+
+    Args:
+        pcm: PCMAudio to encode
+        source_key: Identifies the audio across calls (defaults to the PCM file,
+                    which is content-keyed for decoded media)
+        max_bytes: Size limit of the provider (default ASR_UPLOAD_MAX_BYTES)
+        start: Start of the part in seconds (default the beginning)
+        end: End of the part in seconds (default the end)
+        private_paths: List to which the path is appended when the file cannot
+                       be cached and is written to a temporary file instead
+
+    Returns:
+        Path of the encoded file (with the format's extension); it belongs to
+        the artifact cache and must not be modified or removed, unless it was
+        appended to private_paths, in which case the caller removes it
+
+    Raises:
+        ValueError: If ASR_UPLOAD_FORMAT is unknown
+        OSError: If the file cannot be stored
+        subprocess.CalledProcessError: If ffmpeg fails
+    """
+    if ASR_UPLOAD_FORMAT not in UPLOAD_FORMATS:
+        raise ValueError(f"Unknown ASR_UPLOAD_FORMAT {ASR_UPLOAD_FORMAT}; use one of {', '.join(UPLOAD_FORMATS)}")
+    codec_args, extension, _ = UPLOAD_FORMATS[ASR_UPLOAD_FORMAT]
+    max_bytes = ASR_UPLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    duration = (pcm.duration if end is None else end) - (start or 0)
+    bitrate = upload_bitrate(duration, max_bytes) if codec_args else None
+
+    # The extension is part of the key, so the file name tells the APIs its format
+    key = hashlib.sha256(
+        f"{source_key or pcm.path}:{start}:{end}:{ASR_UPLOAD_FORMAT}:{bitrate}:{SAMPLE_RATE}".encode('utf-8')
+    ).hexdigest() + extension
+
+    def write(tmp_path):
+        if codec_args:
+            _encode(pcm, tmp_path, codec_args, bitrate, start, end)
+        else:
+            write_wav(tmp_path, pcm.slice(start or 0, end))
+
+    with artifact_cache.lock(key):
+        path = artifact_cache.get_path(key)
+        if path is None:
+            path = artifact_cache.put(key, write)
+            if path is None:
+                fd, path = tempfile.mkstemp(prefix='upload_', suffix=extension)
+                os.close(fd)
+                try:
+                    write(path)
+                except BaseException:
+                    os.remove(path)
+                    raise
+                if private_paths is not None:
+                    private_paths.append(path)
+            size = os.path.getsize(path)
+            logger.info(f"Prepared {duration:.1f}s of audio for upload: {ASR_UPLOAD_FORMAT}"
+                        f"{f' at {bitrate // 1000} kb/s' if bitrate else ''}, {size / 1024 ** 2:.1f} MB")
+            if max_bytes and size > max_bytes:
+                logger.warning(f"Upload audio is {size} bytes, more than the provider limit of {max_bytes} bytes")
+    return path
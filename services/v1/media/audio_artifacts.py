@@ -0,0 +1,164 @@
+"""
+Decoded audio shared by the transcription stack.
+
+Fingerprinting, voice activity detection, chunking and Whisper itself each used
+to decode the media with their own ffmpeg run. load_pcm() decodes a media file
+once to raw 16 kHz mono 16-bit PCM, the format Whisper works on, and returns it
+memory-mapped as a NumPy array: every stage reads the same pages through the
+page cache, and slices are views rather than copies. The PCM files live in a
+DiskCache keyed by the media file's path, size and modification time, so they
+are shared by all workers (chunk worker processes map the same file by path)
+and bounded in size. A PCMAudio pins its cache entry for as long as it exists,
+so eviction by another worker cannot remove the file while a job uses it. When
+the cache is disabled (AUDIO_ARTIFACT_MAX_BYTES=0) or cannot store the PCM, it
+is decoded to a private temporary file instead, removed when the PCMAudio is
+closed or garbage collected.
+"""
+
+import os
+import wave
+import weakref
+import tempfile
+import hashlib
+import logging
+import subprocess
+import numpy as np
+from services.disk_cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+# Decoded audio of recent media; must be larger than the PCM of the longest input (about 115 MB per hour)
+AUDIO_ARTIFACT_DIR = os.environ.get('AUDIO_ARTIFACT_DIR', '/tmp/nca_audio_artifacts')
+AUDIO_ARTIFACT_MAX_BYTES = int(os.environ.get('AUDIO_ARTIFACT_MAX_BYTES', 4 * 1024 ** 3))
+
+SAMPLE_RATE = 16000
+
+# Samples written to a WAV file at a time
+WRITE_BLOCK_SAMPLES = SAMPLE_RATE * 60
+
+# Also holds the encoded upload audio of asr_upload
+artifact_cache = DiskCache(AUDIO_ARTIFACT_DIR, AUDIO_ARTIFACT_MAX_BYTES)
+
+
+class PCMAudio:
+    """16 kHz mono 16-bit PCM in a raw file, memory-mapped as a NumPy array."""
+
+    def __init__(self, path, sample_rate=SAMPLE_RATE, pin=None, owned=False):
+        """
+        Args:
+            path: Path of the raw PCM file
+            sample_rate: Sample rate of the PCM
+            pin: The file opened by DiskCache.pin() if it is a cache entry; it is
+                 kept open (and the entry pinned) as long as this object exists
+            owned: Remove the file on close() or when this object is garbage collected
+        """
+        self.path = path
+        self.sample_rate = sample_rate
+        self._pin = pin
+        self._finalizer = weakref.finalize(self, _remove_file, path) if owned else None
+        # np.memmap cannot map an empty file
+        if os.path.getsize(path):
+            self.samples = np.memmap(pin or path, dtype=np.int16, mode='r')
+        else:
+            self.samples = np.zeros(0, dtype=np.int16)
+
+    def __len__(self):
+        return len(self.samples)
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+    def _index(self, seconds):
+        return min(len(self.samples), max(0, int(round(seconds * self.sample_rate))))
+
+    def slice(self, start=0.0, end=None):
+        """Samples from start to end seconds, as a view of the mapped file."""
+        stop = len(self.samples) if end is None else self._index(end)
+        return self.samples[self._index(start):stop]
+
+    def to_float32(self, start=0.0, end=None):
+        """Samples from start to end seconds scaled to [-1, 1), the input Whisper's transcribe() takes."""
+        return self.slice(start, end).astype(np.float32) / 32768.0
+
+    def close(self):
+        """Remove the file if this object owns it; cached PCM is left to the cache."""
+        if self._finalizer is not None:
+            self._finalizer()
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Failed to remove decoded audio {path}: {str(e)}")
+
+
+def _decode(media_path, output_path):
+    cmd = ['ffmpeg', '-nostdin', '-v', 'error', '-y', '-i', media_path,
+           '-vn', '-ac', '1', '-ar', str(SAMPLE_RATE), '-f', 's16le', output_path]
+    subprocess.run(cmd, capture_output=True, check=True)
+
+
+def load_pcm(media_path):
+    """
+    Return the decoded audio of a local media file, decoding it on first use.
+
+    If the artifact cache is disabled or cannot store the PCM, the audio is
+    decoded to a temporary file that belongs to the returned PCMAudio.
+
+    Raises:
+        OSError: If the file does not exist or the PCM cannot be written
+        subprocess.CalledProcessError: If ffmpeg cannot decode the audio
+    """
+    stat = os.stat(media_path)
+    key = hashlib.sha256(
+        f"{os.path.realpath(media_path)}:{stat.st_size}:{stat.st_mtime_ns}:{SAMPLE_RATE}".encode('utf-8')
+    ).hexdigest()
+
+    # Stages that ask for the same media at the same time share one decode; the
+    # entry is pinned before the lock is released, so it cannot be evicted in between
+    if artifact_cache.enabled:
+        with artifact_cache.lock(key):
+            pin = artifact_cache.pin(key)
+            if pin is None:
+                if artifact_cache.put(key, lambda tmp_path: _decode(media_path, tmp_path)) is not None:
+                    pin = artifact_cache.pin(key)
+                if pin is not None:
+                    logger.info(f"Decoded the audio of {os.path.basename(media_path)}")
+        if pin is not None:
+            return PCMAudio(pin.name, pin=pin)
+        logger.warning(f"Could not store the decoded audio of {media_path} in {AUDIO_ARTIFACT_DIR}, "
+                       f"decoding it to a temporary file")
+
+    fd, path = tempfile.mkstemp(prefix='pcm_', suffix='.pcm')
+    os.close(fd)
+    try:
+        _decode(media_path, path)
+        pcm = PCMAudio(path, owned=True)
+    except BaseException:
+        _remove_file(path)
+        raise
+    logger.info(f"Decoded the audio of {os.path.basename(media_path)} to a private file")
+    return pcm
+
+
+def write_pcm(path, pieces, sample_rate=SAMPLE_RATE):
+    """Write sample arrays one after another to a raw PCM file and map it."""
+    with open(path, 'wb') as f:
+        for piece in pieces:
+            piece.tofile(f)
+    return PCMAudio(path, sample_rate)
+
+
+def write_wav(path, samples, sample_rate=SAMPLE_RATE):
+    """Write 16-bit mono samples to a WAV file, a block at a time."""
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        for first in range(0, len(samples), WRITE_BLOCK_SAMPLES):
+            f.writeframes(np.ascontiguousarray(samples[first:first + WRITE_BLOCK_SAMPLES]).tobytes())
+    return path
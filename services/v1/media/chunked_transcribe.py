@@ -0,0 +1,304 @@
+"""
+Chunked, parallel Whisper transcription for long media.
+
+The input is decoded once to the shared 16 kHz mono PCM artifact and cut into
+slightly overlapping chunks; a chunk is just a sample range of the
+memory-mapped file, which each worker maps itself, so no chunk files are
+written and no chunk is decoded again. The chunks are transcribed on a pool of
+worker processes, each holding its own warm copy of the model, and the results
+are stitched back together: every chunk owns
+the time range up to the middle of its overlap with the next one, and words that
+both chunks recognised around that cut are de-duplicated.
+"""
+
+import os
+import math
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, CancelledError, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from services.job_control import check_cancelled, on_cancel
+from services.v1.media.audio_artifacts import PCMAudio, load_pcm
+
+logger = logging.getLogger(__name__)
+
+# Chunk length and overlap between neighbouring chunks, in seconds
+TRANSCRIBE_CHUNK_SECONDS = int(os.environ.get('TRANSCRIBE_CHUNK_SECONDS', 300))
+TRANSCRIBE_CHUNK_OVERLAP = float(os.environ.get('TRANSCRIBE_CHUNK_OVERLAP', 2.0))
+
+# Torch threads per worker process, and number of worker processes (0 = CPU cores / threads)
+TRANSCRIBE_THREADS_PER_PROCESS = int(os.environ.get('TRANSCRIBE_THREADS_PER_PROCESS', 4))
+TRANSCRIBE_PROCESSES = int(os.environ.get('TRANSCRIBE_PROCESSES', 0))
+
+# A last chunk shorter than this (or than the overlap) is merged into the one before it
+MIN_LAST_CHUNK_SECONDS = 5.0
+
+# Maximum number of repeated words removed at a chunk boundary
+MAX_DUPLICATE_WORDS = 5
+
+# How often a job waiting for its chunks checks whether it was cancelled, in seconds
+CANCEL_POLL_SECONDS = 1.0
+
+_pools = {}
+_pool_stop_events = {}  # {model_name: event that tells the pool's workers to skip their remaining chunks}
+_pool_users = {}  # {model_name: number of jobs using the pool}
+_pools_lock = threading.Lock()
+
+# Model loaded in a worker process by _init_worker, and the stop event of its pool
+_worker_model = None
+_worker_stop = None
+
+
+def get_process_count():
+    """Number of transcription worker processes to use."""
+    if TRANSCRIBE_PROCESSES > 0:
+        return TRANSCRIBE_PROCESSES
+    return max(1, (os.cpu_count() or 1) // max(1, TRANSCRIBE_THREADS_PER_PROCESS))
+
+
+def _init_worker(model_name, threads, stop_event):
+    """Load the model once per worker process."""
+    global _worker_model, _worker_stop
+    import torch
+    import whisper
+    torch.set_num_threads(threads)
+    _worker_model = whisper.load_model(model_name)
+    _worker_stop = stop_event
+
+
+def _transcribe_in_worker(pcm_path, start, end, options):
+    # Chunks already handed to a worker when its pool was stopped are skipped
+    if _worker_stop.is_set():
+        return None
+    return _worker_model.transcribe(PCMAudio(pcm_path).to_float32(start, end), **options)
+
+
+def _get_pool(model_name):
+    """Process pool for a model size, kept alive so workers stay warm between jobs."""
+    with _pools_lock:
+        pool = _pools.get(model_name)
+        if pool is None:
+            processes = get_process_count()
+            logger.info(f"Starting {processes} transcription processes for Whisper model {model_name}")
+            # spawn, because forking a process that already runs threads (and maybe torch) is unsafe
+            context = multiprocessing.get_context('spawn')
+            stop_event = context.Event()
+            pool = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(model_name, TRANSCRIBE_THREADS_PER_PROCESS, stop_event)
+            )
+            _pools[model_name] = pool
+            _pool_stop_events[model_name] = stop_event
+        return pool
+
+
+def _reset_pool(model_name):
+    with _pools_lock:
+        pool = _pools.pop(model_name, None)
+        _pool_stop_events.pop(model_name, None)
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+
+def _cancel_chunks(model_name, futures):
+    """Stop the chunks of a cancelled job."""
+    for future in futures:
+        future.cancel()
+    with _pools_lock:
+        pool = _pools.get(model_name)
+        # Chunks already handed to the workers are only stopped when no other job
+        # is using the pool; the next job then starts a fresh one
+        if pool is None or _pool_users.get(model_name, 0) > 1:
+            return
+        del _pools[model_name]
+        stop_event = _pool_stop_events.pop(model_name)
+    # Workers finish the chunk they are on, skip the rest and exit
+    stop_event.set()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _wait_for_result(future):
+    """Wait for a chunk, raising JobCancelled as soon as the job is cancelled."""
+    while True:
+        try:
+            return future.result(timeout=CANCEL_POLL_SECONDS)
+        except TimeoutError:
+            check_cancelled()
+
+
+def plan_chunks(duration, chunk_seconds=TRANSCRIBE_CHUNK_SECONDS, overlap=TRANSCRIBE_CHUNK_OVERLAP):
+    """
+    Split [0, duration) into overlapping chunks.
+
+    A remainder shorter than MIN_LAST_CHUNK_SECONDS (or the overlap) is not
+    worth a model call of its own, and a few seconds of audio tend to come
+    back as hallucinated text, so it is added to the last chunk instead.
+
+    Returns:
+        (chunks, cuts): chunks is a list of (start, length) tuples; cuts[i] is the
+        time at which chunk i hands over to chunk i + 1 (the middle of their overlap)
+    """
+    count = max(1, math.ceil(duration / chunk_seconds))
+    if count > 1 and duration - (count - 1) * chunk_seconds < max(MIN_LAST_CHUNK_SECONDS, overlap):
+        count -= 1
+    chunks = []
+    cuts = []
+    for i in range(count):
+        start = i * chunk_seconds
+        length = duration - start if i == count - 1 else min(chunk_seconds + overlap, duration - start)
+        chunks.append((start, length))
+        if i < count - 1:
+            cuts.append(start + chunk_seconds + overlap / 2)
+    return chunks, cuts
+
+
+def _normalize_word(word):
+    return word.strip().strip('.,!?;:"\'()[]').lower()
+
+
+def _shift_segment(segment, offset):
+    segment = dict(segment)
+    segment['start'] += offset
+    segment['end'] += offset
+    if segment.get('words'):
+        segment['words'] = [dict(word, start=word['start'] + offset, end=word['end'] + offset)
+                            for word in segment['words']]
+    return segment
+
+
+def _set_words(segment, words):
+    segment['words'] = words
+    segment['start'] = words[0]['start']
+    segment['end'] = words[-1]['end']
+    segment['text'] = ''.join(word['word'] for word in words)
+
+
+def _drop_repeated_words(previous, segment, overlap):
+    """
+    Remove words at the start of segment that repeat the words at the end of previous.
+
+    Returns:
+        False if nothing is left of segment
+    """
+    prev_words = previous.get('words')
+    words = segment.get('words')
+    if not prev_words or not words:
+        # Segment level only: drop an exact repeat of the previous segment
+        return not (_normalize_word(previous['text']) == _normalize_word(segment['text'])
+                    and segment['start'] - previous['start'] < overlap)
+
+    for count in range(min(MAX_DUPLICATE_WORDS, len(prev_words), len(words)), 0, -1):
+        tail = [_normalize_word(word['word']) for word in prev_words[-count:]]
+        head = [_normalize_word(word['word']) for word in words[:count]]
+        if tail == head and words[0]['start'] - prev_words[-count]['start'] < overlap:
+            words = words[count:]
+            break
+
+    if not words:
+        return False
+    if len(words) != len(segment['words']):
+        _set_words(segment, words)
+    return True
+
+
+def stitch_results(chunk_results, cuts, overlap=TRANSCRIBE_CHUNK_OVERLAP):
+    """
+    Merge per-chunk Whisper results into one result with absolute timestamps.
+
+    Args:
+        chunk_results: List of (chunk_start, whisper_result) in chunk order
+        cuts: Hand-over times between neighbouring chunks, from plan_chunks
+        overlap: Chunk overlap in seconds
+
+    Returns:
+        Dict with 'text' and 'segments', like whisper's transcribe()
+    """
+    segments = []
+    for i, (offset, result) in enumerate(chunk_results):
+        low = cuts[i - 1] if i > 0 else float('-inf')
+        high = cuts[i] if i < len(cuts) else float('inf')
+        first_in_chunk = True
+
+        for segment in result.get('segments', []):
+            segment = _shift_segment(segment, offset)
+            words = segment.get('words')
+            if words:
+                # Keep only the words inside the time range this chunk owns
+                kept = [word for word in words if low <= word['start'] < high]
+                if not kept:
+                    continue
+                if len(kept) != len(words):
+                    _set_words(segment, kept)
+            elif not low <= segment['start'] < high:
+                continue
+
+            if first_in_chunk and i > 0 and segments:
+                if not _drop_repeated_words(segments[-1], segment, overlap):
+                    continue
+            first_in_chunk = False
+            segments.append(segment)
+
+    for index, segment in enumerate(segments):
+        segment['id'] = index
+
+    return {
+        'text': ''.join(segment['text'] for segment in segments),
+        'segments': segments
+    }
+
+
+def transcribe_chunked(audio, model_name, options, job_id=None):
+    """
+    Transcribe media in parallel chunks.
+
+    Args:
+        audio: Local path of the media file, or its PCMAudio
+        model_name: Whisper model size
+        options: Keyword arguments for whisper's transcribe()
+        job_id: Job ID for logging
+
+    Returns:
+        Dict with 'text' and 'segments' (absolute timestamps)
+    """
+    pcm = audio if isinstance(audio, PCMAudio) else load_pcm(audio)
+    duration = pcm.duration
+    chunks, cuts = plan_chunks(duration)
+    processes = get_process_count()
+    logger.info(f"Job {job_id}: Transcribing {duration:.1f}s in {len(chunks)} chunks on {processes} processes")
+
+    if processes == 1:
+        # Not worth a worker process: transcribe in-process with the shared warm model
+        from services.whisper_models import checkout_model
+        results = []
+        with checkout_model(model_name) as model:
+            for start, length in chunks:
+                check_cancelled()
+                results.append(model.transcribe(pcm.to_float32(start, start + length), **options))
+    else:
+        pool = _get_pool(model_name)
+        with _pools_lock:
+            _pool_users[model_name] = _pool_users.get(model_name, 0) + 1
+        futures = []
+        try:
+            with on_cancel(lambda: _cancel_chunks(model_name, futures)):
+                # Workers map the PCM file themselves, so only the sample range is sent to them
+                for start, length in chunks:
+                    check_cancelled()
+                    futures.append(pool.submit(_transcribe_in_worker, pcm.path, start, start + length, options))
+                results = [_wait_for_result(future) for future in futures]
+                # Chunks skipped by stopped workers come back empty
+                check_cancelled()
+        except (BrokenProcessPool, CancelledError):
+            check_cancelled()
+            # A worker died (e.g. out of memory); start a fresh pool for the next job
+            _reset_pool(model_name)
+            raise
+        finally:
+            with _pools_lock:
+                _pool_users[model_name] -= 1
+
+    logger.info(f"Job {job_id}: Transcribed all {len(chunks)} chunks")
+    return stitch_results([(start, result) for (start, _), result in zip(chunks, results)], cuts)
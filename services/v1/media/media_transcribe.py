@@ -1,12 +1,17 @@
 import os
-import whisper
 import srt
+import numpy as np
 import json
 import unicodedata
 import re
 from datetime import timedelta
 from whisper.utils import WriteSRT, WriteVTT
 from services.file_management import download_file
+from services.whisper_models import checkout_model
+from services.v1.media.chunked_transcribe import transcribe_chunked
+from services.v1.media.vad import speech_only
+from services.v1.media.transcription_cache import cached_transcription
+from services.thai_tokenizer import tokenize
 import logging
 from typing import Dict, List, Optional, Union, Any
 
@@ -94,7 +99,7 @@ def postprocess_thai_text(text):
     
     # Try to use PyThaiNLP for more accurate Thai text processing if available
     try:
-        from pythainlp import word_tokenize, correct
+        from pythainlp import correct
         
         # First try to correct misspelled Thai words
         text = correct(text)
@@ -111,7 +116,7 @@ def postprocess_thai_text(text):
             if current_segment and is_thai_char != current_is_thai:
                 if current_is_thai:
                     # Process Thai segment with PyThaiNLP
-                    tokens = word_tokenize(current_segment)
+                    tokens = tokenize(current_segment)
                     processed_segment = ''.join(tokens)
                     segments.append(processed_segment)
                 else:
@@ -127,7 +132,7 @@ def postprocess_thai_text(text):
         # Process the last segment
         if current_segment:
             if current_is_thai:
-                tokens = word_tokenize(current_segment)
+                tokens = tokenize(current_segment)
                 processed_segment = ''.join(tokens)
                 segments.append(processed_segment)
             else:
@@ -158,7 +163,7 @@ def postprocess_thai_text(text):
 def process_transcribe_media(media_url, task, include_text, include_srt, include_segments, word_timestamps, response_type, language, job_id):
     """Transcribe or translate media and return the transcript/translation, SRT or VTT file path."""
     logger.info(f"Starting {task} for media URL: {media_url}")
-    input_filename = download_file(media_url, os.path.join(STORAGE_PATH, 'input_media'))
+    input_filename = download_file(media_url, os.path.join(STORAGE_PATH, f"{job_id}_input_media"))
     
     if not input_filename:
         raise ValueError("Failed to download media file")
@@ -167,12 +172,6 @@ def process_transcribe_media(media_url, task, include_text, include_srt, include
     is_thai = language and language.lower() == 'th'
     
     try:
-        # Load the Whisper model
-        model = whisper.load_model("medium")
-        
-        # Transcribe or translate the audio
-        logger.info(f"Running {task} with model: medium")
-        
         # Set options based on the task and language
         options = {
             "task": task,
@@ -183,94 +182,48 @@ def process_transcribe_media(media_url, task, include_text, include_srt, include
         if word_timestamps:
             options["word_timestamps"] = True
         
-        # For Thai language, optimize processing to prevent timeouts
+        logger.info(f"Running {task} with model: medium")
+        
+        def transcribe():
+            # Long silences are cut out before transcription, and the timestamps mapped back
+            with speech_only(input_filename, job_id=job_id) as speech:
+                # For Thai language, optimize processing to prevent timeouts
+                if is_thai:
+                    logger.info("Thai language detected - transcribing in parallel chunks")
+                    result = transcribe_chunked(speech.pcm, "medium", options, job_id=job_id)
+                else:
+                    # For non-Thai languages, use the standard approach with a warm model,
+                    # fed the decoded samples so Whisper does not run ffmpeg again
+                    samples = speech.samples()
+                    with checkout_model("medium") as model:
+                        result = model.transcribe(samples, **options)
+                speech.remap(result['segments'])
+            return result
+
+        # The same audio is often transcribed more than once (retries, captions)
+        result = cached_transcription(input_filename, transcribe, "whisper", "medium", language=language,
+                                      word_timestamps=word_timestamps, options={"task": task}, job_id=job_id)
+
         if is_thai:
-            logger.info("Thai language detected - using optimized processing settings")
-            # Use smaller audio segments for Thai to prevent timeouts
-            # Instead of using chunk_size which isn't supported, we'll manually split the audio
-            from pydub import AudioSegment
-            import tempfile
-            
-            # Load the audio file
-            audio = AudioSegment.from_file(input_filename)
-            
-            # Split into 5-minute chunks
-            chunk_length_ms = 5 * 60 * 1000  # 5 minutes in milliseconds
-            
-            # Create temporary directory for chunks
-            temp_dir = tempfile.mkdtemp()
-            chunk_files = []
-            
-            # Split the audio into chunks
-            for i, chunk_start in enumerate(range(0, len(audio), chunk_length_ms)):
-                chunk_end = min(chunk_start + chunk_length_ms, len(audio))
-                chunk = audio[chunk_start:chunk_end]
-                
-                # Save the chunk to a temporary file
-                chunk_file = os.path.join(temp_dir, f"chunk_{i}.wav")
-                chunk.export(chunk_file, format="wav")
-                chunk_files.append(chunk_file)
-                
-                logger.info(f"Created audio chunk {i+1}: {chunk_start/1000}s to {chunk_end/1000}s")
-            
-            # Process each chunk
-            all_segments = []
-            full_text = ""
-            
-            for i, chunk_file in enumerate(chunk_files):
-                logger.info(f"Processing chunk {i+1}/{len(chunk_files)}")
-                chunk_result = model.transcribe(chunk_file, **options)
+            for segment in result['segments']:
+                # Apply a small offset to improve synchronization with voice-over
+                voice_over_offset = -0.2  # 200ms earlier to match voice-over delay in caption_video.py
                 
-                # Adjust timestamps for this chunk
-                time_offset = i * chunk_length_ms / 1000  # in seconds
+                # Apply the offset but ensure we don't go below 0
+                segment['start'] = max(0, segment['start'] + voice_over_offset)
+                segment['end'] = max(segment['start'] + 0.8, segment['end'] + voice_over_offset)  # Ensure minimum 800ms duration
                 
-                for segment in chunk_result['segments']:
-                    # Apply a small offset to improve synchronization with voice-over
-                    voice_over_offset = -0.2  # 200ms earlier to match voice-over delay in caption_video.py
-                    
-                    # Apply the offset but ensure we don't go below 0
-                    segment['start'] = max(0, segment['start'] + time_offset + voice_over_offset)
-                    segment['end'] = max(segment['start'] + 0.8, segment['end'] + time_offset + voice_over_offset)  # Ensure minimum 800ms duration
-                    
-                    # Ensure maximum duration of 2.0 seconds for better synchronization
-                    if segment['end'] - segment['start'] > 2.0:
-                        segment['end'] = segment['start'] + 2.0
-                    
-                    # Adjust word timestamps if present
-                    if word_timestamps and 'words' in segment:
-                        for word in segment['words']:
-                            if 'start' in word:
-                                word['start'] = max(0, word['start'] + time_offset + voice_over_offset)
-                            if 'end' in word:
-                                word['end'] = max(word.get('start', 0) + 0.1, word['end'] + time_offset + voice_over_offset)
-                
-                # Add segments to the full list
-                all_segments.extend(chunk_result['segments'])
+                # Ensure maximum duration of 2.0 seconds for better synchronization
+                if segment['end'] - segment['start'] > 2.0:
+                    segment['end'] = segment['start'] + 2.0
                 
-                # Add text to the full text
-                full_text += chunk_result['text'] + " "
-            
-            # Create a complete result
-            result = {
-                'text': full_text.strip(),
-                'segments': all_segments
-            }
-            
-            # Clean up temporary files
-            for chunk_file in chunk_files:
-                try:
-                    os.remove(chunk_file)
-                except Exception as e:
-                    logger.warning(f"Failed to remove temporary chunk file {chunk_file}: {str(e)}")
-            
-            try:
-                os.rmdir(temp_dir)
-            except Exception as e:
-                logger.warning(f"Failed to remove temporary directory {temp_dir}: {str(e)}")
-            
-        else:
-            # For non-Thai languages, use the standard approach
-            result = model.transcribe(input_filename, **options)
+                # Adjust word timestamps if present
+                if word_timestamps and 'words' in segment:
+                    for word in segment['words']:
+                        if 'start' in word:
+                            word['start'] = max(0, word['start'] + voice_over_offset)
+                        if 'end' in word:
+                            word['end'] = max(word.get('start', 0) + 0.1, word['end'] + voice_over_offset)
         
         # Process Thai text to ensure proper encoding and spacing
         if is_thai:
@@ -345,17 +298,16 @@ def process_transcribe_media(media_url, task, include_text, include_srt, include
         
         # Return results based on response_type
         if response_type == 'cloud':
-            # Upload files to cloud storage
+            # Upload files to cloud storage at the same time
+            from services.cloud_storage import upload_files_concurrently
+            file_types = list(output_files)
+            urls = upload_files_concurrently(
+                [(output_files[file_type], f"transcriptions/{os.path.basename(output_files[file_type])}") for file_type in file_types]
+            )
             cloud_urls = {}
-            for file_type, file_path in output_files.items():
-                try:
-                    from services.cloud_storage import upload_to_cloud_storage
-                    cloud_path = f"transcriptions/{os.path.basename(file_path)}"
-                    cloud_url = upload_to_cloud_storage(file_path, cloud_path)
-                    cloud_urls[file_type] = cloud_url
-                except Exception as e:
-                    logger.error(f"Failed to upload {file_type} file to cloud storage: {str(e)}")
-                    cloud_urls[file_type] = f"file://{file_path}"
+            for file_type, cloud_url in zip(file_types, urls):
+                # Fall back to the local path for files that failed to upload
+                cloud_urls[file_type] = cloud_url or f"file://{output_files[file_type]}"
             
             return {
                 'cloud_urls': cloud_urls,
@@ -417,6 +369,43 @@ def format_timestamp(seconds):
     milliseconds = int((seconds - int(seconds)) * 1000)
     return f"{hours:02d}:{minutes:02d}:{int(seconds):02d},{milliseconds:03d}"
 
+def project_script_timings(script_segments, segments, language="th", min_duration=1.0):
+    """
+    Time script segments at the average speaking rate of the transcription.
+    
+    Each line is shown for its length divided by the characters-per-second rate of
+    the whole transcription, lines follow one another from 300ms after the first
+    segment starts, and Thai is paced slower (with extra time for long lines) to
+    stay in sync with the voice-over. Durations are computed as arrays and the
+    start times with one cumulative sum instead of a loop over the lines.
+    
+    Args:
+        script_segments: Script text split into subtitle lines
+        segments: Transcription segments with 'start' and 'end'
+        language: Language code of the script
+        min_duration: Minimum display time of a line, in seconds
+    
+    Returns:
+        (starts, ends): numpy arrays of times in seconds, one per script segment
+    """
+    is_thai = language.lower() in ['th', 'thai']
+    lengths = np.array([len(seg) for seg in script_segments], dtype=float)
+    
+    total_duration = segments[-1]['end'] - segments[0]['start']
+    chars_per_second = lengths.sum() / total_duration
+    if is_thai:
+        # Thai text needs a much slower rate for better synchronization with voice-over
+        chars_per_second = chars_per_second * 0.65
+    
+    durations = np.maximum(lengths / chars_per_second, min_duration)
+    if is_thai:
+        # Add 10% more time for each 30 characters over the first 30
+        durations += np.where(lengths > 30, (lengths - 30) / 30 * 0.1 * durations, 0.0)
+    
+    # A small delay at the beginning ensures subtitles don't start too early
+    ends = np.cumsum(np.concatenate(([segments[0]['start'] + 0.3], durations)))
+    return ends[:-1], ends[1:]
+
 def align_script_with_segments(script_text, segments, output_srt_path, language="th"):
     """
     Align a pre-written script with the timing information from transcription segments.
@@ -461,53 +450,12 @@ def align_script_with_segments(script_text, segments, output_srt_path, language=
     if len(script_segments) < len(segments) / 2:
         logger.info("Script has fewer segments than transcription, performing character-level alignment")
         # Character-level alignment approach
+        starts, ends = project_script_timings(script_segments, segments, language)
         
-        # Flatten the script into a single string
-        flat_script = ''.join(script_segments)
-        
-        # Calculate total duration of the transcription
-        total_duration = segments[-1]['end'] - segments[0]['start']
-        
-        # Calculate average character duration
-        chars_per_second = len(flat_script) / total_duration
-        
-        # Adjust the character rate for Thai language to account for diacritics and tone marks
-        if language.lower() in ['th', 'thai']:
-            # Thai text needs a much slower rate for better synchronization with voice-over
-            chars_per_second = chars_per_second * 0.65  # Slow down the rate by 35%
-        
-        # Assign timing to each script segment based on its length
-        current_time = segments[0]['start']
-        
-        # Add a small delay at the beginning to ensure subtitles don't start too early
-        current_time += 0.3  # 300ms delay
-        
-        for i, segment in enumerate(script_segments):
-            start_time = current_time
-            # Calculate duration based on segment length
-            segment_duration = len(segment) / chars_per_second
-            # Ensure minimum duration
-            segment_duration = max(segment_duration, 1.0)
-            
-            # For Thai language, add extra time for longer segments
-            if language.lower() in ['th', 'thai'] and len(segment) > 30:
-                # Add 10% more time for each 30 characters over the first 30
-                extra_time = (len(segment) - 30) / 30 * 0.1 * segment_duration
-                segment_duration += extra_time
-            
-            end_time = start_time + segment_duration
-            
-            # Create SRT subtitle entry
-            srt_content.append(
-                srt.Subtitle(
-                    index=i+1,
-                    start=timedelta(seconds=start_time),
-                    end=timedelta(seconds=end_time),
-                    content=segment
-                )
-            )
-            
-            current_time = end_time
+        srt_content = [
+            srt.Subtitle(index=i + 1, start=timedelta(seconds=start), end=timedelta(seconds=end), content=segment)
+            for i, (segment, start, end) in enumerate(zip(script_segments, starts.tolist(), ends.tolist()))
+        ]
     else:
         # If script segments are comparable to transcription segments,
         # use a more direct mapping approach
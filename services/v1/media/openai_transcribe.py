@@ -1,11 +1,19 @@
 import os
 import json
+import time
+import uuid
 import requests
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from services import http_client
 import logging
 from datetime import timedelta
 import srt
 from urllib.parse import urlparse
 from services.file_management import download_file
+from services.v1.media.vad import speech_only, split_at_silence
+from services.job_control import check_cancelled
+from services.v1.media.transcription_cache import cached_transcription
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -13,6 +21,12 @@ logger = logging.getLogger(__name__)
 # Set the default local storage directory
 STORAGE_PATH = "/tmp/"
 
+# Audio longer than this many seconds is sent in chunks split at silences (0 = one request)
+OPENAI_CHUNK_SECONDS = int(os.environ.get('OPENAI_CHUNK_SECONDS', 300))
+# Chunk requests in flight at once, and retries of a failed chunk
+OPENAI_CHUNK_CONCURRENCY = int(os.environ.get('OPENAI_CHUNK_CONCURRENCY', 6))
+OPENAI_CHUNK_RETRIES = int(os.environ.get('OPENAI_CHUNK_RETRIES', 3))
+
 # Function to get OpenAI API key securely
 def get_openai_api_key():
     """
@@ -47,6 +61,157 @@ def get_openai_api_key():
         logger.error(f"Error accessing Secret Manager: {str(e)}")
         return None
 
+class OpenAIRequestError(Exception):
+    """The OpenAI API answered with an error status."""
+
+    def __init__(self, status_code, text):
+        super().__init__(f"OpenAI API request failed: {text}")
+        self.status_code = status_code
+
+
+def _post_audio(upload_path, api_key, language, response_format):
+    """Send one audio file to the OpenAI transcription API and return the parsed response."""
+    headers = {
+        "Authorization": f"Bearer {api_key}"
+    }
+    with open(upload_path, "rb") as audio_file:
+        files = {
+            # The file name tells the API the audio format
+            "file": (os.path.basename(upload_path), audio_file),
+            "model": (None, "whisper-1"),
+            "response_format": (None, response_format),
+        }
+
+        # Add language if specified
+        if language:
+            files["language"] = (None, language)
+
+        # Transcription can take minutes for long media, so allow a long read timeout
+        response = http_client.post("https://api.openai.com/v1/audio/transcriptions", headers=headers, files=files,
+                                    timeout=(http_client.HTTP_CONNECT_TIMEOUT, 900))
+
+    if response.status_code != 200:
+        logger.error(f"OpenAI API request failed with status code {response.status_code}: {response.text}")
+        raise OpenAIRequestError(response.status_code, response.text)
+    return response.json()
+
+
+def _post_with_retries(upload_path, api_key, language, response_format, label):
+    """
+    _post_audio, retried with exponential backoff on rate limits, server errors and
+    connection failures (the shared HTTP client does not retry POST requests).
+    """
+    for attempt in range(OPENAI_CHUNK_RETRIES + 1):
+        check_cancelled()
+        try:
+            return _post_audio(upload_path, api_key, language, response_format)
+        except (OpenAIRequestError, requests.RequestException) as e:
+            retryable = not isinstance(e, OpenAIRequestError) or e.status_code in http_client.RETRY_STATUS_CODES
+            if not retryable or attempt == OPENAI_CHUNK_RETRIES:
+                raise
+            delay = 2 ** attempt
+            logger.warning(f"OpenAI request for {label} failed, retrying in {delay}s: {str(e)}")
+            time.sleep(delay)
+
+
+def _shift_times(items, offset):
+    return [dict(item, start=item['start'] + offset, end=item['end'] + offset)
+            if 'start' in item and 'end' in item else dict(item)
+            for item in items or []]
+
+
+def merge_chunk_results(results, offsets):
+    """
+    Merge the API responses of consecutive chunks into one response.
+
+    Args:
+        results: Parsed responses in chunk order
+        offsets: Start time of every chunk in seconds
+
+    Returns:
+        dict: A response like the API's for the whole audio; its duration is that
+        of the chunks joined, i.e. of the audio sent rather than the original media
+    """
+    merged = dict(results[0]) if results else {}
+    merged["text"] = " ".join(result.get("text", "").strip() for result in results if result.get("text", "").strip())
+    segments = []
+    words = []
+    for result, offset in zip(results, offsets):
+        for segment in _shift_times(result.get("segments"), offset):
+            if segment.get("words"):
+                segment["words"] = _shift_times(segment["words"], offset)
+            segment["id"] = len(segments)
+            segments.append(segment)
+        words.extend(_shift_times(result.get("words"), offset))
+    if any("segments" in result for result in results):
+        merged["segments"] = segments
+    if any("words" in result for result in results):
+        merged["words"] = words
+    if all(isinstance(result.get("duration"), (int, float)) for result in results):
+        merged["duration"] = sum(result["duration"] for result in results)
+    return merged
+
+
+def _transcribe_chunks(speech, cuts, api_key, language, response_format, job_id=None):
+    """Send the chunks between cuts concurrently and merge their results."""
+    starts = [0.0] + list(cuts)
+    ends = list(cuts) + [None]
+    logger.info(f"Job {job_id}: Sending {len(starts)} chunks to OpenAI, {OPENAI_CHUNK_CONCURRENCY} at a time")
+
+    def transcribe_chunk(index, start, end):
+        # Each chunk is encoded in its worker, so encoding overlaps with the uploads
+        upload_path = speech.upload_path(start, end)
+        return _post_with_retries(upload_path, api_key, language, response_format,
+                                  f"chunk {index + 1}/{len(starts)}")
+
+    with ThreadPoolExecutor(max_workers=max(1, min(OPENAI_CHUNK_CONCURRENCY, len(starts)))) as executor:
+        futures = [
+            # Run in a copy of the job's context, so cancelling the job stops the chunk
+            executor.submit(contextvars.copy_context().run, transcribe_chunk, i, start, end)
+            for i, (start, end) in enumerate(zip(starts, ends))
+        ]
+        try:
+            results = [future.result() for future in futures]
+        except Exception:
+            # Don't start chunks that are still waiting once one has failed for good
+            for future in futures:
+                future.cancel()
+            raise
+    return merge_chunk_results(results, starts)
+
+
+def _request_transcription(input_filename, api_key, language, response_format, job_id=None):
+    """
+    Send a local media file to the OpenAI transcription API.
+
+    Audio longer than OPENAI_CHUNK_SECONDS is split at silences and the chunks are
+    sent concurrently.
+
+    Returns:
+        dict: The parsed API response
+    """
+    # Upload only the speech, as compact audio instead of the media itself,
+    # and map the timestamps back afterwards
+    with speech_only(input_filename, job_id=job_id) as speech:
+        cuts = []
+        # Only JSON responses can be merged
+        if OPENAI_CHUNK_SECONDS > 0 and response_format in ("json", "verbose_json"):
+            cuts = split_at_silence(speech.pcm.samples, OPENAI_CHUNK_SECONDS)
+
+        logger.info(f"Sending request to OpenAI Whisper API with language: {language}")
+        if cuts:
+            result = _transcribe_chunks(speech, cuts, api_key, language, response_format, job_id)
+        else:
+            result = _post_with_retries(speech.upload_path(), api_key, language, response_format, input_filename)
+        if isinstance(result.get("duration"), (int, float)):
+            # The API measured the speech it was sent, not the media
+            result["duration"] = speech.original_duration
+
+    speech.remap(result.get("segments"))
+    speech.remap(result.get("words"))
+    logger.info("Successfully received response from OpenAI Whisper API")
+    return result
+
 def transcribe_with_openai(media_url, language="th", response_format="verbose_json", job_id=None, preserve_media=False):
     """
     Transcribe media using OpenAI's Whisper API.
@@ -80,8 +245,8 @@ def transcribe_with_openai(media_url, language="th", response_format="verbose_js
         if not file_extension or file_extension.lower() not in ['.flac', '.m4a', '.mp3', '.mp4', '.mpeg', '.mpga', '.oga', '.ogg', '.wav', '.webm']:
             file_extension = '.mp4'
             
-        # Create a filename with the proper extension
-        input_filename = os.path.join(STORAGE_PATH, f'input_media{file_extension}')
+        # Create a filename with the proper extension, unique to the job so concurrent requests don't collide
+        input_filename = os.path.join(STORAGE_PATH, f'{job_id or uuid.uuid4()}_input_media{file_extension}')
         
         # Download the file
         input_filename = download_file(media_url, input_filename)
@@ -92,33 +257,12 @@ def transcribe_with_openai(media_url, language="th", response_format="verbose_js
         logger.info(f"Using local file: {input_filename}")
     
     try:
-        # Prepare the API request
-        headers = {
-            "Authorization": f"Bearer {api_key}"
-        }
-        
-        files = {
-            "file": open(input_filename, "rb"),
-            "model": (None, "whisper-1"),
-            "response_format": (None, response_format),
-        }
-        
-        # Add language if specified
-        if language:
-            files["language"] = (None, language)
-        
-        # Make the API request
-        logger.info(f"Sending request to OpenAI Whisper API with language: {language}")
-        response = requests.post("https://api.openai.com/v1/audio/transcriptions", headers=headers, files=files)
-        
-        # Check if the request was successful
-        if response.status_code != 200:
-            logger.error(f"OpenAI API request failed with status code {response.status_code}: {response.text}")
-            raise Exception(f"OpenAI API request failed: {response.text}")
-        
-        # Parse the response
-        result = response.json()
-        logger.info("Successfully received response from OpenAI Whisper API")
+        # Results are cached by the sound of the media, so repeated requests skip the API
+        result = cached_transcription(
+            input_filename,
+            lambda: _request_transcription(input_filename, api_key, language, response_format, job_id),
+            "openai", "whisper-1", language=language, options={"response_format": response_format}, job_id=job_id
+        )
         
         # Generate output files
         if not job_id:
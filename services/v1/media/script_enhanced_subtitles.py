@@ -11,13 +11,9 @@ from services.cloud_storage import upload_to_cloud_storage
 import re
 import tempfile
 
-# Import PyThaiNLP for better Thai word segmentation
-try:
-    from pythainlp.tokenize import word_tokenize
-    PYTHAINLP_AVAILABLE = True
-except ImportError:
-    PYTHAINLP_AVAILABLE = False
-    logging.warning("PyThaiNLP not available. Thai word segmentation will be limited.")
+# Shared, memoized Thai word segmentation
+from services.thai_tokenizer import tokenize, PYTHAINLP_AVAILABLE
+from services.v1.media.thai_aligner import align_thai_script
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -147,7 +143,7 @@ def segment_thai_text(text: str) -> List[str]:
     if PYTHAINLP_AVAILABLE:
         try:
             # Use PyThaiNLP's neural network model for better segmentation
-            words = word_tokenize(text, engine="newmm")
+            words = tokenize(text)
             return words
         except Exception as e:
             logger.warning(f"Error using PyThaiNLP for word segmentation: {str(e)}")
@@ -159,6 +155,10 @@ def align_thai_text(script_text: str, subtitles: List[srt.Subtitle]) -> List[srt
     """
     Align Thai script text with subtitles using improved Thai-specific alignment.
     
+    The whole script is aligned against the whole transcription in one pass
+    (see services/v1/media/thai_aligner.py), so the subtitles follow the script
+    in order and long scripts align in linear time.
+    
     Args:
         script_text: The Thai script text
         subtitles: List of subtitle objects
@@ -166,117 +166,7 @@ def align_thai_text(script_text: str, subtitles: List[srt.Subtitle]) -> List[srt
     Returns:
         List of aligned subtitle objects
     """
-    # Create a list to store the aligned subtitles
-    aligned_subtitles = []
-    
-    # Current position in the script text
-    script_pos = 0
-    
-    # Pre-segment the script text for better alignment
-    segmented_script = segment_thai_text(script_text)
-    script_with_markers = " ".join(segmented_script)
-    
-    # Process each subtitle
-    for i, sub in enumerate(subtitles):
-        # Skip empty subtitles
-        if not sub.content.strip():
-            aligned_subtitles.append(sub)
-            continue
-        
-        # Normalize and clean the subtitle content
-        sub_content = unicodedata.normalize('NFC', sub.content.strip())
-        
-        # Segment the subtitle content
-        segmented_sub = segment_thai_text(sub_content)
-        
-        # Find the best match for this subtitle in the script
-        best_match = ""
-        best_score = 0
-        best_pos = script_pos
-        
-        # Try different window sizes around the current position
-        # Use a larger window for better context
-        window_size = max(len(sub_content) * 10, 200)  # Increased window size
-        start_pos = max(0, script_pos - window_size)
-        end_pos = min(len(script_text), script_pos + len(sub_content) + window_size)
-        
-        search_text = script_text[start_pos:end_pos]
-        
-        # Use a combination of approaches for better matching
-        
-        # 1. First try exact matching for short segments
-        if len(sub_content) < 20:
-            exact_match_pos = search_text.find(sub_content)
-            if exact_match_pos >= 0:
-                best_match = sub_content
-                best_score = 1.0
-                best_pos = start_pos + exact_match_pos
-        
-        # 2. If no exact match, use difflib with higher threshold
-        if not best_match:
-            # Use difflib to find the best match with improved algorithm
-            matcher = difflib.SequenceMatcher(None, sub_content, search_text)
-            match = matcher.find_longest_match(0, len(sub_content), 0, len(search_text))
-            
-            if match.size > 0:
-                match_score = match.size / len(sub_content)
-                if match_score > 0.5:  # Increased threshold from default
-                    best_match = search_text[match.b:match.b + match.size]
-                    best_score = match_score
-                    best_pos = start_pos + match.b
-        
-        # 3. If still no good match, try word-level matching
-        if not best_match or best_score < 0.7:
-            # Try matching individual words
-            best_word_matches = []
-            for word in segmented_sub:
-                if word in search_text:
-                    word_pos = search_text.find(word)
-                    best_word_matches.append((word, start_pos + word_pos))
-            
-            if best_word_matches:
-                # Use the script text between the first and last matched word
-                if len(best_word_matches) > 1:
-                    first_match = min(best_word_matches, key=lambda x: x[1])
-                    last_match = max(best_word_matches, key=lambda x: x[1])
-                    first_pos = first_match[1]
-                    last_pos = last_match[1] + len(last_match[0])
-                    
-                    if last_pos - first_pos < len(sub_content) * 2:  # Reasonable length check
-                        best_match = script_text[first_pos:last_pos]
-                        best_score = 0.8  # Consider this a good match
-                        best_pos = first_pos
-        
-        # If we found a good match, use it
-        if best_match and best_score >= 0.5:
-            # Create a new subtitle with the matched script text but keep the timing
-            new_sub = srt.Subtitle(
-                index=sub.index,
-                start=sub.start,
-                end=sub.end,
-                content=best_match
-            )
-            aligned_subtitles.append(new_sub)
-            
-            # Update the position for the next search
-            script_pos = best_pos + len(best_match)
-        else:
-            # If no good match found, keep the original subtitle
-            # But try to clean it up a bit
-            cleaned_content = sub_content
-            # Remove common hallucination patterns
-            cleaned_content = re.sub(r'minecraft', '', cleaned_content)
-            cleaned_content = re.sub(r'and\s*$', '', cleaned_content)
-            
-            new_sub = srt.Subtitle(
-                index=sub.index,
-                start=sub.start,
-                end=sub.end,
-                content=cleaned_content
-            )
-            aligned_subtitles.append(new_sub)
-    
-    return aligned_subtitles
+    return align_thai_script(script_text, subtitles)
 
 def align_standard_text(script_text: str, subtitles: List[srt.Subtitle]) -> List[srt.Subtitle]:
     """
@@ -0,0 +1,292 @@
+"""
+Global script-to-transcript alignment for Thai.
+
+The whole script is aligned against the whole transcript in one pass, over
+characters (Thai has no spaces between words, so characters are the natural
+unit). Whitespace and punctuation are ignored and Latin text is lowercased.
+
+1. Anchors: character n-grams that occur exactly once in the script range and
+   exactly once in the transcript range are matched.
+2. The longest increasing subsequence of the anchors keeps the alignment
+   monotonic; anchors out of order (repeated phrases, hallucinations) drop out.
+3. The gaps between anchors are aligned the same way, first with the same
+   n-gram size (a phrase repeated in the text may be unique within a gap),
+   then with smaller ones, and equal characters at the edges of a gap are
+   matched directly.
+
+Every step is linear in the size of the range, so the whole alignment takes
+O(n log n) time instead of a SequenceMatcher per subtitle. The subtitle
+boundaries in the transcript are then mapped onto the script (interpolating
+between matched characters) and snapped to Thai word boundaries; each subtitle
+gets the script text between its boundaries and keeps its timing.
+
+When too little of the transcript matches for a global alignment, every
+subtitle is matched on its own by the words it shares with the script near the
+previous match, and subtitles without such a match are kept with common Whisper
+hallucinations removed.
+"""
+
+import re
+import bisect
+import logging
+import unicodedata
+from typing import List, Tuple
+import srt
+from services.thai_tokenizer import tokenize, PYTHAINLP_AVAILABLE
+
+logger = logging.getLogger(__name__)
+
+# N-gram sizes for anchors, largest first
+ANCHOR_SIZES = (8, 4, 2)
+# Below this share of matched transcript characters the script is considered
+# unrelated to the transcript as a whole, and subtitles are matched one by one
+MIN_COVERAGE = 0.3
+# Subtitle boundaries move at most this many characters to reach a word boundary
+WORD_SNAP_CHARS = 6
+# Whisper output that is not in the audio: a stray "minecraft" and a trailing "and"
+HALLUCINATION_PATTERNS = (re.compile(r'minecraft'), re.compile(r'and\s*$'))
+
+
+def _units(text: str) -> Tuple[str, List[int]]:
+    """Return the characters used for alignment and their positions in text."""
+    chars = []
+    positions = []
+    for i, c in enumerate(text):
+        if c.isspace() or unicodedata.category(c)[0] in ('P', 'Z', 'C'):
+            continue
+        chars.append(c.lower())
+        positions.append(i)
+    return ''.join(chars), positions
+
+
+def _unique_grams(text: str, lo: int, hi: int, k: int) -> dict:
+    """Map every k-gram of text[lo:hi] to its position, or -1 if it occurs more than once."""
+    grams = {}
+    for i in range(lo, hi - k + 1):
+        gram = text[i:i + k]
+        grams[gram] = -1 if gram in grams else i
+    return grams
+
+
+def _longest_increasing_chain(pairs: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Longest subsequence of (t, s) pairs, sorted by t, in which s increases too."""
+    tails = []      # s value at the end of the best chain of each length
+    tail_index = []
+    previous = [-1] * len(pairs)
+    for i, (_, s) in enumerate(pairs):
+        n = bisect.bisect_left(tails, s)
+        if n == len(tails):
+            tails.append(s)
+            tail_index.append(i)
+        else:
+            tails[n] = s
+            tail_index[n] = i
+        previous[i] = tail_index[n - 1] if n > 0 else -1
+    chain = []
+    i = tail_index[-1] if tail_index else -1
+    while i >= 0:
+        chain.append(pairs[i])
+        i = previous[i]
+    chain.reverse()
+    return chain
+
+
+def align_characters(script: str, transcript: str) -> List[Tuple[int, int]]:
+    """
+    Match characters of the transcript to characters of the script.
+
+    Returns:
+        (transcript_index, script_index) pairs, increasing in both
+    """
+    matches = []
+    # Ranges still to align: (s_lo, s_hi, t_lo, t_hi, index into ANCHOR_SIZES)
+    stack = [(0, len(script), 0, len(transcript), 0)]
+    while stack:
+        s_lo, s_hi, t_lo, t_hi, size_index = stack.pop()
+
+        # Equal characters at both edges of the range
+        while s_lo < s_hi and t_lo < t_hi and script[s_lo] == transcript[t_lo]:
+            matches.append((t_lo, s_lo))
+            s_lo += 1
+            t_lo += 1
+        while s_lo < s_hi and t_lo < t_hi and script[s_hi - 1] == transcript[t_hi - 1]:
+            s_hi -= 1
+            t_hi -= 1
+            matches.append((t_hi, s_hi))
+
+        if s_lo >= s_hi or t_lo >= t_hi or size_index >= len(ANCHOR_SIZES):
+            continue
+
+        k = ANCHOR_SIZES[size_index]
+        script_grams = _unique_grams(script, s_lo, s_hi, k)
+        transcript_grams = _unique_grams(transcript, t_lo, t_hi, k)
+        pairs = sorted(
+            (t, script_grams[gram]) for gram, t in transcript_grams.items()
+            if t >= 0 and script_grams.get(gram, -1) >= 0
+        )
+        chain = _longest_increasing_chain(pairs)
+
+        # Overlapping anchors (neighbouring n-grams of one matching run) are merged
+        anchors = []
+        for t, s in chain:
+            if anchors and t - anchors[-1][0] == s - anchors[-1][1] and t < anchors[-1][0] + anchors[-1][2] + 1:
+                anchors[-1][2] = t + k - anchors[-1][0]
+            elif not anchors or (t >= anchors[-1][0] + anchors[-1][2] and s >= anchors[-1][1] + anchors[-1][2]):
+                anchors.append([t, s, k])
+
+        if not anchors:
+            stack.append((s_lo, s_hi, t_lo, t_hi, size_index + 1))
+            continue
+
+        cur_s, cur_t = s_lo, t_lo
+        for t, s, length in anchors:
+            stack.append((cur_s, s, cur_t, t, size_index))
+            matches.extend((t + j, s + j) for j in range(length))
+            cur_s, cur_t = s + length, t + length
+        stack.append((cur_s, s_hi, cur_t, t_hi, size_index))
+
+    matches.sort()
+    return matches
+
+
+def _project(boundary: int, matched_t: List[int], matched_s: List[int], transcript_len: int, script_len: int) -> int:
+    """Map a position in the transcript to a position in the script."""
+    i = bisect.bisect_left(matched_t, boundary)
+    if i < len(matched_t) and matched_t[i] == boundary:
+        return matched_s[i]
+    prev_t, prev_s = (matched_t[i - 1], matched_s[i - 1]) if i > 0 else (-1, -1)
+    next_t, next_s = (matched_t[i], matched_s[i]) if i < len(matched_t) else (transcript_len, script_len)
+    # Spread the unmatched characters between the neighbouring matches evenly
+    span_t = next_t - prev_t - 1
+    span_s = next_s - prev_s - 1
+    return prev_s + 1 + round((boundary - prev_t - 1) * span_s / span_t) if span_t > 0 else prev_s + 1
+
+
+def _word_boundaries(script_text: str, positions: List[int]) -> List[int]:
+    """Unit indexes at which a script word starts."""
+    if not PYTHAINLP_AVAILABLE:
+        # Without segmentation only spaces mark word boundaries
+        return [i for i in range(1, len(positions)) if positions[i] - positions[i - 1] > 1]
+    boundaries = []
+    offset = 0
+    for word in tokenize(script_text):
+        offset += len(word)
+        boundaries.append(bisect.bisect_left(positions, offset))
+    return sorted(set(boundaries))
+
+
+def _snap(cut: int, boundaries: List[int]) -> int:
+    i = bisect.bisect_left(boundaries, cut)
+    candidates = [boundaries[j] for j in (i - 1, i) if 0 <= j < len(boundaries)]
+    if not candidates:
+        return cut
+    nearest = min(candidates, key=lambda b: abs(b - cut))
+    return nearest if abs(nearest - cut) <= WORD_SNAP_CHARS else cut
+
+
+def clean_hallucinations(text: str) -> str:
+    """Remove common Whisper hallucinations from transcribed text."""
+    for pattern in HALLUCINATION_PATTERNS:
+        text = pattern.sub('', text)
+    return text
+
+
+def _words(text: str) -> List[str]:
+    if PYTHAINLP_AVAILABLE:
+        return [word for word in tokenize(text) if word.strip()]
+    return text.split()
+
+
+def align_by_words(script_text: str, subtitles: List[srt.Subtitle]) -> List[srt.Subtitle]:
+    """
+    Match every subtitle on its own to the script span between the first and last
+    of its words found near the end of the previous match.
+
+    Used when the global alignment finds too little in common; subtitles without
+    a match keep their text, cleaned of common hallucinations.
+    """
+    aligned = []
+    script_pos = 0
+    for sub in subtitles:
+        content = unicodedata.normalize('NFC', sub.content.strip())
+        if not content:
+            aligned.append(sub)
+            continue
+
+        window = max(len(content) * 10, 200)
+        start_pos = max(0, script_pos - window)
+        search_text = script_text[start_pos:script_pos + len(content) + window]
+        found = [(start_pos + search_text.find(word), word) for word in _words(content) if word in search_text]
+
+        if len(found) > 1:
+            first_pos = min(found)[0]
+            last_pos, last_word = max(found)
+            last_pos += len(last_word)
+            # The span must be of a plausible length for the subtitle
+            if last_pos - first_pos < len(content) * 2:
+                aligned.append(srt.Subtitle(index=sub.index, start=sub.start, end=sub.end,
+                                            content=script_text[first_pos:last_pos]))
+                script_pos = last_pos
+                continue
+
+        aligned.append(srt.Subtitle(index=sub.index, start=sub.start, end=sub.end,
+                                    content=clean_hallucinations(content)))
+    return aligned
+
+
+def align_thai_script(script_text: str, subtitles: List[srt.Subtitle]) -> List[srt.Subtitle]:
+    """
+    Replace the text of the subtitles with the matching spans of the script, keeping their timing.
+
+    Args:
+        script_text: The script (NFC-normalized)
+        subtitles: Transcribed subtitles, in order
+
+    Returns:
+        List of aligned subtitle objects
+    """
+    script, script_positions = _units(script_text)
+
+    transcript_parts = []
+    starts = []
+    length = 0
+    for sub in subtitles:
+        units, _ = _units(unicodedata.normalize('NFC', sub.content))
+        starts.append(length)
+        transcript_parts.append(units)
+        length += len(units)
+    transcript = ''.join(transcript_parts)
+
+    if not script or not transcript:
+        return list(subtitles)
+
+    matches = align_characters(script, transcript)
+    coverage = len(matches) / len(transcript)
+    logger.info(f"Aligned {len(matches)} of {len(transcript)} transcript characters to the script ({coverage:.0%})")
+    if coverage < MIN_COVERAGE:
+        logger.warning("Script does not match the transcription as a whole, matching the subtitles one by one")
+        return align_by_words(script_text, subtitles)
+
+    matched_t = [t for t, _ in matches]
+    matched_s = [s for _, s in matches]
+    boundaries = _word_boundaries(script_text, script_positions)
+
+    # The first subtitle starts at the beginning of the script and the last ends at
+    # its end, so the whole script is used
+    cuts = [0]
+    for start in starts[1:]:
+        cut = _snap(_project(start, matched_t, matched_s, len(transcript), len(script)), boundaries)
+        cuts.append(min(len(script), max(cut, cuts[-1])))
+    cuts.append(len(script))
+
+    # Script positions of the unit indexes, with one past the end for the last cut
+    text_positions = script_positions + [len(script_text)]
+
+    aligned = []
+    for i, sub in enumerate(subtitles):
+        content = script_text[text_positions[cuts[i]]:text_positions[cuts[i + 1]]].strip()
+        if not content:
+            # Nothing of the script falls into this subtitle (e.g. an empty or unmatched line)
+            content = clean_hallucinations(sub.content)
+        aligned.append(srt.Subtitle(index=sub.index, start=sub.start, end=sub.end, content=content))
+    return aligned
@@ -0,0 +1,147 @@
+"""
+Persistent cache of transcription results.
+
+The same voice-over is often transcribed several times: by /v1/media/transcribe,
+again for the script-enhanced captions, and again when a job is retried. Results
+are stored on disk as JSON, keyed by a fingerprint of the decoded audio (not the
+URL or the container, so a re-upload of the same sound hits the cache) together
+with the provider, model, language, word_timestamps, the VAD settings and any
+other options that change the output. The cache is a DiskCache, so it is shared by all workers on
+the node, kept across restarts and bounded in size.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+import subprocess
+from collections import OrderedDict
+from services.disk_cache import DiskCache
+from services.job_control import check_cancelled
+from services.v1.media.audio_artifacts import load_pcm
+from services.v1.media import vad
+
+logger = logging.getLogger(__name__)
+
+# Shared by all workers and kept across restarts; TRANSCRIPTION_CACHE_MAX_BYTES=0 disables it
+TRANSCRIPTION_CACHE_DIR = os.environ.get('TRANSCRIPTION_CACHE_DIR', '/tmp/nca_transcription_cache')
+TRANSCRIPTION_CACHE_MAX_BYTES = int(os.environ.get('TRANSCRIPTION_CACHE_MAX_BYTES', 512 * 1024 ** 2))
+
+# Bump when the stored results change shape (or the audio preparation changes them)
+TRANSCRIPTION_CACHE_VERSION = 2
+
+# Fingerprints of local files kept in memory, keyed by path, size and modification time
+FINGERPRINT_CACHE_SIZE = 256
+
+_cache = DiskCache(TRANSCRIPTION_CACHE_DIR, TRANSCRIPTION_CACHE_MAX_BYTES)
+
+_fingerprints = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def audio_fingerprint(media_path):
+    """
+    Return the sha256 hex digest of the decoded audio of a media file.
+
+    Files with the same sound have the same fingerprint, whatever their
+    container, video stream or metadata.
+
+    Raises:
+        OSError, subprocess.CalledProcessError: If the audio cannot be decoded
+    """
+    stat = os.stat(media_path)
+    key = (os.path.realpath(media_path), stat.st_size, stat.st_mtime_ns)
+    with _lock:
+        fingerprint = _fingerprints.get(key)
+        if fingerprint is not None:
+            _fingerprints.move_to_end(key)
+            return fingerprint
+
+    # The decoded audio is kept, so the transcription that follows a miss reuses it
+    fingerprint = hashlib.sha256(load_pcm(media_path).samples).hexdigest()
+
+    with _lock:
+        _fingerprints[key] = fingerprint
+        while len(_fingerprints) > FINGERPRINT_CACHE_SIZE:
+            _fingerprints.popitem(last=False)
+    return fingerprint
+
+
+def _cache_key(fingerprint, provider, model, language, word_timestamps, options):
+    settings = {
+        "version": TRANSCRIPTION_CACHE_VERSION,
+        "audio": fingerprint,
+        "provider": provider,
+        "model": model,
+        "language": language,
+        "word_timestamps": bool(word_timestamps),
+        "options": options or {},
+        # Providers transcribe the speech regions found by VAD, so its settings change the result
+        "vad": [vad.VAD_ENABLED, vad.VAD_PADDING, vad.VAD_MIN_SILENCE, vad.VAD_THRESHOLD_DB, vad.VAD_MIN_SAVING]
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def cached_transcription(media_path, transcribe, provider, model, language=None, word_timestamps=False,
+                         options=None, job_id=None):
+    """
+    Return the cached transcription of a media file, or transcribe it and cache the result.
+
+    Args:
+        media_path: Local path of the media file
+        transcribe: Function without arguments that transcribes media_path and
+                    returns a JSON-serializable result
+        provider: Transcription service, e.g. "whisper", "openai" or "replicate"
+        model: Model name or version
+        language: Language code, or None for automatic detection
+        word_timestamps: Whether the result has word-level timestamps
+        options: Other settings that change the result (task, response format, ...)
+        job_id: Job ID for logging
+
+    Returns:
+        The result of transcribe(), or a copy of the result of an earlier call
+    """
+    if not _cache.enabled:
+        return transcribe()
+
+    try:
+        fingerprint = audio_fingerprint(media_path)
+    except (OSError, subprocess.CalledProcessError) as e:
+        logger.warning(f"Job {job_id}: Could not fingerprint {media_path}, not using the transcription cache: {str(e)}")
+        return transcribe()
+    key = _cache_key(fingerprint, provider, model, language, word_timestamps, options)
+
+    # Concurrent requests for the same audio wait here and then hit the cache; a job
+    # cancelled while another one transcribes the audio stops waiting
+    with _cache.lock(key, wait=check_cancelled):
+        data = _cache.get_bytes(key)
+        if data is not None:
+            try:
+                result = json.loads(data.decode('utf-8'))
+                with _lock:
+                    _stats["hits"] += 1
+                logger.info(f"Job {job_id}: Using cached {provider} transcription of {os.path.basename(media_path)}")
+                return result
+            except ValueError as e:
+                logger.warning(f"Job {job_id}: Ignoring unreadable transcription cache entry {key}: {str(e)}")
+
+        with _lock:
+            _stats["misses"] += 1
+        result = transcribe()
+
+        try:
+            data = json.dumps(result, ensure_ascii=False).encode('utf-8')
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Job {job_id}: Could not cache the transcription: {str(e)}")
+            return result
+        _cache.put_bytes(key, data)
+
+    return result
+
+
+def get_metrics():
+    """Return the hit counts of the transcription cache."""
+    with _lock:
+        return {"hits": _stats["hits"], "misses": _stats["misses"]}
@@ -1,14 +1,14 @@
 import os
 import ffmpeg
 import requests
-from services.file_management import download_file
+from services.file_management import download_file, MediaInput
 
 # Set the default local storage directory
 STORAGE_PATH = "/tmp/"
 
 def process_media_to_mp3(media_url, job_id, bitrate='128k', webhook_url=None):
     """Convert media to MP3 format with specified bitrate."""
-    input_filename = download_file(media_url, os.path.join(STORAGE_PATH, f"{job_id}_input"))
+    media_input = MediaInput(media_url, os.path.join(STORAGE_PATH, f"{job_id}_input"))
     output_filename = f"{job_id}.mp3"
     output_path = os.path.join(STORAGE_PATH, output_filename)
 
@@ -16,12 +16,12 @@ def process_media_to_mp3(media_url, job_id, bitrate='128k', webhook_url=None):
         # Convert media file to MP3 with specified bitrate
         (
             ffmpeg
-            .input(input_filename)
+            .input(media_input.source, **media_input.options)
             .output(output_path, acodec='libmp3lame', audio_bitrate=bitrate)
             .overwrite_output()
             .run(capture_stdout=True, capture_stderr=True)
         )
-        os.remove(input_filename)
+        media_input.cleanup()
         print(f"Conversion successful: {output_path} with bitrate {bitrate}")
 
         # Ensure the output file exists locally before attempting upload
@@ -0,0 +1,305 @@
+"""
+Energy-based voice activity detection ahead of transcription.
+
+The 16 kHz mono PCM of the media comes from the shared audio artifacts, so it
+is decoded only once. Per 20 ms frame the RMS energy (in dB) and the
+zero-crossing rate are computed with NumPy; frames louder than
+an adaptive threshold above the noise floor count as speech, except for
+broadband noise (hiss, wind), which crosses zero far more often than speech and
+must be clearly louder to count. Runs of speech frames are padded, and pauses
+shorter than VAD_MIN_SILENCE are kept, so only long silences are removed.
+
+The speech regions are joined into shorter audio that is sent to the model,
+and a SpeechMap translates the timestamps of the result back to the original
+timeline.
+"""
+
+import os
+import logging
+import tempfile
+import subprocess
+from contextlib import contextmanager
+import numpy as np
+from services.v1.media.audio_artifacts import SAMPLE_RATE, load_pcm, write_pcm
+from services.v1.media.asr_upload import prepare_upload
+
+logger = logging.getLogger(__name__)
+
+# Remove long silences before transcription (set to false to always send the full audio)
+VAD_ENABLED = os.environ.get('VAD_ENABLED', 'true').lower() == 'true'
+# Silence kept around every speech region, and the shortest pause that is removed, in seconds
+VAD_PADDING = float(os.environ.get('VAD_PADDING', 0.3))
+VAD_MIN_SILENCE = float(os.environ.get('VAD_MIN_SILENCE', 1.0))
+# Frames this many dB above the noise floor count as speech
+VAD_THRESHOLD_DB = float(os.environ.get('VAD_THRESHOLD_DB', 12))
+# The full audio is used unless at least this many seconds are removed
+VAD_MIN_SAVING = float(os.environ.get('VAD_MIN_SAVING', 5))
+
+FRAME_SECONDS = 0.02
+# Frames quieter than this are silence however quiet the noise floor is
+ABSOLUTE_FLOOR_DB = -60.0
+# Speech rarely crosses zero on more than this share of samples; noise does
+NOISE_ZCR = 0.45
+# Extra loudness noisy frames need to count as speech
+NOISE_EXTRA_DB = 6.0
+# Runs of speech frames shorter than this are clicks, not speech
+MIN_SPEECH_SECONDS = 0.1
+# Frames analysed at a time (one minute)
+FEATURE_BLOCK_FRAMES = 3000
+
+
+def frame_features(samples, sample_rate=SAMPLE_RATE):
+    """
+    Return the energy in dBFS and the zero-crossing rate of every frame.
+
+    Works through the samples a block at a time, so memory use does not grow
+    with the length of the audio. Trailing samples that do not fill a frame are
+    ignored.
+    """
+    frame_length = int(sample_rate * FRAME_SECONDS)
+    count = len(samples) // frame_length
+    energy = np.empty(count, dtype=np.float32)
+    zcr = np.empty(count, dtype=np.float32)
+    for first in range(0, count, FEATURE_BLOCK_FRAMES):
+        last = min(count, first + FEATURE_BLOCK_FRAMES)
+        frames = samples[first * frame_length:last * frame_length].reshape(-1, frame_length).astype(np.float32) / 32768.0
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        energy[first:last] = 20 * np.log10(np.maximum(rms, 1e-10))
+        signs = np.signbit(frames)
+        zcr[first:last] = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (frame_length - 1)
+    return energy, zcr
+
+
+def _runs(mask):
+    """Start and end (exclusive) indexes of the runs of True in a boolean array."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def detect_speech(samples, sample_rate=SAMPLE_RATE, padding=None, min_silence=None):
+    """
+    Find the speech regions of PCM audio.
+
+    Args:
+        samples: Mono PCM samples (int16)
+        sample_rate: Sample rate of samples
+        padding: Seconds of silence kept around every region (default VAD_PADDING)
+        min_silence: Pauses shorter than this stay inside a region (default VAD_MIN_SILENCE)
+
+    Returns:
+        List of (start, end) times in seconds, sorted and not overlapping
+    """
+    padding = VAD_PADDING if padding is None else padding
+    min_silence = VAD_MIN_SILENCE if min_silence is None else min_silence
+    duration = len(samples) / sample_rate
+
+    energy, zcr = frame_features(samples, sample_rate)
+    if not len(energy):
+        return []
+
+    # The quietest tenth of the frames tells the noise floor of the recording
+    floor = np.percentile(energy, 10)
+    threshold = max(floor + VAD_THRESHOLD_DB, ABSOLUTE_FLOOR_DB)
+    speech = (energy > threshold) & ((zcr < NOISE_ZCR) | (energy > threshold + NOISE_EXTRA_DB))
+
+    starts, ends = _runs(speech)
+    long_enough = (ends - starts) * FRAME_SECONDS >= MIN_SPEECH_SECONDS
+    starts = np.maximum(starts[long_enough] * FRAME_SECONDS - padding, 0.0)
+    ends = np.minimum(ends[long_enough] * FRAME_SECONDS + padding, duration)
+    if not len(starts):
+        return []
+
+    # Join regions separated by less than min_silence
+    keep = np.concatenate(([True], starts[1:] - ends[:-1] >= min_silence))
+    merged_ends = np.maximum.reduceat(ends, np.flatnonzero(keep))
+    return [(float(s), float(e)) for s, e in zip(starts[keep], merged_ends)]
+
+
+def split_at_silence(samples, chunk_seconds, search_seconds=None, sample_rate=SAMPLE_RATE):
+    """
+    Choose cut points that split audio into chunks of at most chunk_seconds.
+
+    Each cut is the quietest frame in the last search_seconds (default a tenth
+    of chunk_seconds) before the chunk would get too long, so words are not cut.
+
+    Returns:
+        Sorted cut times in seconds, not including 0 and the end
+    """
+    search_seconds = chunk_seconds / 10 if search_seconds is None else search_seconds
+    energy, _ = frame_features(samples, sample_rate)
+    duration = len(samples) / sample_rate
+    cuts = []
+    previous = 0.0
+    while duration - previous > chunk_seconds:
+        target = previous + chunk_seconds
+        first = int(max(previous + FRAME_SECONDS, target - search_seconds) / FRAME_SECONDS)
+        last = max(first + 1, int(target / FRAME_SECONDS))
+        quietest = first + int(np.argmin(energy[first:last]))
+        previous = quietest * FRAME_SECONDS
+        cuts.append(previous)
+    return cuts
+
+
+class SpeechMap:
+    """
+    Maps times in the joined speech audio back to the original media.
+
+    With no regions the map is the identity, for audio that was sent unchanged.
+    """
+
+    def __init__(self, regions=None):
+        self.regions = list(regions or [])
+        if self.regions:
+            self._starts = np.array([start for start, _ in self.regions])
+            self._lengths = np.array([end - start for start, end in self.regions])
+            # Start of every region in the joined audio
+            self._offsets = np.concatenate(([0.0], np.cumsum(self._lengths)[:-1]))
+
+    def to_original(self, times, is_end=False):
+        """
+        Map times in the joined audio to the original timeline.
+
+        A time exactly at the join of two regions belongs to the next region,
+        or to the previous one if is_end is set, so a segment that ends at a
+        join does not stretch over the removed silence.
+        """
+        if not self.regions:
+            return times
+        values = np.asarray(times, dtype=np.float64)
+        index = np.searchsorted(self._offsets, values, side='left' if is_end else 'right') - 1
+        index = np.clip(index, 0, len(self.regions) - 1)
+        within = np.clip(values - self._offsets[index], 0.0, self._lengths[index])
+        mapped = self._starts[index] + within
+        return float(mapped) if np.ndim(mapped) == 0 else mapped.tolist()
+
+    def remap_segments(self, segments):
+        """
+        Move the start/end times of Whisper-style segments, and of their words, to
+        the original timeline, in place.
+
+        Returns:
+            segments
+        """
+        if not self.regions or not segments:
+            return segments
+        items = [segment for segment in segments if isinstance(segment, dict)]
+        for segment in list(items):
+            items.extend(word for word in segment.get('words') or [] if isinstance(word, dict))
+
+        timed = [item for item in items if 'start' in item and 'end' in item]
+        starts = self.to_original([item['start'] or 0 for item in timed])
+        ends = self.to_original([item['end'] or 0 for item in timed], is_end=True)
+        for item, start, end in zip(timed, starts, ends):
+            item['start'] = start
+            item['end'] = max(start, end)
+        return segments
+
+
+class SpeechAudio:
+    """
+    Audio to transcribe and the map from its timeline back to the original media.
+
+    Files are created on first use, so callers only pay for the form they send:
+    pcm (memory-mapped samples, for chunking), samples() (for a local Whisper
+    model) or upload_path() (compact audio for transcription APIs).
+    """
+
+    def __init__(self, media_path, speech_map=None, pcm=None, source_key=None, original_duration=None):
+        self.media_path = media_path
+        self.map = speech_map or SpeechMap()
+        self._pcm = pcm
+        self._source_key = source_key
+        self._original_duration = original_duration
+        self._upload_path = None
+        # Upload files written outside the artifact cache (see prepare_upload)
+        self._private_paths = []
+
+    @property
+    def condensed(self):
+        return bool(self.map.regions)
+
+    @property
+    def pcm(self):
+        if self._pcm is None:
+            self._pcm = load_pcm(self.media_path)
+        return self._pcm
+
+    @property
+    def original_duration(self):
+        """Length in seconds of the media's audio, before silences were removed."""
+        if self._original_duration is None:
+            return self.pcm.duration
+        return self._original_duration
+
+    def samples(self):
+        """Float32 samples for Whisper's transcribe(), which then skips its own ffmpeg decode."""
+        return self.pcm.to_float32()
+
+    def upload_path(self, start=None, end=None):
+        """
+        Path of the audio, or of its part from start to end seconds, encoded for a
+        transcription API (see asr_upload) and shared with other uploads of it.
+        """
+        if start is not None or end is not None:
+            return prepare_upload(self.pcm, self._source_key, start=start, end=end,
+                                  private_paths=self._private_paths)
+        if self._upload_path is None:
+            self._upload_path = prepare_upload(self.pcm, self._source_key, private_paths=self._private_paths)
+        return self._upload_path
+
+    def remap(self, segments):
+        return self.map.remap_segments(segments)
+
+    def close(self):
+        # The PCM of the speech regions is private to this object; decoded media stays
+        # cached unless the cache could not hold it, and then the PCMAudio owns its file
+        if self._pcm is not None:
+            if self.condensed and os.path.exists(self._pcm.path):
+                os.remove(self._pcm.path)
+            else:
+                self._pcm.close()
+        for path in self._private_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        self._private_paths = []
+
+
+@contextmanager
+def speech_only(media_path, job_id=None):
+    """
+    Provide audio with the long silences of a media file removed.
+
+    Yields a SpeechAudio of the speech regions, or of the whole media if VAD is
+    disabled, fails, finds no speech or would remove less than VAD_MIN_SAVING
+    seconds. Call remap() on the transcribed segments to get their times in the
+    original media. Temporary files are removed on exit.
+
+    Args:
+        media_path: Local path of the media file
+        job_id: Job ID for logging
+    """
+    speech = SpeechAudio(media_path)
+    try:
+        if VAD_ENABLED:
+            try:
+                pcm = speech.pcm
+                regions = detect_speech(pcm.samples)
+                kept = sum(end - start for start, end in regions)
+                if not regions:
+                    logger.info(f"Job {job_id}: No speech detected, transcribing the full audio")
+                elif pcm.duration - kept < VAD_MIN_SAVING:
+                    logger.info(f"Job {job_id}: Little silence found, transcribing the full audio")
+                else:
+                    fd, pcm_path = tempfile.mkstemp(prefix='speech_', suffix='.pcm')
+                    os.close(fd)
+                    speech = SpeechAudio(media_path, SpeechMap(regions),
+                                         write_pcm(pcm_path, (pcm.slice(start, end) for start, end in regions)),
+                                         source_key=f"{pcm.path}:{regions}", original_duration=pcm.duration)
+                    pcm.close()
+                    logger.info(f"Job {job_id}: Transcribing {kept:.1f}s of speech in {len(regions)} regions "
+                                f"instead of {pcm.duration:.1f}s of audio")
+            except (OSError, subprocess.CalledProcessError, ValueError) as e:
+                logger.warning(f"Job {job_id}: Voice activity detection failed, transcribing the full audio: {str(e)}")
+        yield speech
+    finally:
+        speech.close()
@@ -5,13 +5,8 @@ import re
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Import PyThaiNLP for Thai word segmentation if available
-try:
-    from pythainlp.tokenize import word_tokenize
-    PYTHAINLP_AVAILABLE = True
-except ImportError:
-    PYTHAINLP_AVAILABLE = False
-    logger.warning("PyThaiNLP not available. Using fallback method for Thai word segmentation.")
+# Shared, memoized Thai word segmentation
+from services.thai_tokenizer import tokenize, PYTHAINLP_AVAILABLE
 
 def is_thai_text(text):
     """Check if text contains Thai characters."""
@@ -57,7 +52,7 @@ def wrap_thai_text(text, max_chars_per_line=30):
                     if len(part) > max_chars_per_line:
                         # Try to use PyThaiNLP for word segmentation if available
                         if PYTHAINLP_AVAILABLE:
-                            words = word_tokenize(part, engine="newmm")
+                            words = tokenize(part)
                             segment_line = ""
                             
                             for word in words:
@@ -98,7 +93,7 @@ def wrap_thai_text(text, max_chars_per_line=30):
             # If PyThaiNLP is available, use it for word segmentation
             if PYTHAINLP_AVAILABLE:
                 try:
-                    words = word_tokenize(text, engine="newmm")
+                    words = tokenize(text)
                     current_line = ""
                     
                     for word in words:
@@ -3,14 +3,19 @@ import json
 import logging
 import tempfile
 import subprocess
-import requests
+from services import http_client
 import time
 import uuid
 from typing import Dict, List, Optional
 from urllib.parse import urlparse
+from services.v1.media.vad import speech_only
+from services.v1.media.transcription_cache import cached_transcription
 
 logger = logging.getLogger(__name__)
 
+# Replicate Whisper model version (from the curl example)
+MODEL_VERSION = "3ab86df6c8f54c11309d4d1f930ac292bad43ace52d10c80d87eb258b3c9f79c"
+
 # Updated supported languages list - Replicate Whisper uses full language names
 SUPPORTED_LANGUAGES = ["english", "spanish", "french", "german", "italian", "portuguese", "dutch", "russian", "chinese", "japanese", "korean", "arabic", "hebrew", "thai"]
 
@@ -64,7 +69,7 @@ def upload_to_cloud_storage(file_path):
         logger.error(f"Error uploading file to cloud storage: {str(e)}")
         raise ValueError(f"Error uploading file to cloud storage: {str(e)}")
 
-def transcribe_with_replicate(audio_url: str, language: str = "th", batch_size: int = 64) -> List[Dict]:
+def transcribe_with_replicate(audio_url: str, language: str = "th", batch_size: int = 64, prepare_audio: bool = True) -> List[Dict]:
     """
     Transcribe audio using Replicate Whisper API.
     
@@ -72,10 +77,28 @@ def transcribe_with_replicate(audio_url: str, language: str = "th", batch_size:
         audio_url (str): URL or local path to the audio file
         language (str, optional): Language code. Defaults to "th".
         batch_size (int, optional): Batch size for processing. Defaults to 64.
+        prepare_audio (bool, optional): Upload only the speech of a local file, as compact
+            audio (see asr_upload). Defaults to True.
         
     Returns:
         list: List of transcription segments with start and end times
     """
+    if not audio_url or not os.path.isfile(audio_url):
+        return _transcribe_with_replicate(audio_url, language, batch_size)
+
+    def transcribe():
+        if not prepare_audio:
+            return _transcribe_with_replicate(audio_url, language, batch_size)
+        # Long silences are cut out before the upload, and the timestamps mapped back
+        with speech_only(audio_url) as speech:
+            segments = _transcribe_with_replicate(speech.upload_path(), language, batch_size)
+            return speech.remap(segments)
+
+    # Results for local files are cached by their sound, so repeated requests skip the API
+    return cached_transcription(audio_url, transcribe, "replicate", MODEL_VERSION, language=language,
+                                options={"batch_size": batch_size})
+
+def _transcribe_with_replicate(audio_url: str, language: str, batch_size: int) -> List[Dict]:
     logger.info(f"Starting transcription with Replicate Whisper: {audio_url}")
     
     # Ensure audio_url is provided
@@ -94,7 +117,7 @@ def transcribe_with_replicate(audio_url: str, language: str = "th", batch_size:
     
     # Check if the URL is accessible
     try:
-        head_response = requests.head(audio_url, timeout=10)
+        head_response = http_client.head(audio_url, timeout=10)
         head_response.raise_for_status()
         logger.info(f"Audio URL is accessible: {audio_url}")
     except Exception as e:
@@ -121,9 +144,6 @@ def transcribe_with_replicate(audio_url: str, language: str = "th", batch_size:
         if not api_key.startswith("Bearer "):
             api_key = f"Bearer {api_key}"
         
-        # Use the correct model version from the curl example
-        model_version = "3ab86df6c8f54c11309d4d1f930ac292bad43ace52d10c80d87eb258b3c9f79c"
-        
         # Prepare the API request to Replicate
         headers = {
             "Authorization": api_key,
@@ -136,7 +156,7 @@ def transcribe_with_replicate(audio_url: str, language: str = "th", batch_size:
         
         # Prepare the request payload - using the exact format from the curl example
         payload = {
-            "version": model_version,
+            "version": MODEL_VERSION,
             "input": {
                 "audio": audio_url,
                 "batch_size": batch_size
@@ -146,7 +166,7 @@ def transcribe_with_replicate(audio_url: str, language: str = "th", batch_size:
         logger.info(f"Sending request to Replicate API: {json.dumps(payload, indent=2)}")
         
         # Send the request to start the transcription
-        response = requests.post(api_url, headers=headers, json=payload)
+        response = http_client.post(api_url, headers=headers, json=payload)
         response.raise_for_status()
         prediction = response.json()
         
@@ -173,7 +193,7 @@ def transcribe_with_replicate(audio_url: str, language: str = "th", batch_size:
                 
                 # Make a GET request to check the status
                 poll_url = f"https://api.replicate.com/v1/predictions/{prediction['id']}"
-                poll_response = requests.get(poll_url, headers=headers)
+                poll_response = http_client.get(poll_url, headers=headers)
                 
                 # Check if the request was successful
                 poll_response.raise_for_status()
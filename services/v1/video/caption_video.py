@@ -1,138 +1,99 @@
 import os
-import time
 import json
 import tempfile
 import subprocess
 import logging
 import re
-import uuid
 import json
 import hashlib
-import threading
-from datetime import datetime, timedelta
 import functools
-import random
+import inspect
 from pathlib import Path
 import srt  # For parsing SRT files
 from datetime import timedelta
 import unicodedata
-import glob
+from services.disk_cache import DiskCache, hash_file
+from services import http_client
+from services.webhook import send_webhook
+from services.v1.video.parallel_render import should_render_in_parallel, render_in_segments
+from services.ffmpeg_runner import run_ffmpeg
+from services.v1.video.subtitle_fonts import prepare_fonts
+from services.media_probe import probe_media, ProbeError
+from services.font_registry import get_font_registry
+from services.thai_tokenizer import tokenize, tokenize_subtitles, PYTHAINLP_AVAILABLE
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Import PyThaiNLP for Thai word segmentation
-try:
-    from pythainlp.tokenize import word_tokenize
-    PYTHAINLP_AVAILABLE = True
-except ImportError:
-    PYTHAINLP_AVAILABLE = False
-    logger.warning("PyThaiNLP not available. Using fallback method for Thai word segmentation.")
+# Disk cache for rendered videos, keyed by the content of the inputs and the style settings.
+# Shared by all workers and kept across restarts; RENDER_CACHE_MAX_BYTES=0 disables it.
+RENDER_CACHE_DIR = os.environ.get('RENDER_CACHE_DIR', '/tmp/nca_render_cache')
+RENDER_CACHE_MAX_BYTES = int(os.environ.get('RENDER_CACHE_MAX_BYTES', 10 * 1024 ** 3))
 
-# Cache for processed videos to avoid redundant processing
-# Structure: {cache_key: {'result': result_dict, 'timestamp': datetime, 'path': file_path}}
-_video_cache = {}
-_cache_lock = threading.Lock()
-_CACHE_EXPIRY = timedelta(hours=24)  # Cache entries expire after 24 hours
+# Bump when the ffmpeg command changes in a way that changes the output
+RENDER_CACHE_VERSION = 1
 
-def _generate_cache_key(video_path, subtitle_path, **kwargs):
-    """Generate a unique cache key based on input parameters and file contents."""
-    # Get file modification times
-    try:
-        video_mtime = os.path.getmtime(video_path) if os.path.exists(video_path) else 0
-        subtitle_mtime = os.path.getmtime(subtitle_path) if os.path.exists(subtitle_path) else 0
-        
-        # Create a string with all parameters and modification times
-        param_str = f"{video_path}:{video_mtime}:{subtitle_path}:{subtitle_mtime}"
-        
-        # Add all other parameters to the string
-        for key, value in sorted(kwargs.items()):
-            param_str += f":{key}={value}"
-            
-        # Create a hash of the parameter string
-        return hashlib.md5(param_str.encode('utf-8')).hexdigest()
-    except Exception as e:
-        logger.warning(f"Error generating cache key: {str(e)}")
-        # If there's an error, return a unique key to avoid cache conflicts
-        return str(uuid.uuid4())
+_render_cache = DiskCache(RENDER_CACHE_DIR, RENDER_CACHE_MAX_BYTES)
 
-def _clean_expired_cache():
-    """Remove expired entries from the cache."""
-    now = datetime.now()
-    with _cache_lock:
-        expired_keys = [k for k, v in _video_cache.items() 
-                       if now - v.get('timestamp', datetime.min) > _CACHE_EXPIRY]
-        
-        for key in expired_keys:
-            # Try to remove the cached file if it exists
-            try:
-                cache_path = _video_cache[key].get('path')
-                if cache_path and os.path.exists(cache_path):
-                    os.remove(cache_path)
-            except Exception as e:
-                logger.warning(f"Error removing cached file: {str(e)}")
-            
-            # Remove the cache entry
-            del _video_cache[key]
-            
-        return len(expired_keys)
+def _generate_cache_key(func, video_path, subtitle_path, settings):
+    """Generate a cache key from the video and subtitle contents and the normalized settings."""
+    hasher = hashlib.sha256()
+    hasher.update(f"{func.__module__}.{func.__qualname__}:{RENDER_CACHE_VERSION}".encode('utf-8'))
+    hash_file(video_path, hasher)
+    # The subtitle extension selects the ffmpeg filter, so it is part of the key
+    hasher.update(os.path.splitext(subtitle_path)[1].lower().encode('utf-8'))
+    hash_file(subtitle_path, hasher)
+    hasher.update(json.dumps(settings, sort_keys=True, default=str).encode('utf-8'))
+    return hasher.hexdigest()
 
 def cache_result(func):
-    """Decorator to cache function results based on input parameters."""
+    """
+    Decorator that caches rendered videos on disk.
+
+    The wrapped function must take (video_path, subtitle_path, output_path, **settings)
+    and write its result to output_path. On a cache hit the cached render is copied to
+    output_path and the encode is skipped.
+    """
+    signature = inspect.signature(func)
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        # Clean expired cache entries periodically
-        if random.random() < 0.1:  # 10% chance to clean on each call
-            num_cleaned = _clean_expired_cache()
-            if num_cleaned > 0:
-                logger.info(f"Cleaned {num_cleaned} expired cache entries")
-        
-        # Extract video_path and subtitle_path from args or kwargs
-        if args and len(args) >= 2:
-            video_path = args[0]
-            subtitle_path = args[1]
-        else:
-            video_path = kwargs.get('video_path')
-            subtitle_path = kwargs.get('subtitle_path')
-        
+        if not _render_cache.enabled:
+            return func(*args, **kwargs)
+
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        # Every other argument is part of the key, video_filters (e.g. padding) included,
+        # so renders of the same inputs with different filters never share an entry
+        settings = dict(bound.arguments)
+        video_path = settings.pop('video_path', None)
+        subtitle_path = settings.pop('subtitle_path', None)
+        output_path = settings.pop('output_path', None)
+
         # Skip caching if paths are not provided
-        if not video_path or not subtitle_path:
+        if not video_path or not subtitle_path or not output_path:
             return func(*args, **kwargs)
-        
-        # Create a copy of kwargs without video_path and subtitle_path to avoid duplicate parameters
-        cache_kwargs = kwargs.copy()
-        cache_kwargs.pop('video_path', None)
-        cache_kwargs.pop('subtitle_path', None)
-        
-        # Generate cache key
-        cache_key = _generate_cache_key(video_path, subtitle_path, **cache_kwargs)
-        
-        # Check if result is in cache
-        with _cache_lock:
-            if cache_key in _video_cache:
-                cache_entry = _video_cache[cache_key]
-                cache_path = cache_entry.get('path')
-                
-                # Verify the cached file still exists
-                if cache_path and os.path.exists(cache_path):
-                    logger.info(f"Cache hit for {os.path.basename(video_path)} with {os.path.basename(subtitle_path)}")
-                    return cache_entry['result']
-        
-        # Not in cache or cached file missing, call the function
-        result = func(*args, **kwargs)
-        
-        # Store result in cache if successful
-        if result and (not isinstance(result, dict) or not result.get('error')):
-            with _cache_lock:
-                _video_cache[cache_key] = {
-                    'result': result,
-                    'timestamp': datetime.now(),
-                    'path': result.get('local_path') if isinstance(result, dict) else None
-                }
+
+        try:
+            cache_key = _generate_cache_key(func, video_path, subtitle_path, settings)
+        except OSError as e:
+            logger.warning(f"Error generating cache key: {str(e)}")
+            return func(*args, **kwargs)
+
+        # Concurrent requests for the same render wait here and then hit the cache
+        with _render_cache.lock(cache_key):
+            if _render_cache.get_file(cache_key, output_path):
+                logger.info(f"Cache hit for {os.path.basename(video_path)} with {os.path.basename(subtitle_path)}")
+                return output_path
+
+            result = func(*args, **kwargs)
+
+            if result and os.path.exists(output_path):
+                _render_cache.put_file(cache_key, output_path)
                 logger.info(f"Cached result for {os.path.basename(video_path)} with {os.path.basename(subtitle_path)}")
-        
+
         return result
-    
+
     return wrapper
 
 def convert_srt_to_ass_for_thai(srt_path, font_name=None, font_size=24, primary_color="white", outline_color="black", back_color=None, alignment=2, margin_v=30, max_words_per_line=7, max_width=None):
@@ -237,21 +198,25 @@ def convert_srt_to_ass_for_thai(srt_path, font_name=None, font_size=24, primary_
             f.write("[Events]\n")
             f.write("Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n")
             
+            # Tokenize all subtitles in one call; repeated lines come from the cache
+            subs_words = [None] * len(subs)
+            if PYTHAINLP_AVAILABLE:
+                try:
+                    subs_words = tokenize_subtitles(subs)
+                except Exception as e:
+                    logger.error(f"Error in Thai word segmentation: {str(e)}")
+            
             # Process each subtitle
             processed_count = 0
-            for sub in subs:
+            for sub, words in zip(subs, subs_words):
                 # Convert start and end times to ASS format (h:mm:ss.cc)
                 start_time = format_time_ass(sub.start.total_seconds())
                 end_time = format_time_ass(sub.end.total_seconds())
                 
                 # Process Thai text with proper word segmentation
-                if PYTHAINLP_AVAILABLE:
+                if words is not None:
                     try:
-                        from pythainlp.tokenize import word_tokenize
-                        
                         logger.debug(f"Processing subtitle text: '{sub.content}'")
-                        # Tokenize Thai text
-                        words = word_tokenize(sub.content, engine="newmm")
                         logger.debug(f"Tokenized into {len(words)} words using PyThaiNLP")
                         
                         # For Thai, use a more conservative max_width to ensure text fits
@@ -289,9 +254,9 @@ def convert_srt_to_ass_for_thai(srt_path, font_name=None, font_size=24, primary_
                         text = sub.content
                         logger.warning(f"Using original text due to segmentation error")
                 else:
-                    # Fallback if PyThaiNLP is not available
+                    # Fallback if PyThaiNLP is not available or failed
                     text = sub.content
-                    logger.warning("PyThaiNLP not available, using original text without word segmentation")
+                    logger.warning("Thai word segmentation not available, using original text")
                 
                 # Add text styling for better visibility
                 # Add a border box around the text and make it bold
@@ -320,262 +285,15 @@ def get_available_thai_font():
     Find an available Thai font on the system.
     
     Returns:
-        Name of an available Thai font, or a default font if none found
+        Family name of an available Thai font, or a default font if none found
     """
-    logger.info("Searching for available Thai fonts")
-    
-    # Use our new find_thai_fonts function
-    thai_fonts = find_thai_fonts()
-    
-    if thai_fonts:
-        # Use the first found Thai font
-        font_path = thai_fonts[0]
-        logger.info(f"Using Thai font: {font_path}")
-        return font_path
-    
-    # If no fonts found, try common font names that might be available
-    common_thai_fonts = [
-        "Sarabun", 
-        "THSarabun", 
-        "TH Sarabun New", 
-        "Noto Sans Thai", 
-        "Garuda",
-        "Norasi",
-        "Waree",
-        "Loma",
-        "Kinnari"
-    ]
+    font = get_font_registry().default_font("thai")
+    if font:
+        logger.info(f"Using Thai font: {font.family} ({font.path})")
+        return font.family
     
-    logger.info(f"No Thai font files found. Trying common Thai font names: {common_thai_fonts}")
-    return common_thai_fonts[0]  # Return the first common Thai font name
-
-# Remove the cache_result decorator to ensure parameter changes are recognized
-def add_subtitles_to_video(video_path, subtitle_path, output_path=None, font_name="Arial", font_size=24, 
-                          position="bottom", margin_v=30, subtitle_style="classic", max_width=None,
-                          line_color=None, word_color=None, outline_color=None, all_caps=False,
-                          max_words_per_line=7, x=None, y=None, alignment="center", bold=False,
-                          italic=False, underline=False, strikeout=False, shadow=None, outline=None,
-                          back_color=None, margin_l=None, margin_r=None, encoding=None, job_id=None):
-    """
-    Add subtitles to a video using FFmpeg.
-    
-    Args:
-        video_path: Path to the video file
-        subtitle_path: Path to the subtitle file (SRT format)
-        output_path: Path to save the output video (optional)
-        font_name: Font to use for subtitles
-        font_size: Font size
-        position: Position of subtitles (top, middle, bottom)
-        margin_v: Vertical margin from the edge
-        subtitle_style: Style of subtitles (classic, modern, karaoke, highlight, underline, word_by_word)
-        max_width: Maximum width of subtitle text (in pixels)
-        line_color: Color for subtitle text
-        word_color: Color for highlighted words (for karaoke/highlight styles)
-        outline_color: Color for text outline
-        all_caps: Whether to capitalize all text
-        max_words_per_line: Maximum words per line
-        x: X position for subtitles (overrides position)
-        y: Y position for subtitles (overrides position)
-        alignment: Text alignment (left, center, right)
-        bold: Whether to use bold text
-        italic: Whether to use italic text
-        underline: Whether to use underlined text
-        strikeout: Whether to use strikeout text
-        shadow: Shadow depth for text
-        outline: Outline width for text
-        back_color: Background color for subtitles
-        margin_l: Left margin for subtitles
-        margin_r: Right margin for subtitles
-        encoding: Encoding for subtitles
-        job_id: Unique identifier for the job
-    
-    Returns:
-        Path to the output video with subtitles
-    """
-    start_time = time.time()
-    
-    if job_id is None:
-        job_id = str(uuid.uuid4())
-    
-    logger.info(f"Job {job_id}: Starting add_subtitles_to_video process")
-    logger.info(f"Job {job_id}: Input video: {video_path}")
-    logger.info(f"Job {job_id}: Subtitle file: {subtitle_path}")
-    
-    # Validate input files
-    if not os.path.exists(video_path):
-        logger.error(f"Job {job_id}: Video file does not exist: {video_path}")
-        return None
-    
-    if not os.path.exists(subtitle_path):
-        logger.error(f"Job {job_id}: Subtitle file does not exist: {subtitle_path}")
-        return None
-    
-    # Set default output path if not provided
-    if output_path is None:
-        output_dir = os.path.dirname(video_path)
-        output_filename = f"captioned_{os.path.basename(video_path)}"
-        output_path = os.path.join(output_dir, output_filename)
-    
-    logger.info(f"Job {job_id}: Output path: {output_path}")
-    
-    # Process subtitle file to improve formatting
-    logger.info(f"Job {job_id}: Processing subtitle file")
-    
-    # Check if the subtitle file is in Thai
-    is_thai = contains_thai(subtitle_path)
-    logger.info(f"Job {job_id}: Subtitle file contains Thai text: {is_thai}")
-    
-    # Process SRT file to improve formatting
-    processed_srt_path = process_srt_file(subtitle_path, max_words_per_line=max_words_per_line, is_thai=is_thai)
-    logger.info(f"Job {job_id}: Processed SRT file: {processed_srt_path}")
-    
-    # Set default font for Thai if needed
-    if is_thai and font_name in ["Arial", "Helvetica", "Times New Roman"]:
-        font_name = get_available_thai_font()
-        logger.info(f"Job {job_id}: Using Thai font: {font_name}")
-    
-    # Set default colors if not provided
-    if line_color is None:
-        line_color = "white"
-    if outline_color is None:
-        outline_color = "black"
-    
-    logger.info(f"Job {job_id}: Font settings - name: {font_name}, size: {font_size}, color: {line_color}")
-    logger.info(f"Job {job_id}: Style settings - style: {subtitle_style}, position: {position}, alignment: {alignment}")
-    
-    # Convert alignment string to number if needed
-    if isinstance(alignment, str):
-        alignment_map = {
-            "left": 1,
-            "center": 2,
-            "right": 3
-        }
-        alignment = alignment_map.get(alignment.lower(), 2)
-        logger.info(f"Job {job_id}: Converted alignment to: {alignment}")
-    
-    # Prepare font formatting options
-    font_formatting = {
-        "bold": bold,
-        "italic": italic,
-        "underline": underline,
-        "strikeout": strikeout
-    }
-    
-    logger.info(f"Job {job_id}: Font formatting: {font_formatting}")
-    
-    # Convert SRT to ASS for better styling
-    ass_path = processed_srt_path.replace(".srt", ".ass")
-    
-    if is_thai:
-        logger.info(f"Job {job_id}: Converting SRT to ASS with Thai text handling")
-        convert_srt_to_ass_for_thai(
-            processed_srt_path,
-            font_name=font_name,
-            font_size=font_size,
-            primary_color=line_color,
-            outline_color=outline_color,
-            back_color=back_color,
-            alignment=alignment,
-            margin_v=margin_v,
-            max_words_per_line=max_words_per_line,
-            max_width=max_width
-        )
-    else:
-        logger.info(f"Job {job_id}: Converting SRT to ASS with standard text handling")
-        convert_srt_to_ass(
-            processed_srt_path,
-            ass_path,
-            font_name=font_name,
-            font_size=font_size,
-            line_color=line_color,
-            outline_color=outline_color,
-            word_color=word_color,
-            alignment=alignment,
-            margin_v=margin_v,
-            subtitle_style=subtitle_style,
-            max_width=max_width,
-            all_caps=all_caps,
-            font_formatting=font_formatting
-        )
-    
-    # Ensure ASS file exists
-    if not os.path.exists(ass_path):
-        logger.error(f"Job {job_id}: Failed to create ASS file")
-        return None
-    
-    logger.info(f"Job {job_id}: ASS file created: {ass_path}")
-    
-    # Get video info
-    video_info = get_video_info(video_path)
-    if video_info:
-        video_width = video_info.get("width", 1920)
-        video_height = video_info.get("height", 1080)
-        logger.info(f"Job {job_id}: Video dimensions: {video_width}x{video_height}")
-    else:
-        logger.warning(f"Job {job_id}: Could not get video info, using default dimensions")
-        video_width = 1920
-        video_height = 1080
-    
-    # Calculate subtitle position
-    if x is not None and y is not None:
-        # Use custom position
-        subtitle_position = f"{x}:{y}"
-        logger.info(f"Job {job_id}: Using custom subtitle position: {subtitle_position}")
-    else:
-        # Calculate position based on position parameter
-        if position == "top":
-            y_pos = margin_v
-        elif position == "middle":
-            y_pos = video_height // 2
-        else:  # bottom
-            y_pos = video_height - margin_v
-        
-        subtitle_position = f"(w-text_w)/2:{y_pos}"
-        logger.info(f"Job {job_id}: Using calculated subtitle position: {subtitle_position} (based on '{position}')")
-    
-    # Prepare FFmpeg command
-    ffmpeg_cmd = [
-        "ffmpeg",
-        "-i", video_path,
-        "-vf", f"ass={ass_path}",
-        "-c:v", "libx264",
-        "-preset", "fast",
-        "-crf", "22",
-        "-c:a", "aac",
-        "-b:a", "128k",
-        "-y",
-        output_path
-    ]
-    
-    logger.info(f"Job {job_id}: FFmpeg command: {' '.join(ffmpeg_cmd)}")
-    
-    # Execute FFmpeg command
-    try:
-        logger.info(f"Job {job_id}: Executing FFmpeg command")
-        process = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdout, stderr = process.communicate()
-        
-        if process.returncode != 0:
-            logger.error(f"Job {job_id}: FFmpeg error: {stderr.decode('utf-8', errors='ignore')}")
-            return None
-        
-        logger.info(f"Job {job_id}: FFmpeg completed successfully")
-        
-        # Check if output file exists
-        if not os.path.exists(output_path):
-            logger.error(f"Job {job_id}: Output file does not exist after FFmpeg: {output_path}")
-            return None
-        
-        # Calculate processing time
-        end_time = time.time()
-        processing_time = end_time - start_time
-        logger.info(f"Job {job_id}: Subtitles added successfully in {processing_time:.2f} seconds")
-        
-        return output_path
-    
-    except Exception as e:
-        logger.error(f"Job {job_id}: Error adding subtitles to video: {str(e)}")
-        return None
+    logger.warning("No Thai font found in the font registry, falling back to Sarabun")
+    return "Sarabun"
 
 def process_srt_file(subtitle_path, max_words_per_line=7, is_thai=False):
     """
@@ -650,8 +368,6 @@ def process_srt_file(subtitle_path, max_words_per_line=7, is_thai=False):
             # For Thai text, use PyThaiNLP for word segmentation if available
             if is_thai:
                 try:
-                    from pythainlp.tokenize import word_tokenize
-                    
                     # First normalize the text
                     text = unicodedata.normalize('NFC', text)
                     
@@ -680,7 +396,7 @@ def process_srt_file(subtitle_path, max_words_per_line=7, is_thai=False):
                     for segment in segments:
                         if any(c in THAI_CHARS for c in segment):
                             # Thai segment - tokenize and join
-                            words = word_tokenize(segment)
+                            words = tokenize(segment)
                             processed_segments.append(words)
                         else:
                             # Non-Thai segment - split by spaces
@@ -901,18 +617,15 @@ def process_srt_file(subtitle_path, max_words_per_line=7, is_thai=False):
 
 def get_video_info(video_path):
     try:
-        import subprocess
-        result = subprocess.run(["ffprobe", "-v", "error", "-show_streams", "-print_format", "json", video_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        if result.returncode != 0:
-            logger.error(f"FFprobe error: {result.stderr}")
-            return None
-        video_info = json.loads(result.stdout)
-        for stream in video_info['streams']:
-            if stream['codec_type'] == 'video':
-                return {
-                    'width': stream['width'],
-                    'height': stream['height']
-                }
+        stream = probe_media(video_path).video
+        if stream is not None:
+            return {
+                'width': stream.width,
+                'height': stream.height
+            }
+    except ProbeError as e:
+        logger.error(f"FFprobe error: {str(e)}")
+        return None
     except Exception as e:
         logger.error(f"Error getting video info: {str(e)}")
         return None
@@ -1024,7 +737,6 @@ def process_captioning_v1(video_url, captions, settings=None, job_id=None, webho
         import tempfile
         import os
         import uuid
-        import requests
         from urllib.parse import urlparse
         
         # Create a job ID if not provided
@@ -1053,7 +765,7 @@ def process_captioning_v1(video_url, captions, settings=None, job_id=None, webho
             video_path = os.path.join(temp_dir, video_filename)
             logger.info(f"Job {job_id}: Downloading video from {video_url}")
             
-            response = requests.get(video_url, stream=True)
+            response = http_client.get(video_url, stream=True)
             if response.status_code == 200:
                 with open(video_path, 'wb') as f:
                     for chunk in response.iter_content(chunk_size=8192):
@@ -1174,8 +886,8 @@ def process_captioning_v1(video_url, captions, settings=None, job_id=None, webho
                     "status": "completed",
                     "result": result
                 }
-                requests.post(webhook_url, json=webhook_payload)
-                logger.info(f"Job {job_id}: Webhook called successfully")
+                send_webhook(webhook_url, webhook_payload)
+                logger.info(f"Job {job_id}: Webhook queued")
             except Exception as e:
                 logger.error(f"Job {job_id}: Failed to call webhook: {str(e)}")
         
@@ -1194,7 +906,7 @@ def process_captioning_v1(video_url, captions, settings=None, job_id=None, webho
                     "status": "failed",
                     "error": str(e)
                 }
-                requests.post(webhook_url, json=webhook_payload)
+                send_webhook(webhook_url, webhook_payload)
             except:
                 pass
                 
@@ -1224,106 +936,8 @@ def format_time_ass(time_in_seconds):
     
     return f"{hours}:{minutes:02d}:{seconds:02d}.{centiseconds:02d}"
 
-def add_subtitles_to_video(video_path, subtitle_path, output_path, font_size=24, font_name="Arial"):
-    """
-    Add subtitles to a video using FFmpeg.
-    
-    Args:
-        video_path: Path to the video file
-        subtitle_path: Path to the subtitle file (SRT or ASS)
-        output_path: Path to save the output video
-        font_size: Font size for subtitles
-        font_name: Font name for subtitles
-        
-    Returns:
-        Path to the output video
-    """
-    logger.info(f"Adding subtitles to video: {video_path}")
-    logger.info(f"Subtitle file: {subtitle_path}")
-    logger.info(f"Output path: {output_path}")
-    
-    # Check if subtitle file exists
-    if not os.path.exists(subtitle_path):
-        logger.error(f"Subtitle file not found: {subtitle_path}")
-        raise FileNotFoundError(f"Subtitle file not found: {subtitle_path}")
-            
-    # Get subtitle file extension
-    _, ext = os.path.splitext(subtitle_path)
-    ext = ext.lower()
-    
-    logger.info(f"Subtitle file extension: {ext}")
-    
-    # Check file sizes
-    video_size = os.path.getsize(video_path)
-    subtitle_size = os.path.getsize(subtitle_path)
-    logger.info(f"Video file size: {video_size} bytes")
-    logger.info(f"Subtitle file size: {subtitle_size} bytes")
-    
-    # Read first few lines of subtitle file to verify content
-    with open(subtitle_path, 'r', encoding='utf-8') as f:
-        subtitle_preview = f.read(1000)  # Read first 1000 chars
-    logger.info(f"Subtitle file preview: {subtitle_preview[:200]}...")  # Log first 200 chars
-    
-    # Determine the correct subtitle filter based on file extension
-    if ext == '.ass':
-        # For ASS files, use the ass filter with explicit file path
-        subtitle_path_fixed = subtitle_path.replace('\\', '/')
-        ffmpeg_cmd = [
-            "ffmpeg", "-y",
-            "-i", video_path,
-            "-vf", f"ass='{subtitle_path_fixed}'",
-            "-c:v", "libx264", "-crf", "23",
-            "-c:a", "copy",
-            "-max_muxing_queue_size", "9999",  # Prevent muxing queue errors
-            output_path
-        ]
-        logger.info("Using ASS subtitle filter")
-    elif ext == '.srt':
-        # For SRT files, use the subtitles filter with styling options
-        subtitle_path_fixed = subtitle_path.replace('\\', '/')
-        ffmpeg_cmd = [
-            "ffmpeg", "-y",
-            "-i", video_path,
-            "-vf", f"subtitles='{subtitle_path_fixed}':force_style='FontName={font_name},FontSize={font_size},BackColour=&H80000000,BorderStyle=4,Outline=1,Shadow=0'",
-            "-c:v", "libx264", "-crf", "23",
-            "-c:a", "copy",
-            "-max_muxing_queue_size", "9999",  # Prevent muxing queue errors
-            output_path
-        ]
-        logger.info("Using SRT subtitle filter with styling")
-    else:
-        logger.warning(f"Unknown subtitle format: {ext}, defaulting to subtitles filter")
-        ffmpeg_cmd = [
-            "ffmpeg", "-y",
-            "-i", video_path,
-            "-vf", f"subtitles='{subtitle_path}'",
-            "-c:v", "libx264", "-crf", "23",
-            "-c:a", "copy",
-            "-max_muxing_queue_size", "9999",  # Prevent muxing queue errors
-            output_path
-        ]
-    
-    logger.info(f"Running FFmpeg command: {' '.join(ffmpeg_cmd)}")
-    
-    # Run FFmpeg
-    process = subprocess.run(ffmpeg_cmd, check=True, capture_output=True, text=True)
-    
-    # Log FFmpeg output
-    if process.stdout:
-        logger.info(f"FFmpeg stdout: {process.stdout}")
-    if process.stderr:
-        logger.info(f"FFmpeg stderr: {process.stderr}")
-    
-    # Check if output file was created
-    if os.path.exists(output_path):
-        output_size = os.path.getsize(output_path)
-        logger.info(f"Output file created successfully: {output_path} ({output_size} bytes)")
-        return output_path
-    else:
-        logger.error(f"Output file was not created: {output_path}")
-        raise FileNotFoundError(f"Output file was not created: {output_path}")
-            
-def add_subtitles_to_video(video_path, subtitle_path, output_path, font_size=24, font_name="Arial", position="bottom", alignment=2, margin_v=30, subtitle_style="classic", line_color="white", outline_color="black", back_color=None, word_color=None, all_caps=False, outline=True, shadow=True, border_style=1):
+@cache_result
+def add_subtitles_to_video(video_path, subtitle_path, output_path, font_size=24, font_name="Arial", position="bottom", alignment=2, margin_v=30, subtitle_style="classic", line_color="white", outline_color="black", back_color=None, word_color=None, all_caps=False, outline=True, shadow=True, border_style=1, video_filters=None):
     """
     Add subtitles to a video file.
     
@@ -1345,6 +959,8 @@ def add_subtitles_to_video(video_path, subtitle_path, output_path, font_size=24,
         outline: Whether to add outline to text
         shadow: Whether to add shadow to text
         border_style: Border style (1=outline, 4=box)
+        video_filters: Optional ffmpeg filter chain (e.g. padding) applied before the
+                       subtitles, in the same encode
         
     Returns:
         Path to the output video
@@ -1379,51 +995,60 @@ def add_subtitles_to_video(video_path, subtitle_path, output_path, font_size=24,
     if ext == '.ass':
         # For ASS files, use the ass filter with explicit file path
         subtitle_path_fixed = subtitle_path.replace('\\', '/')
-        ffmpeg_cmd = [
-            "ffmpeg", "-y",
-            "-i", video_path,
-            "-vf", f"ass='{subtitle_path_fixed}'",
-            "-c:v", "libx264", "-crf", "23",
-            "-c:a", "copy",
-            "-max_muxing_queue_size", "9999",  # Prevent muxing queue errors
-            output_path
-        ]
+        video_filter = f"ass='{subtitle_path_fixed}'"
         logger.info("Using ASS subtitle filter")
     elif ext == '.srt':
         # For SRT files, use the subtitles filter with styling options
         subtitle_path_fixed = subtitle_path.replace('\\', '/')
-        ffmpeg_cmd = [
-            "ffmpeg", "-y",
-            "-i", video_path,
-            "-vf", f"subtitles='{subtitle_path_fixed}':force_style='FontName={font_name},FontSize={font_size},BackColour=&H80000000,BorderStyle={border_style},Outline={1 if outline else 0},Shadow={1 if shadow else 0}'",
-            "-c:v", "libx264", "-crf", "23",
-            "-c:a", "copy",
-            "-max_muxing_queue_size", "9999",  # Prevent muxing queue errors
-            output_path
-        ]
+        video_filter = f"subtitles='{subtitle_path_fixed}':force_style='FontName={font_name},FontSize={font_size},BackColour=&H80000000,BorderStyle={border_style},Outline={1 if outline else 0},Shadow={1 if shadow else 0}'"
         logger.info("Using SRT subtitle filter with styling")
     else:
         logger.warning(f"Unknown subtitle format: {ext}, defaulting to subtitles filter")
+        video_filter = f"subtitles='{subtitle_path}'"
+    
+    if video_filters:
+        # Subtitles are positioned on the filtered (e.g. padded) frame
+        video_filter = f"{video_filters},{video_filter}"
+        logger.info(f"Applying video filters before subtitles: {video_filters}")
+    
+    encode_args = ["-c:v", "libx264", "-crf", "23"]
+    
+    # libass only loads the fonts this render references instead of every system font
+    fonts_dir, ffmpeg_env = prepare_fonts(subtitle_path, font_name)
+    if fonts_dir:
+        logger.info(f"Using font directory {fonts_dir}")
+    
+    # Long videos are split at keyframes and encoded in parallel segments
+    rendered = False
+    cuts = should_render_in_parallel(video_path)
+    if cuts:
+        try:
+            render_in_segments(video_path, video_filter, output_path, cuts, encode_args, env=ffmpeg_env)
+            rendered = True
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"Parallel render failed, falling back to a single pass: {e.stderr}")
+    
+    if not rendered:
         ffmpeg_cmd = [
             "ffmpeg", "-y",
             "-i", video_path,
-            "-vf", f"subtitles='{subtitle_path}'",
-            "-c:v", "libx264", "-crf", "23",
+            "-vf", video_filter,
+            *encode_args,
             "-c:a", "copy",
             "-max_muxing_queue_size", "9999",  # Prevent muxing queue errors
             output_path
         ]
-    
-    logger.info(f"Running FFmpeg command: {' '.join(ffmpeg_cmd)}")
-    
-    # Run FFmpeg
-    process = subprocess.run(ffmpeg_cmd, check=True, capture_output=True, text=True)
-    
-    # Log FFmpeg output
-    if process.stdout:
-        logger.info(f"FFmpeg stdout: {process.stdout}")
-    if process.stderr:
-        logger.info(f"FFmpeg stderr: {process.stderr}")
+        
+        logger.info(f"Running FFmpeg command: {' '.join(ffmpeg_cmd)}")
+        
+        # Run FFmpeg, reporting progress on the job
+        process = run_ffmpeg(ffmpeg_cmd, label="captions", env=ffmpeg_env)
+        
+        # Log FFmpeg output
+        if process.stdout:
+            logger.info(f"FFmpeg stdout: {process.stdout}")
+        if process.stderr:
+            logger.info(f"FFmpeg stderr: {process.stderr}")
     
     # Check if output file was created
     if os.path.exists(output_path):
@@ -1439,63 +1064,6 @@ def find_thai_fonts():
     Find available Thai fonts on the system.
     
     Returns:
-        List of paths to Thai font files
+        List of paths to Thai font files, preferred fonts first
     """
-    # Common paths for Thai fonts
-    possible_paths = [
-        # Thai-specific fonts
-        "/usr/share/fonts/truetype/thai-tlwg/Sarabun*.ttf",
-        "/usr/share/fonts/truetype/tlwg/Sarabun*.ttf",
-        "/usr/share/fonts/TTF/Sarabun*.ttf",
-        "/usr/share/fonts/thai-tlwg/Sarabun*.ttf",
-        # General font directories
-        "/usr/share/fonts/truetype/*/Sarabun*.ttf",
-        "/usr/share/fonts/*/Sarabun*.ttf",
-        # Noto Sans Thai (alternative)
-        "/usr/share/fonts/truetype/noto/NotoSansThai*.ttf",
-        "/usr/share/fonts/noto-cjk/NotoSansThai*.ttf",
-        # Fallback to any Thai font
-        "/usr/share/fonts/**/Thai*.ttf",
-        "/usr/share/fonts/**/*Thai*.ttf"
-    ]
-    
-    found_fonts = []
-    
-    # Try to find Thai fonts using glob
-    for path_pattern in possible_paths:
-        try:
-            matches = glob.glob(path_pattern, recursive=True)
-            found_fonts.extend(matches)
-        except Exception as e:
-            logger.warning(f"Error checking font path {path_pattern}: {str(e)}")
-    
-    # If glob doesn't work, try using find command
-    if not found_fonts:
-        try:
-            result = subprocess.run(
-                ["find", "/usr/share/fonts", "-name", "*Thai*", "-o", "-name", "*Sarabun*", "-type", "f"],
-                capture_output=True, text=True, check=False
-            )
-            if result.stdout.strip():
-                found_fonts.extend(result.stdout.strip().split("\n"))
-        except Exception as e:
-            logger.warning(f"Error using find command to locate Thai fonts: {str(e)}")
-    
-    # Last resort - check if we can list any fonts with fc-list
-    if not found_fonts:
-        try:
-            result = subprocess.run(["fc-list"], capture_output=True, text=True, check=False)
-            for line in result.stdout.split("\n"):
-                if "Thai" in line or "Sarabun" in line:
-                    font_path = line.split(":")[0]
-                    found_fonts.append(font_path)
-        except Exception as e:
-            logger.warning(f"Error using fc-list to locate Thai fonts: {str(e)}")
-    
-    # Log the results
-    if found_fonts:
-        logger.info(f"Found {len(found_fonts)} Thai fonts: {found_fonts}")
-    else:
-        logger.warning("No Thai fonts found on the system")
-    
-    return found_fonts
\ No newline at end of file
+    return [font.path for font in get_font_registry().fonts_for_script("thai")]
\ No newline at end of file
@@ -1,7 +1,7 @@
 import os
 import ffmpeg
 import requests
-from services.file_management import download_file
+from services.file_management import download_files
 
 # Set the default local storage directory
 STORAGE_PATH = "/tmp/"
@@ -13,11 +13,11 @@ def process_video_concatenate(media_urls, job_id, webhook_url=None):
     output_path = os.path.join(STORAGE_PATH, output_filename)
 
     try:
-        # Download all media files
-        for i, media_item in enumerate(media_urls):
-            url = media_item['video_url']
-            input_filename = download_file(url, os.path.join(STORAGE_PATH, f"{job_id}_input_{i}"))
-            input_files.append(input_filename)
+        # Download all media files concurrently
+        input_files = download_files(
+            [(media_item['video_url'], os.path.join(STORAGE_PATH, f"{job_id}_input_{i}")) for i, media_item in enumerate(media_urls)],
+            job_id=job_id
+        )
 
         # Generate an absolute path concat list file for FFmpeg
         concat_file_path = os.path.join(STORAGE_PATH, f"{job_id}_concat_list.txt")
@@ -0,0 +1,191 @@
+"""
+Segment-parallel subtitle burn-in for long videos.
+
+A single libx264 process does not keep all cores busy, so long videos are split
+at keyframes into roughly equal segments that are encoded at the same time, each
+by its own ffmpeg process. Every segment shifts its timestamps back to the
+original timeline before the subtitle filter runs, so the subtitle events (and
+karaoke / fade animations, which are relative to the event start) are rendered
+exactly as in a single pass. The encoded segments are joined with the concat
+demuxer using stream copy, and the original audio is copied in unchanged.
+"""
+
+import os
+import shutil
+import logging
+import tempfile
+import subprocess
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from services.ffmpeg_runner import run_ffmpeg, SegmentedProgress
+from services.media_probe import probe_media, ProbeError
+
+logger = logging.getLogger(__name__)
+
+# Render long videos in parallel segments (set to false to always use a single pass)
+RENDER_PARALLEL = os.environ.get('RENDER_PARALLEL', 'true').lower() == 'true'
+# Videos shorter than this many seconds are rendered in a single pass
+RENDER_PARALLEL_MIN_DURATION = float(os.environ.get('RENDER_PARALLEL_MIN_DURATION', 300))
+# x264 threads per segment, and number of segments encoded at once (0 = CPU cores / threads)
+RENDER_THREADS_PER_SEGMENT = int(os.environ.get('RENDER_THREADS_PER_SEGMENT', 2))
+RENDER_SEGMENT_WORKERS = int(os.environ.get('RENDER_SEGMENT_WORKERS', 0))
+
+# Segments shorter than this are not worth a separate ffmpeg process
+MIN_SEGMENT_SECONDS = 30
+
+
+def get_segment_workers():
+    """Number of segments encoded at the same time."""
+    if RENDER_SEGMENT_WORKERS > 0:
+        return RENDER_SEGMENT_WORKERS
+    return max(1, (os.cpu_count() or 1) // max(1, RENDER_THREADS_PER_SEGMENT))
+
+
+def get_duration(video_path):
+    """Return the duration of a video in seconds."""
+    duration = probe_media(video_path).duration
+    if duration is None:
+        raise ValueError(f"Unknown duration of {video_path}")
+    return duration
+
+
+def get_keyframe_times(video_path):
+    """
+    Return the sorted presentation times of the keyframes of the first video stream.
+
+    Reads packet headers only, so the video is not decoded.
+    """
+    cmd = ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+           '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', video_path]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    times = []
+    for line in result.stdout.splitlines():
+        parts = line.strip().split(',')
+        if len(parts) >= 2 and 'K' in parts[1] and parts[0] not in ('', 'N/A'):
+            times.append(float(parts[0]))
+    return sorted(set(times))
+
+
+def plan_segments(duration, keyframes, workers):
+    """
+    Choose keyframes that split [0, duration) into about `workers` equal segments.
+
+    Returns:
+        List of cut times (keyframe times), not including 0
+    """
+    count = min(workers, int(duration // MIN_SEGMENT_SECONDS))
+    if count < 2 or not keyframes:
+        return []
+
+    cuts = []
+    for i in range(1, count):
+        target = duration * i / count
+        nearest = min(keyframes, key=lambda t: abs(t - target))
+        previous = cuts[-1] if cuts else 0
+        if nearest - previous >= MIN_SEGMENT_SECONDS and duration - nearest >= MIN_SEGMENT_SECONDS:
+            cuts.append(nearest)
+    return cuts
+
+
+def should_render_in_parallel(video_path):
+    """Return the segment cut times for a video, or an empty list for a single-pass render."""
+    if not RENDER_PARALLEL:
+        return []
+    workers = get_segment_workers()
+    if workers < 2:
+        return []
+    try:
+        duration = get_duration(video_path)
+        if duration < RENDER_PARALLEL_MIN_DURATION:
+            return []
+        return plan_segments(duration, get_keyframe_times(video_path), workers)
+    except (subprocess.CalledProcessError, ProbeError, ValueError) as e:
+        logger.warning(f"Could not plan a parallel render of {video_path}: {str(e)}")
+        return []
+
+
+def _render_segment(video_path, video_filter, start, end, output_path, encode_args, duration, on_progress, env):
+    cmd = ['ffmpeg', '-nostdin', '-v', 'error', '-y']
+    if start > 0:
+        # Input seeking to a keyframe is exact, and the output starts at 0
+        cmd += ['-ss', repr(start)]
+    cmd += ['-i', video_path]
+    if end is not None:
+        cmd += ['-t', repr(end - start)]
+    cmd += [
+        '-map', '0:v:0',
+        # Shift back to the original timeline for the subtitle filter, then start at 0 again
+        '-vf', f"setpts=PTS+{start!r}/TB,{video_filter},setpts=PTS-STARTPTS",
+        *encode_args,
+        '-threads', str(RENDER_THREADS_PER_SEGMENT),
+        '-an',
+        output_path
+    ]
+    run_ffmpeg(cmd, duration=duration, on_progress=on_progress, env=env)
+    return output_path
+
+
+def render_in_segments(video_path, video_filter, output_path, cuts, encode_args=("-c:v", "libx264", "-crf", "23"), env=None):
+    """
+    Apply a video filter to a video in parallel segments.
+
+    Args:
+        video_path: Path to the input video
+        video_filter: ffmpeg filter chain to apply (e.g. the ass filter); it sees the
+                      original timestamps of the video
+        output_path: Path to the output video
+        cuts: Keyframe times at which to split, from should_render_in_parallel()
+        encode_args: Video encoder arguments, the same as for a single-pass render
+        env: Optional environment for the segment ffmpeg processes
+
+    Returns:
+        output_path
+    """
+    bounds = [0.0] + list(cuts) + [None]
+    segments = list(zip(bounds[:-1], bounds[1:]))
+    work_dir = tempfile.mkdtemp(prefix='render_segments_')
+    try:
+        segment_paths = [os.path.join(work_dir, f"segment_{i:04d}.mp4") for i in range(len(segments))]
+        logger.info(f"Rendering {video_path} in {len(segments)} segments with {get_segment_workers()} workers")
+
+        total_duration = get_duration(video_path)
+        durations = [(end if end is not None else total_duration) - start for start, end in segments]
+        # Created here, in the job's thread, so the segments report on this job
+        progress = SegmentedProgress(durations, label="captions")
+
+        # Each worker thread only waits on its own ffmpeg process
+        with ThreadPoolExecutor(max_workers=get_segment_workers()) as executor:
+            futures = [
+                # Run in a copy of the job's context, so cancelling the job stops the segment
+                executor.submit(contextvars.copy_context().run, _render_segment, video_path, video_filter,
+                                start, end, path, list(encode_args), duration, progress.part_callback(i), env)
+                for i, ((start, end), path, duration) in enumerate(zip(segments, segment_paths, durations))
+            ]
+            try:
+                for future in futures:
+                    future.result()
+            except Exception:
+                # Don't start segments that are still waiting once one has failed
+                for future in futures:
+                    future.cancel()
+                raise
+
+        list_path = os.path.join(work_dir, 'segments.txt')
+        with open(list_path, 'w') as f:
+            for path in segment_paths:
+                f.write(f"file '{path}'\n")
+
+        # Join the segments without re-encoding, and copy the audio from the source
+        cmd = [
+            'ffmpeg', '-nostdin', '-v', 'error', '-y',
+            '-f', 'concat', '-safe', '0', '-i', list_path,
+            '-i', video_path,
+            '-map', '0:v:0', '-map', '1:a:0?',
+            '-c', 'copy',
+            '-max_muxing_queue_size', '9999',
+            output_path
+        ]
+        subprocess.run(cmd, check=True, capture_output=True, text=True)
+        return output_path
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
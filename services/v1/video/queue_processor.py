@@ -10,13 +10,16 @@ import json
 import logging
 import threading
 import queue
-from datetime import datetime, timedelta
+from datetime import timedelta
 from typing import Dict, Any, List, Optional, Union
 from concurrent.futures import ThreadPoolExecutor
 import traceback
 
 # Import the captioning module
 from services.v1.video.caption_video import add_subtitles_to_video, process_captioning_v1
+from services.job_store import get_job_store, current_owner, lease, find_orphaned_jobs, hold_leases
+from services.job_context import job_context
+from services.job_control import job_scope, request_cancel, JobCancelled
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -34,6 +37,9 @@ MAX_QUEUE_SIZE = 100  # Maximum number of jobs in the queue
 MAX_RETRIES = 3  # Maximum number of retries for failed jobs
 JOB_TIMEOUT = timedelta(minutes=30)  # Maximum time a job can run
 
+# Name of this queue in the shared job store
+CAPTIONING_QUEUE = "captioning"
+
 # Job priority levels
 PRIORITY_HIGH = 0
 PRIORITY_NORMAL = 1
@@ -46,9 +52,9 @@ job_queues = {
     PRIORITY_LOW: queue.PriorityQueue()
 }
 
-# Job status tracking
-job_status = {}  # {job_id: {status, result, start_time, end_time, retries, error}}
-job_status_lock = threading.Lock()
+# Job status tracking, shared with other workers through the job store
+# Records: {status, result, created_at, start_time, end_time, retries, error} with epoch timestamps
+job_store = get_job_store()
 
 # Worker pool
 worker_pool = None
@@ -103,6 +109,10 @@ def initialize_queue_processor():
     # Start monitoring thread
     threading.Thread(target=monitor_thread, daemon=True).start()
     
+    recover_jobs()
+    hold_leases(job_store, CAPTIONING_QUEUE, [JOB_STATUS_PENDING, JOB_STATUS_RETRY, JOB_STATUS_PROCESSING],
+                recover=recover_jobs)
+    
     logger.info("Queue processor initialized successfully")
 
 
@@ -124,6 +134,18 @@ def shutdown_queue_processor():
     logger.info("Queue processor shutdown complete")
 
 
+def recover_jobs():
+    """Re-queue pending jobs left in the job store by a worker that has exited."""
+    owner = current_owner()
+    for record in find_orphaned_jobs(job_store, CAPTIONING_QUEUE, [JOB_STATUS_PENDING, JOB_STATUS_RETRY]):
+        job_id = record['job_id']
+        # Compare-and-set on the old owner so each job is taken over by a single worker
+        if job_store.update_job(job_id, lease(owner), expected_owner=record.get('owner')):
+            priority = record.get('priority', PRIORITY_NORMAL)
+            job_queues[priority].put(CaptioningJob(job_id, record.get('params', {}), priority))
+            logger.info(f"Job {job_id} recovered from job store")
+
+
 def enqueue_job(params: Dict[str, Any], job_id: Optional[str] = None, 
                 priority: int = PRIORITY_NORMAL) -> str:
     """
@@ -167,14 +189,14 @@ def enqueue_job(params: Dict[str, Any], job_id: Optional[str] = None,
     job = CaptioningJob(job_id, params, priority)
     
     # Update job status
-    with job_status_lock:
-        job_status[job_id] = {
-            'status': JOB_STATUS_PENDING,
-            'created_at': datetime.now(),
-            'priority': priority,
-            'retries': 0,
-            'params': params
-        }
+    job_store.put_job(job_id, {
+        'status': JOB_STATUS_PENDING,
+        'created_at': time.time(),
+        'priority': priority,
+        'retries': 0,
+        'params': params,
+        **lease()
+    }, queue=CAPTIONING_QUEUE)
     
     # Add to appropriate queue
     job_queues[priority].put(job)
@@ -202,17 +224,19 @@ def get_job_status(job_id: str) -> Dict[str, Any]:
     ValueError
         If the job ID is not found
     """
-    with job_status_lock:
-        if job_id not in job_status:
-            raise ValueError(f"Job ID {job_id} not found")
-        
-        # Return a copy to avoid race conditions
-        return dict(job_status[job_id])
+    record = job_store.get_job(job_id)
+    if record is None:
+        raise ValueError(f"Job ID {job_id} not found")
+    
+    return record
 
 
 def cancel_job(job_id: str) -> bool:
     """
-    Cancel a pending job.
+    Cancel a pending or processing job.
+    
+    A processing job is stopped by the worker running it: its ffmpeg processes are
+    terminated and it is marked as failed.
     
     Parameters:
     -----------
@@ -222,28 +246,33 @@ def cancel_job(job_id: str) -> bool:
     Returns:
     --------
     bool
-        True if the job was cancelled, False if it was already processing
+        True if the job was cancelled, False if it had already finished
     
     Raises:
     -------
     ValueError
         If the job ID is not found
     """
-    with job_status_lock:
-        if job_id not in job_status:
-            raise ValueError(f"Job ID {job_id} not found")
-        
-        status = job_status[job_id]['status']
-        
-        if status == JOB_STATUS_PENDING:
-            job_status[job_id]['status'] = JOB_STATUS_FAILED
-            job_status[job_id]['error'] = "Job cancelled by user"
-            job_status[job_id]['end_time'] = datetime.now()
-            logger.info(f"Job {job_id} cancelled")
-            return True
-        
-        logger.warning(f"Cannot cancel job {job_id} with status {status}")
-        return False
+    record = job_store.get_job(job_id)
+    if record is None:
+        raise ValueError(f"Job ID {job_id} not found")
+    
+    cancelled = job_store.update_job(job_id, {
+        'status': JOB_STATUS_FAILED,
+        'error': "Job cancelled by user",
+        'end_time': time.time()
+    }, expected_status=JOB_STATUS_PENDING)
+    
+    if cancelled:
+        logger.info(f"Job {job_id} cancelled")
+        return True
+    
+    if record['status'] == JOB_STATUS_PROCESSING and request_cancel(job_id):
+        logger.info(f"Job {job_id} cancellation requested")
+        return True
+    
+    logger.warning(f"Cannot cancel job {job_id} with status {record['status']}")
+    return False
 
 
 def worker_thread():
@@ -287,60 +316,85 @@ def process_job(job: CaptioningJob):
     job_id = job.job_id
     params = job.params
     
-    # Update job status to processing
-    with job_status_lock:
-        if job_id not in job_status:
-            logger.error(f"Job {job_id} not found in status tracking")
-            return
-        
-        if job_status[job_id]['status'] != JOB_STATUS_PENDING:
-            logger.warning(f"Job {job_id} is not in pending status, skipping")
-            return
-        
-        job_status[job_id]['status'] = JOB_STATUS_PROCESSING
-        job_status[job_id]['start_time'] = datetime.now()
+    # Update job status to processing (pending jobs and jobs waiting for a retry can be started)
+    record = job_store.get_job(job_id)
+    if record is None:
+        logger.error(f"Job {job_id} not found in status tracking")
+        return
+    
+    if record['status'] not in (JOB_STATUS_PENDING, JOB_STATUS_RETRY):
+        logger.warning(f"Job {job_id} is not in pending status, skipping")
+        return
+
+    # Compare-and-set so a job is never started twice
+    started = job_store.update_job(job_id, {
+        'status': JOB_STATUS_PROCESSING,
+        'start_time': time.time()
+    }, expected_status=record['status'])
+
+    if not started:
+        logger.warning(f"Job {job_id} was started elsewhere, skipping")
+        return
     
     logger.info(f"Processing job {job_id}")
     
     try:
-        # Call the captioning process
-        result = process_captioning_v1(params)
+        # Call the captioning process; it is stopped if it exceeds JOB_TIMEOUT or is cancelled
+        with job_context(job_id, params), job_scope(job_id, timeout=int(JOB_TIMEOUT.total_seconds())) as control:
+            result = process_captioning_v1(params)
+        
+        if control.cancelled.is_set():
+            raise JobCancelled(job_id, control.reason)
         
         # Update job status to completed
-        with job_status_lock:
-            job_status[job_id]['status'] = JOB_STATUS_COMPLETED
-            job_status[job_id]['result'] = result
-            job_status[job_id]['end_time'] = datetime.now()
+        job_store.update_job(job_id, {
+            'status': JOB_STATUS_COMPLETED,
+            'result': result,
+            'end_time': time.time()
+        })
         
         logger.info(f"Job {job_id} completed successfully")
         
+    except JobCancelled as e:
+        # Cancelled and timed out jobs are not retried
+        job_store.update_job(job_id, {
+            'status': JOB_STATUS_FAILED,
+            'error': e.reason,
+            'end_time': time.time()
+        })
+        logger.warning(f"Job {job_id} stopped: {e.reason}")
+        
     except Exception as e:
         logger.error(f"Error processing job {job_id}: {str(e)}")
         logger.error(traceback.format_exc())
         
         # Update job status to failed or retry
-        with job_status_lock:
-            retries = job_status[job_id].get('retries', 0)
+        record = job_store.get_job(job_id) or {}
+        retries = record.get('retries', 0)
+        
+        if retries < MAX_RETRIES:
+            # Schedule for retry
+            job_store.update_job(job_id, {
+                'status': JOB_STATUS_RETRY,
+                'retries': retries + 1,
+                'error': str(e)
+            })
             
-            if retries < MAX_RETRIES:
-                # Schedule for retry
-                job_status[job_id]['status'] = JOB_STATUS_RETRY
-                job_status[job_id]['retries'] = retries + 1
-                job_status[job_id]['error'] = str(e)
-                
-                # Re-queue the job with a delay based on retry count
-                retry_job = CaptioningJob(job_id, params, job.priority)
-                retry_job.sequence = int(time.time() * 1000) + (retries * 60000)  # Add delay
-                job_queues[job.priority].put(retry_job)
-                
-                logger.info(f"Job {job_id} scheduled for retry {retries + 1}/{MAX_RETRIES}")
-            else:
-                # Max retries reached, mark as failed
-                job_status[job_id]['status'] = JOB_STATUS_FAILED
-                job_status[job_id]['error'] = str(e)
-                job_status[job_id]['end_time'] = datetime.now()
-                
-                logger.warning(f"Job {job_id} failed after {MAX_RETRIES} retries")
+            # Re-queue the job with a delay based on retry count
+            retry_job = CaptioningJob(job_id, params, job.priority)
+            retry_job.sequence = int(time.time() * 1000) + (retries * 60000)  # Add delay
+            job_queues[job.priority].put(retry_job)
+            
+            logger.info(f"Job {job_id} scheduled for retry {retries + 1}/{MAX_RETRIES}")
+        else:
+            # Max retries reached, mark as failed
+            job_store.update_job(job_id, {
+                'status': JOB_STATUS_FAILED,
+                'error': str(e),
+                'end_time': time.time()
+            })
+            
+            logger.warning(f"Job {job_id} failed after {MAX_RETRIES} retries")
 
 
 def monitor_thread():
@@ -348,25 +402,32 @@ def monitor_thread():
     logger.info("Monitor thread started")
     
     while not shutdown_flag.is_set():
-        now = datetime.now()
+        now = time.time()
         
-        with job_status_lock:
-            # Check for stalled jobs
-            for job_id, status in list(job_status.items()):
+        try:
+            for status in job_store.list_jobs(queue=CAPTIONING_QUEUE):
+                job_id = status['job_id']
+                
+                # Check for stalled jobs (running jobs are stopped by their worker at JOB_TIMEOUT;
+                # this catches jobs whose worker died)
                 if status['status'] == JOB_STATUS_PROCESSING:
                     start_time = status.get('start_time')
-                    if start_time and (now - start_time) > JOB_TIMEOUT:
+                    if start_time and (now - start_time) > JOB_TIMEOUT.total_seconds():
                         logger.warning(f"Job {job_id} has exceeded timeout, marking as failed")
-                        status['status'] = JOB_STATUS_FAILED
-                        status['error'] = "Job exceeded maximum execution time"
-                        status['end_time'] = now
+                        job_store.update_job(job_id, {
+                            'status': JOB_STATUS_FAILED,
+                            'error': "Job exceeded maximum execution time",
+                            'end_time': now
+                        }, expected_status=JOB_STATUS_PROCESSING)
                 
                 # Clean up old completed/failed jobs (keep for 24 hours)
                 if status['status'] in (JOB_STATUS_COMPLETED, JOB_STATUS_FAILED):
                     end_time = status.get('end_time')
-                    if end_time and (now - end_time) > timedelta(hours=24):
+                    if end_time and (now - end_time) > timedelta(hours=24).total_seconds():
                         logger.info(f"Removing old job {job_id} from status tracking")
-                        job_status.pop(job_id, None)
+                        job_store.delete_job(job_id)
+        except Exception as e:
+            logger.error(f"Error checking job store: {str(e)}")
         
         # Sleep for a while
         time.sleep(60)  # Check every minute
@@ -383,13 +444,13 @@ def get_queue_stats() -> Dict[str, Any]:
     Dict[str, Any]
         Queue statistics
     """
-    with job_status_lock:
-        total_jobs = len(job_status)
-        pending_jobs = sum(1 for s in job_status.values() if s['status'] == JOB_STATUS_PENDING)
-        processing_jobs = sum(1 for s in job_status.values() if s['status'] == JOB_STATUS_PROCESSING)
-        completed_jobs = sum(1 for s in job_status.values() if s['status'] == JOB_STATUS_COMPLETED)
-        failed_jobs = sum(1 for s in job_status.values() if s['status'] == JOB_STATUS_FAILED)
-        retry_jobs = sum(1 for s in job_status.values() if s['status'] == JOB_STATUS_RETRY)
+    statuses = [s['status'] for s in job_store.list_jobs(queue=CAPTIONING_QUEUE)]
+    total_jobs = len(statuses)
+    pending_jobs = statuses.count(JOB_STATUS_PENDING)
+    processing_jobs = statuses.count(JOB_STATUS_PROCESSING)
+    completed_jobs = statuses.count(JOB_STATUS_COMPLETED)
+    failed_jobs = statuses.count(JOB_STATUS_FAILED)
+    retry_jobs = statuses.count(JOB_STATUS_RETRY)
     
     return {
         'total_jobs': total_jobs,
@@ -0,0 +1,254 @@
+"""
+Small font directories for libass.
+
+When the ass/subtitles filters start, libass initializes fontconfig over every
+font of the container, including the large Noto CJK collections. Instead, each
+caption render gets a directory holding only the fonts its styles reference,
+plus a Latin fallback and the preferred font of every other script in the
+subtitle text, with its own fonts.conf and a prebuilt fontconfig cache. The
+fonts.conf also includes the system's conf.d rules, so generic names and
+aliases resolve as before. ffmpeg runs with FONTCONFIG_FILE pointing at that
+fonts.conf, so libass starts in milliseconds.
+
+Text with characters no registry script covers (emoji, symbols, scripts the
+registry does not know), or in a script no installed font covers, is rendered
+with the system fontconfig as before.
+
+Directories are keyed by their set of font files and reused across renders.
+"""
+
+import os
+import re
+import bisect
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import subprocess
+import unicodedata
+from services.font_registry import get_font_registry
+
+logger = logging.getLogger(__name__)
+
+# Give libass a curated font directory instead of all system fonts (set to false to disable)
+SUBTITLE_FONTS_ISOLATED = os.environ.get('SUBTITLE_FONTS_ISOLATED', 'true').lower() == 'true'
+# Where the curated font directories are kept
+SUBTITLE_FONTS_DIR = os.environ.get('SUBTITLE_FONTS_DIR', '/tmp/nca_subtitle_fonts')
+
+# Always included, so digits and punctuation render whatever the styled font is
+FALLBACK_SCRIPTS = ("latin",)
+
+# Rules of the system fontconfig (aliases such as sans-serif, substitutions, hinting)
+SYSTEM_FONTCONFIG_RULES = '/etc/fonts/conf.d'
+
+FONTS_CONF = """<?xml version="1.0"?>
+<!DOCTYPE fontconfig SYSTEM "fonts.dtd">
+<fontconfig>
+  <dir>{fonts_dir}</dir>
+  <cachedir>{cache_dir}</cachedir>
+  <include ignore_missing="yes">{rules_dir}</include>
+</fontconfig>
+"""
+
+# Characters of the scripts the font registry finds fonts for
+SCRIPT_CHARACTERS = {
+    "latin": [(0x0000, 0x024F), (0x0300, 0x036F), (0x1E00, 0x1EFF), (0x2000, 0x206F), (0x20A0, 0x20CF)],
+    "greek": [(0x0370, 0x03FF), (0x1F00, 0x1FFF)],
+    "cyrillic": [(0x0400, 0x052F)],
+    "hebrew": [(0x0590, 0x05FF)],
+    "arabic": [(0x0600, 0x06FF), (0x0750, 0x077F), (0xFB50, 0xFDFF), (0xFE70, 0xFEFF)],
+    "devanagari": [(0x0900, 0x097F)],
+    "thai": [(0x0E00, 0x0E7F)],
+    "hangul": [(0x1100, 0x11FF), (0x3130, 0x318F), (0xAC00, 0xD7AF)],
+    "cjk": [(0x2E80, 0x2FDF), (0x3000, 0x30FF), (0x31F0, 0x31FF), (0x3400, 0x4DBF), (0x4E00, 0x9FFF),
+            (0xF900, 0xFAFF), (0xFF00, 0xFFEF), (0x20000, 0x2FA1F)]
+}
+
+_RANGES = sorted((first, last, script) for script, ranges in SCRIPT_CHARACTERS.items() for first, last in ranges)
+_RANGE_STARTS = [first for first, _, _ in _RANGES]
+
+_FONT_OVERRIDE = re.compile(r'\\fn([^\\}]+)')
+_OVERRIDE_BLOCK = re.compile(r'\{[^}]*\}')
+_ESCAPE = re.compile(r'\\[Nnh]')
+
+_prepared = {}
+_lock = threading.Lock()
+
+
+def referenced_fonts(subtitle_path, font_name=None):
+    """
+    Return the font names a subtitle render uses.
+
+    For ASS files these are the Fontname of every style and every \\fn override;
+    font_name is the font forced on SRT files.
+    """
+    names = set()
+    if font_name:
+        names.add(font_name)
+    if not subtitle_path.lower().endswith('.ass'):
+        return names
+
+    fontname_index = 1
+    with open(subtitle_path, 'r', encoding='utf-8-sig', errors='ignore') as f:
+        section = None
+        for line in f:
+            line = line.strip()
+            if line.startswith('['):
+                section = line.lower()
+            elif section in ('[v4+ styles]', '[v4 styles]') and line.startswith('Format:'):
+                fields = [field.strip().lower() for field in line[len('Format:'):].split(',')]
+                if 'fontname' in fields:
+                    fontname_index = fields.index('fontname')
+            elif section in ('[v4+ styles]', '[v4 styles]') and line.startswith('Style:'):
+                values = line[len('Style:'):].split(',')
+                if len(values) > fontname_index:
+                    names.add(values[fontname_index].strip().lstrip('@'))
+            elif section == '[events]' and '\\fn' in line:
+                names.update(name.strip() for name in _FONT_OVERRIDE.findall(line))
+    return {name for name in names if name}
+
+
+def _subtitle_text(subtitle_path):
+    """The text the render shows: the Text of ASS events without override tags, or the whole SRT."""
+    with open(subtitle_path, 'r', encoding='utf-8-sig', errors='ignore') as f:
+        if not subtitle_path.lower().endswith('.ass'):
+            return f.read()
+        field_count = 10
+        section = None
+        texts = []
+        for line in f:
+            line = line.strip()
+            if line.startswith('['):
+                section = line.lower()
+            elif section == '[events]' and line.startswith('Format:'):
+                field_count = len(line[len('Format:'):].split(','))
+            elif section == '[events]' and line.startswith('Dialogue:'):
+                # Text is the last field and may itself contain commas
+                fields = line[len('Dialogue:'):].split(',', field_count - 1)
+                texts.append(_ESCAPE.sub(' ', _OVERRIDE_BLOCK.sub('', fields[-1])))
+        return '\n'.join(texts)
+
+
+def subtitle_scripts(subtitle_path):
+    """
+    Return the scripts of the subtitle text.
+
+    Returns:
+        (scripts, uncovered): the SCRIPT_CHARACTERS names found, and the
+        characters that belong to none of them (e.g. emoji)
+    """
+    scripts = set()
+    uncovered = set()
+    for char in set(_subtitle_text(subtitle_path)):
+        # Whitespace, control and format characters (e.g. zero-width joiners) need no glyph
+        if unicodedata.category(char)[0] in ('Z', 'C'):
+            continue
+        code = ord(char)
+        index = bisect.bisect_right(_RANGE_STARTS, code) - 1
+        if index >= 0 and code <= _RANGES[index][1]:
+            scripts.add(_RANGES[index][2])
+        else:
+            uncovered.add(char)
+    return scripts, uncovered
+
+
+def _select_faces(font_names, scripts):
+    """
+    Collect the faces of the referenced fonts and of the preferred font of every script.
+
+    Returns:
+        {path: face}, or None if one of the scripts has no installed font
+    """
+    registry = get_font_registry()
+    faces = {}
+    for name in font_names:
+        matches = registry.find_fonts(name)
+        if not matches:
+            logger.warning(f"Font {name} is not installed; libass will use a fallback font")
+        for face in matches:
+            faces[face.path] = face
+    for script in sorted(set(FALLBACK_SCRIPTS) | set(scripts)):
+        default = registry.default_font(script)
+        if default is None:
+            if script in scripts:
+                logger.info(f"No installed font covers {script} text; using the system fonts")
+                return None
+            continue
+        for face in registry.find_fonts(default.family):
+            faces[face.path] = face
+    return faces
+
+
+def _build(fonts_dir, paths):
+    """Create a fonts directory with links to the font files and a warm fontconfig cache."""
+    os.makedirs(SUBTITLE_FONTS_DIR, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.building_', dir=SUBTITLE_FONTS_DIR)
+    try:
+        for i, path in enumerate(sorted(paths)):
+            # Prefix with an index, since font files of different directories may share a name
+            link = os.path.join(staging, f"{i:03d}_{os.path.basename(path)}")
+            try:
+                os.symlink(path, link)
+            except OSError:
+                shutil.copyfile(path, link)
+        conf_path = os.path.join(staging, 'fonts.conf')
+        with open(conf_path, 'w') as f:
+            f.write(FONTS_CONF.format(fonts_dir=fonts_dir, cache_dir=os.path.join(fonts_dir, '.cache'),
+                                      rules_dir=SYSTEM_FONTCONFIG_RULES))
+        try:
+            os.rename(staging, fonts_dir)
+        except OSError:
+            # Another worker built the same directory first
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    env = dict(os.environ, FONTCONFIG_FILE=os.path.join(fonts_dir, 'fonts.conf'))
+    try:
+        subprocess.run(['fc-cache', fonts_dir], env=env, capture_output=True, check=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        # ffmpeg then writes the cache on its first run
+        logger.warning(f"Could not prebuild the font cache of {fonts_dir}: {str(e)}")
+
+
+def prepare_fonts(subtitle_path, font_name=None):
+    """
+    Prepare the font directory for a subtitle render.
+
+    Returns:
+        (fonts_dir, env): the directory and the environment to run ffmpeg with,
+        or (None, None) to use the system fonts: if isolation is disabled, no
+        fonts were found or the curated fonts would not cover the text
+    """
+    if not SUBTITLE_FONTS_ISOLATED:
+        return None, None
+    try:
+        scripts, uncovered = subtitle_scripts(subtitle_path)
+        if uncovered:
+            logger.info(f"Subtitle text has characters outside the known scripts "
+                        f"({''.join(sorted(uncovered)[:10])}); using the system fonts")
+            return None, None
+        faces = _select_faces(referenced_fonts(subtitle_path, font_name), scripts)
+        if faces is None:
+            return None, None
+        hasher = hashlib.sha256()
+        for path in sorted(faces):
+            stat = os.stat(path)
+            hasher.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}\n".encode('utf-8'))
+    except OSError as e:
+        logger.warning(f"Could not collect the fonts of {subtitle_path}: {str(e)}")
+        return None, None
+    if not faces:
+        return None, None
+    fonts_dir = os.path.join(SUBTITLE_FONTS_DIR, hasher.hexdigest()[:16])
+
+    with _lock:
+        if fonts_dir not in _prepared:
+            if not os.path.isdir(fonts_dir):
+                _build(fonts_dir, list(faces))
+                logger.info(f"Prepared font directory {fonts_dir} with {len(faces)} font files")
+            _prepared[fonts_dir] = dict(os.environ, FONTCONFIG_FILE=os.path.join(fonts_dir, 'fonts.conf'))
+    return fonts_dir, _prepared[fonts_dir]
@@ -1,33 +1,236 @@
-import requests
-import logging
+"""
+Asynchronous webhook delivery.
+
+send_webhook() serializes the payload once and puts it in a bounded outbox. A
+small pool of dispatcher threads delivers it with a timeout, and retries failed
+deliveries with exponential backoff, so job workers never wait on a slow or dead
+receiver. Optionally, payloads for the same URL that are queued within
+WEBHOOK_BATCH_WINDOW seconds are delivered together as one JSON array.
+"""
+
+import os
 import json
+import time
+import heapq
+import atexit
+import random
+import logging
+import threading
+import itertools
+import requests
+from services import http_client
 
 logger = logging.getLogger(__name__)
 
-def send_webhook(webhook_url, data):
-    """Send a POST request to a webhook URL with the provided data."""
-    try:
-        # Ensure data is JSON serializable
+# Maximum number of deliveries waiting in the outbox (new webhooks are dropped when full)
+WEBHOOK_OUTBOX_SIZE = int(os.environ.get('WEBHOOK_OUTBOX_SIZE', 1000))
+# Number of dispatcher threads per worker
+WEBHOOK_WORKERS = int(os.environ.get('WEBHOOK_WORKERS', 2))
+# Read timeout for the receiver's response, in seconds
+WEBHOOK_TIMEOUT = float(os.environ.get('WEBHOOK_TIMEOUT', 10))
+# Retries after the first attempt, with delays of WEBHOOK_RETRY_DELAY * 2^n seconds
+WEBHOOK_MAX_RETRIES = int(os.environ.get('WEBHOOK_MAX_RETRIES', 5))
+WEBHOOK_RETRY_DELAY = float(os.environ.get('WEBHOOK_RETRY_DELAY', 2))
+# Batch payloads for the same URL queued within this many seconds (0 disables batching)
+WEBHOOK_BATCH_WINDOW = float(os.environ.get('WEBHOOK_BATCH_WINDOW', 0))
+WEBHOOK_BATCH_MAX = int(os.environ.get('WEBHOOK_BATCH_MAX', 50))
+
+# Client errors that may succeed on retry
+RETRYABLE_CLIENT_ERRORS = (408, 429)
+
+
+class WebhookDelivery:
+    """One POST to a receiver, carrying one payload or a batch of payloads."""
+
+    def __init__(self, url, body, batched=False):
+        self.url = url
+        self.bodies = [body]
+        self.batched = batched
+        self.attempts = 0
+        self.created_at = time.time()
+
+    def payload(self):
+        if self.batched:
+            return "[" + ",".join(self.bodies) + "]"
+        return self.bodies[0]
+
+
+class WebhookDispatcher:
+    """Bounded outbox drained by dispatcher threads, with delayed retries."""
+
+    def __init__(self, workers=WEBHOOK_WORKERS, outbox_size=WEBHOOK_OUTBOX_SIZE,
+                 batch_window=WEBHOOK_BATCH_WINDOW):
+        self.workers = max(1, workers)
+        self.outbox_size = outbox_size
+        self.batch_window = batch_window
+        self._outbox = []          # heap of (due_time, sequence, delivery)
+        self._open_batches = {}    # {url: delivery that can still take payloads}
+        self._in_flight = 0
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._started = False
+        self.metrics = {
+            "enqueued": 0,
+            "delivered": 0,
+            "retried": 0,
+            "failed": 0,
+            "dropped": 0,
+            "total_latency": 0.0
+        }
+
+    def start(self):
+        with self._condition:
+            if self._started:
+                return
+            self._started = True
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f"webhook-dispatcher-{i}", daemon=True).start()
+
+    def enqueue(self, url, body):
+        """
+        Queue a serialized JSON payload for delivery.
+
+        Returns:
+            False if the outbox is full and the payload was dropped
+        """
+        self.start()
+        with self._condition:
+            self.metrics["enqueued"] += 1
+
+            if self.batch_window > 0:
+                batch = self._open_batches.get(url)
+                if batch is not None and len(batch.bodies) < WEBHOOK_BATCH_MAX:
+                    batch.bodies.append(body)
+                    return True
+
+            if len(self._outbox) >= self.outbox_size:
+                self.metrics["dropped"] += 1
+                logger.error(f"Webhook outbox full ({self.outbox_size}), dropping webhook to {url}")
+                return False
+
+            delivery = WebhookDelivery(url, body, batched=self.batch_window > 0)
+            if self.batch_window > 0:
+                self._open_batches[url] = delivery
+            self._push(delivery, time.time() + self.batch_window)
+            return True
+
+    def _push(self, delivery, due_time):
+        heapq.heappush(self._outbox, (due_time, next(self._sequence), delivery))
+        self._condition.notify()
+
+    def _next_delivery(self):
+        """Wait for the next due delivery. Caller holds the lock."""
+        while True:
+            if not self._outbox:
+                self._condition.wait()
+                continue
+            due_time, _, delivery = self._outbox[0]
+            delay = due_time - time.time()
+            if delay > 0:
+                self._condition.wait(delay)
+                continue
+            heapq.heappop(self._outbox)
+            if self._open_batches.get(delivery.url) is delivery:
+                # The batch is closed once it is being sent
+                del self._open_batches[delivery.url]
+            self._in_flight += 1
+            return delivery
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                delivery = self._next_delivery()
+            try:
+                self._deliver(delivery)
+            except Exception as e:
+                logger.error(f"Unexpected error delivering webhook to {delivery.url}: {str(e)}", exc_info=True)
+            finally:
+                with self._condition:
+                    self._in_flight -= 1
+                    self._condition.notify_all()
+
+    def _deliver(self, delivery):
+        delivery.attempts += 1
+        count = len(delivery.bodies)
         try:
-            # Test if the data is JSON serializable
-            json_data = json.dumps(data)
-            # Use the serialized data to ensure it's properly formatted
-            data_dict = json.loads(json_data)
-            
-            logger.info(f"Attempting to send webhook to {webhook_url}")
-            response = requests.post(webhook_url, json=data_dict)
+            logger.info(f"Attempting to send webhook to {delivery.url} ({count} payload(s), attempt {delivery.attempts})")
+            response = http_client.post(
+                delivery.url,
+                data=delivery.payload().encode('utf-8'),
+                headers={'Content-Type': 'application/json'},
+                timeout=(http_client.HTTP_CONNECT_TIMEOUT, WEBHOOK_TIMEOUT)
+            )
             response.raise_for_status()
+            with self._condition:
+                self.metrics["delivered"] += count
+                self.metrics["total_latency"] += count * (time.time() - delivery.created_at)
             logger.info(f"Webhook sent successfully")
-        except (TypeError, json.JSONDecodeError) as json_error:
-            logger.error(f"Data is not JSON serializable: {json_error}")
-            # Create a simplified version that should be serializable
-            simple_data = {
-                "status": "error",
-                "message": "Failed to serialize response data",
-                "error": str(json_error)
+            return
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            retryable = status is None or status >= 500 or status in RETRYABLE_CLIENT_ERRORS
+            error = e
+        except requests.RequestException as e:
+            retryable = True
+            error = e
+
+        if retryable and delivery.attempts <= WEBHOOK_MAX_RETRIES:
+            delay = WEBHOOK_RETRY_DELAY * (2 ** (delivery.attempts - 1)) * random.uniform(0.8, 1.2)
+            logger.warning(f"Webhook request to {delivery.url} failed: {error}, retrying in {delay:.1f}s")
+            with self._condition:
+                self.metrics["retried"] += 1
+                self._push(delivery, time.time() + delay)
+        else:
+            logger.error(f"Webhook request failed: {error}")
+            with self._condition:
+                self.metrics["failed"] += count
+
+    def flush(self, timeout):
+        """Wait up to timeout seconds for queued and in-flight deliveries to finish."""
+        deadline = time.time() + timeout
+        with self._condition:
+            while self._outbox or self._in_flight:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def get_metrics(self):
+        with self._condition:
+            delivered = self.metrics["delivered"]
+            return {
+                "enqueued": self.metrics["enqueued"],
+                "delivered": delivered,
+                "retried": self.metrics["retried"],
+                "failed": self.metrics["failed"],
+                "dropped": self.metrics["dropped"],
+                "pending": len(self._outbox) + self._in_flight,
+                "avg_latency": round(self.metrics["total_latency"] / delivered, 3) if delivered else 0
             }
-            response = requests.post(webhook_url, json=simple_data)
-            response.raise_for_status()
-            logger.info(f"Simplified webhook sent")
-    except requests.RequestException as e:
-        logger.error(f"Webhook request failed: {e}")
+
+
+dispatcher = WebhookDispatcher()
+
+# Give queued webhooks a chance to go out when the worker shuts down
+atexit.register(lambda: dispatcher.flush(timeout=10))
+
+
+def send_webhook(webhook_url, data):
+    """Queue a POST request to a webhook URL with the provided data."""
+    if not webhook_url:
+        return
+
+    # Ensure data is JSON serializable
+    try:
+        body = json.dumps(data)
+    except (TypeError, ValueError) as json_error:
+        logger.error(f"Data is not JSON serializable: {json_error}")
+        # Create a simplified version that should be serializable
+        body = json.dumps({
+            "status": "error",
+            "message": "Failed to serialize response data",
+            "error": str(json_error)
+        })
+
+    dispatcher.enqueue(webhook_url, body)
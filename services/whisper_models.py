@@ -0,0 +1,152 @@
+"""
+Process-wide pool of warm Whisper models.
+
+Loading a Whisper model takes seconds of disk I/O and ~1.5 GB of allocation for
+"medium", so each model size is loaded once per worker and reused by every job.
+
+A model instance is not safe to share between concurrent transcribe() calls:
+whisper installs key/value cache hooks on the model for the duration of each
+call. Jobs therefore check out an instance exclusively. WHISPER_POOL_SIZE
+instances can be loaded per size to allow that many concurrent transcriptions.
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+try:
+    import whisper
+    WHISPER_AVAILABLE = True
+except (ImportError, TypeError) as e:
+    logger.warning(f"Could not import Whisper: {str(e)}")
+    WHISPER_AVAILABLE = False
+
+# Number of instances of each model size that may be loaded at once
+WHISPER_POOL_SIZE = int(os.environ.get('WHISPER_POOL_SIZE', 1))
+
+# Unload models that have not been used for this many seconds (0 keeps them loaded)
+WHISPER_IDLE_TIMEOUT = int(os.environ.get('WHISPER_IDLE_TIMEOUT', 0))
+
+# Comma separated model sizes to load at startup, e.g. "base,medium"
+WHISPER_PRELOAD = os.environ.get('WHISPER_PRELOAD', '')
+
+
+class ModelPool:
+    """Pool of instances of a single Whisper model size."""
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = max(1, size)
+        self._idle = []          # Loaded instances that are not checked out
+        self._loaded = 0         # Loaded (or loading) instances, idle or checked out
+        self._last_used = time.time()
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Check out an instance, loading one if the pool is not full yet."""
+        with self._condition:
+            while not self._idle and self._loaded >= self.size:
+                self._condition.wait()
+            if self._idle:
+                return self._idle.pop()
+            # Reserve the slot, then load without holding the lock
+            self._loaded += 1
+
+        try:
+            start_time = time.time()
+            model = whisper.load_model(self.name)
+            logger.info(f"Loaded Whisper model {self.name} in {time.time() - start_time:.1f}s")
+            return model
+        except Exception:
+            with self._condition:
+                self._loaded -= 1
+                self._condition.notify()
+            raise
+
+    def release(self, model):
+        """Return an instance to the pool."""
+        with self._condition:
+            self._idle.append(model)
+            self._last_used = time.time()
+            self._condition.notify()
+
+    def evict_idle(self, timeout):
+        """Unload all instances if none are in use and the pool has been idle for timeout seconds."""
+        with self._condition:
+            if self._idle and len(self._idle) == self._loaded and time.time() - self._last_used > timeout:
+                count = len(self._idle)
+                self._idle.clear()
+                self._loaded = 0
+                logger.info(f"Unloaded {count} idle Whisper model(s) {self.name}")
+                return True
+        return False
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_reaper_started = False
+
+
+def _get_pool(name):
+    global _reaper_started
+    if not WHISPER_AVAILABLE:
+        raise RuntimeError("Whisper is not available")
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = _pools[name] = ModelPool(name, WHISPER_POOL_SIZE)
+        if WHISPER_IDLE_TIMEOUT > 0 and not _reaper_started:
+            threading.Thread(target=_idle_reaper, name="whisper-idle-reaper", daemon=True).start()
+            _reaper_started = True
+    return pool
+
+
+def _idle_reaper():
+    interval = max(1, min(60, WHISPER_IDLE_TIMEOUT // 2))
+    while True:
+        time.sleep(interval)
+        with _pools_lock:
+            pools = list(_pools.values())
+        evicted = [pool.evict_idle(WHISPER_IDLE_TIMEOUT) for pool in pools]
+        if any(evicted):
+            try:
+                import torch
+                if torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+            except ImportError:
+                pass
+
+
+@contextmanager
+def checkout_model(name):
+    """
+    Check out a warm Whisper model for exclusive use.
+
+    Args:
+        name: Whisper model size, e.g. "base" or "medium"
+
+    Yields:
+        The loaded whisper model
+    """
+    pool = _get_pool(name)
+    model = pool.acquire()
+    try:
+        yield model
+    finally:
+        pool.release(model)
+
+
+def preload_models(names=None):
+    """Load one instance of each model size listed in WHISPER_PRELOAD (or names)."""
+    if names is None:
+        names = [name.strip() for name in WHISPER_PRELOAD.split(',') if name.strip()]
+    for name in names:
+        try:
+            with checkout_model(name):
+                pass
+        except Exception as e:
+            logger.error(f"Failed to preload Whisper model {name}: {str(e)}")
@@ -0,0 +1,65 @@
+import os
+import wave
+import numpy as np
+import pytest
+from services.disk_cache import DiskCache
+from services.v1.media import asr_upload
+from services.v1.media.asr_upload import upload_bitrate, prepare_upload, SIZE_MARGIN
+from services.v1.media.audio_artifacts import write_pcm
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch):
+    monkeypatch.setattr(asr_upload, "ASR_UPLOAD_BITRATE", 32000)
+    monkeypatch.setattr(asr_upload, "ASR_UPLOAD_MAX_BYTES", 25 * 1000 * 1000)
+
+
+def test_short_audio_uses_the_configured_bitrate():
+    assert upload_bitrate(600, fmt="opus") == 32000
+
+
+def test_long_audio_is_lowered_to_fit_the_limit():
+    duration = 4 * 3600
+    bitrate = upload_bitrate(duration, fmt="opus")
+    assert bitrate < 32000
+    assert bitrate * duration / 8 <= 25 * 1000 * 1000 * SIZE_MARGIN
+
+
+def test_bitrate_never_drops_below_the_format_minimum():
+    assert upload_bitrate(100 * 3600, fmt="opus") == 6000
+    assert upload_bitrate(100 * 3600, fmt="aac") == 16000
+
+
+def test_no_limit_or_no_duration():
+    assert upload_bitrate(100 * 3600, max_bytes=0, fmt="opus") == 32000
+    assert upload_bitrate(0, fmt="opus") == 32000
+
+
+@pytest.fixture
+def pcm(tmp_path):
+    return write_pcm(str(tmp_path / "audio.pcm"), [np.arange(32000, dtype=np.int16)])
+
+
+def _frames(path):
+    with wave.open(path, "rb") as f:
+        return f.getnframes()
+
+
+def test_wav_uploads_are_cached(tmp_path, monkeypatch, pcm):
+    monkeypatch.setattr(asr_upload, "ASR_UPLOAD_FORMAT", "wav")
+    monkeypatch.setattr(asr_upload, "artifact_cache", DiskCache(str(tmp_path / "cache"), 10 ** 7))
+    path = prepare_upload(pcm)
+    assert path.endswith(".wav")
+    assert _frames(path) == 32000
+    assert prepare_upload(pcm) == path
+    assert _frames(prepare_upload(pcm, start=0.5, end=1.5)) == 16000
+
+
+def test_uploads_are_private_files_without_the_cache(tmp_path, monkeypatch, pcm):
+    monkeypatch.setattr(asr_upload, "ASR_UPLOAD_FORMAT", "wav")
+    monkeypatch.setattr(asr_upload, "artifact_cache", DiskCache(str(tmp_path / "cache"), 0))
+    private_paths = []
+    path = prepare_upload(pcm, private_paths=private_paths)
+    assert private_paths == [path]
+    assert _frames(path) == 32000
+    os.remove(path)
@@ -0,0 +1,73 @@
+import gc
+import os
+import numpy as np
+import pytest
+from services.disk_cache import DiskCache
+from services.v1.media import audio_artifacts
+from services.v1.media.audio_artifacts import load_pcm, write_pcm
+
+SAMPLES = np.arange(16000, dtype=np.int16)
+
+
+@pytest.fixture
+def media(tmp_path, monkeypatch):
+    # ffmpeg is replaced by a decoder that writes one second of known samples
+    decodes = []
+
+    def decode(media_path, output_path):
+        decodes.append(media_path)
+        SAMPLES.tofile(output_path)
+
+    monkeypatch.setattr(audio_artifacts, "_decode", decode)
+    path = tmp_path / "voice.mp3"
+    path.write_bytes(b"media")
+    return str(path), decodes
+
+
+def test_pcm_slices_are_views(tmp_path):
+    pcm = write_pcm(str(tmp_path / "a.pcm"), [SAMPLES[:8000], SAMPLES[8000:]])
+    assert pcm.duration == 1.0
+    assert np.array_equal(pcm.slice(0.25, 0.5), SAMPLES[4000:8000])
+    assert pcm.to_float32(0, 0.001).dtype == np.float32
+
+
+def test_decoded_audio_is_cached(tmp_path, monkeypatch, media):
+    path, decodes = media
+    monkeypatch.setattr(audio_artifacts, "artifact_cache", DiskCache(str(tmp_path / "cache"), 10 ** 7))
+    first = load_pcm(path)
+    second = load_pcm(path)
+    assert decodes == [path]
+    assert first.path == second.path
+    assert np.array_equal(second.samples, SAMPLES)
+    # Closing cached audio leaves the file to the cache
+    first.close()
+    assert os.path.exists(second.path)
+
+
+def test_disabled_cache_decodes_to_a_private_file(tmp_path, monkeypatch, media):
+    path, decodes = media
+    monkeypatch.setattr(audio_artifacts, "artifact_cache", DiskCache(str(tmp_path / "cache"), 0))
+    pcm = load_pcm(path)
+    assert np.array_equal(pcm.samples, SAMPLES)
+    assert os.path.exists(pcm.path)
+    pcm.close()
+    assert not os.path.exists(pcm.path)
+
+    pcm = load_pcm(path)
+    pcm_path = pcm.path
+    assert pcm_path != path
+    del pcm
+    gc.collect()
+    assert not os.path.exists(pcm_path)
+    assert len(decodes) == 2
+
+
+def test_failed_store_decodes_to_a_private_file(tmp_path, monkeypatch, media):
+    path, _ = media
+    cache = DiskCache(str(tmp_path / "cache"), 10 ** 7)
+    monkeypatch.setattr(cache, "put", lambda key, write: None)
+    monkeypatch.setattr(audio_artifacts, "artifact_cache", cache)
+    pcm = load_pcm(path)
+    assert np.array_equal(pcm.samples, SAMPLES)
+    pcm.close()
+    assert not os.path.exists(pcm.path)
@@ -0,0 +1,66 @@
+import pytest
+from services.v1.media.chunked_transcribe import plan_chunks, stitch_results
+
+
+def _words(*items):
+    return [{"word": word, "start": start, "end": start + 0.5} for word, start in items]
+
+
+def _segment(words):
+    return {"start": words[0]["start"], "end": words[-1]["end"],
+            "text": "".join(word["word"] for word in words), "words": words}
+
+
+def test_short_audio_is_one_chunk():
+    assert plan_chunks(42.0, chunk_seconds=300, overlap=2) == ([(0, 42.0)], [])
+
+
+def test_chunks_overlap_and_hand_over_in_the_middle():
+    chunks, cuts = plan_chunks(700.0, chunk_seconds=300, overlap=2)
+    assert chunks == [(0, 302), (300, 302), (600, 100.0)]
+    assert cuts == [301.0, 601.0]
+
+
+def test_short_remainder_joins_the_last_chunk():
+    chunks, cuts = plan_chunks(603.0, chunk_seconds=300, overlap=2)
+    assert chunks == [(0, 302), (300, 303.0)]
+    assert cuts == [301.0]
+
+
+@pytest.mark.parametrize("duration", [1.0, 299.0, 300.0, 301.0, 599.5, 1234.5])
+def test_chunks_cover_the_audio(duration):
+    chunks, cuts = plan_chunks(duration, chunk_seconds=300, overlap=2)
+    assert chunks[0][0] == 0
+    assert sum(chunks[-1]) == pytest.approx(duration)
+    assert len(cuts) == len(chunks) - 1
+    for (start, length), (next_start, _), cut in zip(chunks, chunks[1:], cuts):
+        assert start < next_start < cut < start + length
+
+
+def test_stitch_shifts_times_and_keeps_each_chunk_range():
+    first = {"segments": [_segment(_words((" one", 0.0), (" two", 299.0), (" three", 301.5)))]}
+    second = {"segments": [_segment(_words((" three", 1.5), (" four", 5.0)))]}
+    result = stitch_results([(0, first), (300, second)], [301.0], overlap=2)
+
+    words = [word for segment in result["segments"] for word in segment["words"]]
+    assert [word["word"] for word in words] == [" one", " two", " three", " four"]
+    assert [word["start"] for word in words] == [0.0, 299.0, 301.5, 305.0]
+    assert result["text"] == " one two three four"
+    assert [segment["id"] for segment in result["segments"]] == [0, 1]
+
+
+def test_stitch_drops_words_repeated_across_the_overlap():
+    first = {"segments": [_segment(_words((" a", 298.0), (" b", 300.5)))]}
+    # The second chunk hears " b" again just after the cut, at 301.1
+    second = {"segments": [_segment(_words((" b", 1.1), (" c", 2.0)))]}
+    result = stitch_results([(0, first), (300, second)], [301.0], overlap=2)
+    assert result["text"] == " a b c"
+
+
+def test_stitch_segment_level_results():
+    first = {"segments": [{"start": 0.0, "end": 4.0, "text": " hello"},
+                          {"start": 302.0, "end": 303.0, "text": " late"}]}
+    second = {"segments": [{"start": 2.0, "end": 3.0, "text": " late"}]}
+    result = stitch_results([(0, first), (300, second)], [301.0], overlap=2)
+    assert [(segment["start"], segment["text"]) for segment in result["segments"]] == [(0.0, " hello"),
+                                                                                       (302.0, " late")]
@@ -0,0 +1,125 @@
+import os
+import time
+import fcntl
+import pytest
+from services import disk_cache
+from services.disk_cache import DiskCache
+
+
+def _age(path, seconds):
+    mtime = time.time() - seconds
+    os.utime(path, (mtime, mtime))
+
+
+def test_put_and_get(tmp_path):
+    cache = DiskCache(str(tmp_path), 1000)
+    assert cache.get_bytes("k") is None
+    cache.put_bytes("k", b"data")
+    assert cache.get_bytes("k") == b"data"
+    assert open(cache.get_path("k"), "rb").read() == b"data"
+
+    target = tmp_path / "copy"
+    assert cache.get_file("k", str(target))
+    assert target.read_bytes() == b"data"
+
+
+def test_put_returns_the_entry_path(tmp_path):
+    cache = DiskCache(str(tmp_path), 1000)
+    path = cache.put("k", lambda tmp: open(tmp, "wb").write(b"x"))
+    assert path == cache.get_path("k")
+
+
+def test_failed_write_leaves_no_entry(tmp_path):
+    cache = DiskCache(str(tmp_path), 1000)
+
+    def write(tmp):
+        raise OSError("disk full")
+
+    assert cache.put("k", write) is None
+    assert cache.get_path("k") is None
+    assert not [name for _, _, files in os.walk(tmp_path) for name in files if name.startswith(".tmp-")]
+
+
+def test_disabled(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache"), 0)
+    assert not cache.enabled
+    assert cache.put("k", lambda tmp: None) is None
+    assert cache.get_bytes("k") is None
+    assert cache.pin("k") is None
+    with cache.lock("k"):
+        pass
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path), 250)
+    for age, key in ((30, "old"), (20, "used"), (10, "new")):
+        cache.put_bytes(key, b"x" * 100)
+        _age(cache.get_path(key), age)
+    # A hit makes an entry the most recently used
+    assert cache.get_bytes("used") is not None
+
+    cache.evict()
+    assert cache.get_path("old") is None
+    assert cache.get_path("used") is not None
+    assert cache.get_path("new") is not None
+    assert not os.path.exists(cache._lock_path("old"))
+
+
+def test_put_evicts_past_the_limit(tmp_path):
+    cache = DiskCache(str(tmp_path), 250)
+    cache.put_bytes("a", b"x" * 100)
+    _age(cache.get_path("a"), 60)
+    cache.put_bytes("b", b"x" * 100)
+    cache.put_bytes("c", b"x" * 100)
+    assert cache.get_path("a") is None
+    assert cache.get_path("b") is not None
+    assert cache.get_path("c") is not None
+
+
+def test_pinned_entries_are_not_evicted(tmp_path):
+    cache = DiskCache(str(tmp_path), 1000)
+    cache.put_bytes("k", b"x" * 100)
+    with cache.lock("k"):
+        pin = cache.pin("k")
+    assert pin is not None
+    cache.max_bytes = 50
+
+    cache.evict()
+    assert cache.get_path("k") is not None
+
+    pin.close()
+    cache.evict()
+    assert cache.get_path("k") is None
+
+
+def test_locked_entries_are_not_evicted(tmp_path):
+    cache = DiskCache(str(tmp_path), 1000)
+    cache.put_bytes("k", b"x" * 100)
+    cache.max_bytes = 50
+    with cache.lock("k"):
+        cache.evict()
+        assert cache.get_path("k") is not None
+
+
+def test_lock_wait_can_stop_waiting(tmp_path, monkeypatch):
+    monkeypatch.setattr(disk_cache, "LOCK_POLL_SECONDS", 0.01)
+    cache = DiskCache(str(tmp_path), 1000)
+
+    # A lock held through another open file description blocks like one held by another process
+    holder = open(cache._lock_path("k"), "a")
+    fcntl.flock(holder, fcntl.LOCK_EX)
+    calls = []
+
+    def wait():
+        calls.append(1)
+        if len(calls) == 3:
+            raise RuntimeError("cancelled")
+
+    with pytest.raises(RuntimeError):
+        with cache.lock("k", wait=wait):
+            pass
+    assert len(calls) == 3
+
+    holder.close()
+    with cache.lock("k", wait=wait):
+        pass
@@ -0,0 +1,87 @@
+import os
+import struct
+from services.font_registry import read_font_faces, REPO_FONTS_DIR
+
+
+def _name_table(names):
+    records = b""
+    strings = b""
+    for name_id, value in names.items():
+        raw = value.encode("utf-16-be")
+        # Windows platform, Unicode BMP encoding, US English
+        records += struct.pack(">HHHHHH", 3, 1, 0x409, name_id, len(raw), len(strings))
+        strings += raw
+    return struct.pack(">HHH", 0, len(names), 6 + len(records)) + records + strings
+
+
+def _os2_table(weight, ranges, italic=False):
+    data = bytearray(64)
+    data[4:8] = struct.pack(">HH", weight, 5)
+    data[42:58] = struct.pack(">IIII", *ranges)
+    data[62:64] = struct.pack(">H", 0x01 if italic else 0)
+    return bytes(data)
+
+
+def _font(tables, base=0):
+    """An sfnt font whose table offsets start at base (non-zero inside a collection)."""
+    header = struct.pack(">IHHHH", 0x00010000, len(tables), 0, 0, 0)
+    offset = base + len(header) + 16 * len(tables)
+    directory = b""
+    body = b""
+    for tag, data in tables.items():
+        directory += struct.pack(">4sIII", tag, 0, offset + len(body), len(data))
+        body += data
+    return header + directory + body
+
+
+def test_reads_names_weight_and_scripts(tmp_path):
+    path = tmp_path / "Test-BoldItalic.ttf"
+    path.write_bytes(_font({
+        b"name": _name_table({1: "Test Sans", 2: "Bold Italic", 4: "Test Sans Bold Italic"}),
+        # Basic Latin (bit 0) and Thai (bit 24)
+        b"OS/2": _os2_table(700, (1 | 1 << 24, 0, 0, 0), italic=True),
+    }))
+    [face] = read_font_faces(str(path))
+    assert face.family == "Test Sans"
+    assert face.style == "Bold Italic"
+    assert face.bold and face.italic
+    assert face.scripts == {"latin", "thai"}
+    assert {"Test Sans", "Test Sans Bold Italic", "Test-BoldItalic"} <= face.names
+
+
+def test_typographic_family_wins(tmp_path):
+    path = tmp_path / "Light.ttf"
+    path.write_bytes(_font({
+        b"name": _name_table({1: "Test Sans Light", 2: "Regular", 16: "Test Sans", 17: "Light"}),
+        # Hangul Syllables (bit 56) and CJK Unified Ideographs (bit 59)
+        b"OS/2": _os2_table(300, (0, 1 << 24 | 1 << 27, 0, 0)),
+    }))
+    [face] = read_font_faces(str(path))
+    assert (face.family, face.style) == ("Test Sans", "Light")
+    assert not face.bold
+    assert face.scripts == {"hangul", "cjk"}
+
+
+def test_reads_every_face_of_a_collection(tmp_path):
+    header_size = 12 + 4 * 2
+    first = _font({b"name": _name_table({1: "First"})}, base=header_size)
+    second = _font({b"name": _name_table({1: "Second"})}, base=header_size + len(first))
+    path = tmp_path / "Pair.ttc"
+    path.write_bytes(b"ttcf" + struct.pack(">III", 0x00010000, 2, header_size)
+                     + struct.pack(">I", header_size + len(first)) + first + second)
+    faces = read_font_faces(str(path))
+    assert [(face.family, face.index) for face in faces] == [("First", 0), ("Second", 1)]
+    # Without an OS/2 table the defaults apply
+    assert faces[0].weight == 400 and not faces[0].scripts
+
+
+def test_fonts_without_a_family_are_skipped(tmp_path):
+    path = tmp_path / "Nameless.ttf"
+    path.write_bytes(_font({b"OS/2": _os2_table(400, (1, 0, 0, 0))}))
+    assert read_font_faces(str(path)) == []
+
+
+def test_reads_the_bundled_thai_font():
+    [face] = read_font_faces(os.path.join(REPO_FONTS_DIR, "NotoSansThai-Regular.ttf"))
+    assert face.family == "Noto Sans Thai"
+    assert "thai" in face.scripts
@@ -0,0 +1,102 @@
+import time
+import pytest
+from services import job_store
+from services.job_store import SQLiteJobStore, find_orphaned_jobs, lease, lease_expired, current_owner
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteJobStore(str(tmp_path / "jobs.db"))
+
+
+def test_put_and_get(store):
+    store.put_job("a", {"status": "queued", "data": {"x": 1}}, queue="q")
+    record = store.get_job("a")
+    assert record["status"] == "queued"
+    assert record["queue"] == "q"
+    assert record["data"] == {"x": 1}
+    assert store.get_job("missing") is None
+
+
+def test_update_compares_status(store):
+    store.put_job("a", {"status": "queued"})
+    assert not store.update_job("a", {"status": "running"}, expected_status="running")
+    assert store.get_job("a")["status"] == "queued"
+    assert store.update_job("a", {"status": "running"}, expected_status="queued")
+    assert store.get_job("a")["status"] == "running"
+    assert not store.update_job("missing", {"status": "running"})
+
+
+def test_update_compares_owner(store):
+    store.put_job("a", {"status": "queued", "owner": "one"})
+    assert not store.update_job("a", {"owner": "three"}, expected_owner="two")
+    assert store.update_job("a", {"owner": "two"}, expected_owner="one")
+    assert store.get_job("a")["owner"] == "two"
+
+
+def test_list_filters_queue_and_status(store):
+    store.put_job("a", {"status": "queued"}, queue="q")
+    store.put_job("b", {"status": "done"}, queue="q")
+    store.put_job("c", {"status": "queued"}, queue="other")
+    assert {r["job_id"] for r in store.list_jobs(queue="q")} == {"a", "b"}
+    assert [r["job_id"] for r in store.list_jobs(queue="q", statuses=["queued"])] == ["a"]
+
+
+def test_purge_finished(store):
+    store.put_job("a", {"status": "done"})
+    store.put_job("b", {"status": "queued"})
+    assert store.purge_finished(-1, ["done"]) == 1
+    assert store.get_job("a") is None
+    assert store.get_job("b") is not None
+
+
+def test_lease_expiry():
+    now = time.time()
+    assert not lease_expired({"owner": "a", "lease_expires_at": now + 10}, now)
+    assert lease_expired({"owner": "a", "lease_expires_at": now - 1}, now)
+    assert lease_expired({"lease_expires_at": now + 10}, now)
+
+
+def test_lease_falls_back_to_last_update(monkeypatch):
+    monkeypatch.setattr(job_store, "JOB_LEASE_SECONDS", 60)
+    now = time.time()
+    assert not lease_expired({"owner": "a", "updated_at": now - 30}, now)
+    assert lease_expired({"owner": "a", "updated_at": now - 90}, now)
+
+
+def test_owner_is_unique_per_process():
+    owner = current_owner()
+    assert owner == current_owner()
+    assert owner.startswith(f"{job_store.HOSTNAME}:")
+
+
+def test_find_orphaned_jobs(store, monkeypatch):
+    monkeypatch.setattr(job_store, "JOB_LEASE_SECONDS", 60)
+    store.put_job("alive", dict(lease("other"), status="queued"), queue="q")
+    store.put_job("expired", {"status": "queued", "owner": "other", "lease_expires_at": time.time() - 1}, queue="q")
+    store.put_job("own", {"status": "queued", "owner": current_owner(), "lease_expires_at": time.time() - 1},
+                  queue="q")
+    store.put_job("finished", {"status": "done", "owner": "other", "lease_expires_at": time.time() - 1}, queue="q")
+    assert [r["job_id"] for r in find_orphaned_jobs(store, "q", ["queued"])] == ["expired"]
+
+
+def test_recover_takes_over_once(store):
+    store.put_job("a", {"status": "running", "owner": "dead", "lease_expires_at": time.time() - 1}, queue="q")
+    record = find_orphaned_jobs(store, "q", ["running"])[0]
+    # Two workers recovering the same job: only the first compare-and-set wins
+    assert store.update_job("a", dict(lease("one"), status="queued"), expected_owner=record["owner"])
+    assert not store.update_job("a", dict(lease("two"), status="queued"), expected_owner=record["owner"])
+    recovered = store.get_job("a")
+    assert recovered["owner"] == "one"
+    assert not lease_expired(recovered)
+
+
+def test_renew_leases(store, monkeypatch):
+    monkeypatch.setattr(job_store, "JOB_LEASE_SECONDS", 60)
+    store.put_job("mine", {"status": "queued", "owner": "me", "lease_expires_at": 0}, queue="q")
+    store.put_job("theirs", {"status": "queued", "owner": "them", "lease_expires_at": 0}, queue="q")
+    store.put_job("done", {"status": "done", "owner": "me", "lease_expires_at": 0}, queue="q")
+    assert store.renew_leases("me", "q", ["queued"]) == 1
+    assert store.get_job("mine")["lease_expires_at"] > time.time()
+    assert store.get_job("theirs")["lease_expires_at"] == 0
+    assert store.get_job("done")["lease_expires_at"] == 0
@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("srt")
+
+from services.v1.media.openai_transcribe import merge_chunk_results  # noqa: E402
+
+
+def test_merge_shifts_segments_and_words():
+    results = [
+        {"text": " Hello there. ", "language": "thai", "duration": 10.0,
+         "segments": [{"id": 0, "start": 0.0, "end": 4.0, "text": " Hello there."}],
+         "words": [{"word": "Hello", "start": 0.0, "end": 1.0}]},
+        {"text": "General Kenobi.", "language": "thai", "duration": 8.0,
+         "segments": [{"id": 0, "start": 1.0, "end": 3.0, "text": " General Kenobi.",
+                       "words": [{"word": "General", "start": 1.0, "end": 2.0}]}],
+         "words": [{"word": "General", "start": 1.0, "end": 2.0}]},
+    ]
+    merged = merge_chunk_results(results, [0.0, 10.0])
+
+    assert merged["text"] == "Hello there. General Kenobi."
+    assert merged["language"] == "thai"
+    assert [(s["id"], s["start"], s["end"]) for s in merged["segments"]] == [(0, 0.0, 4.0), (1, 11.0, 13.0)]
+    assert merged["segments"][1]["words"] == [{"word": "General", "start": 11.0, "end": 12.0}]
+    assert [(w["word"], w["start"]) for w in merged["words"]] == [("Hello", 0.0), ("General", 11.0)]
+    # The duration of the audio sent; the caller replaces it with the media's
+    assert merged["duration"] == 18.0
+
+
+def test_merge_leaves_the_inputs_unchanged():
+    results = [{"text": "a", "segments": [{"start": 1.0, "end": 2.0, "text": "a"}]},
+               {"text": "b", "segments": [{"start": 1.0, "end": 2.0, "text": "b"}]}]
+    merge_chunk_results(results, [0.0, 5.0])
+    assert results[1]["segments"][0]["start"] == 1.0
+
+
+def test_merge_plain_json_responses():
+    merged = merge_chunk_results([{"text": "one"}, {"text": "  "}, {"text": "two"}], [0.0, 5.0, 10.0])
+    assert merged == {"text": "one two"}
+
@@ -0,0 +1,70 @@
+from datetime import timedelta
+import pytest
+
+srt = pytest.importorskip("srt")
+
+from services.v1.media.thai_aligner import align_characters, align_thai_script, clean_hallucinations  # noqa: E402
+
+
+def _subtitles(*texts):
+    return [srt.Subtitle(index=i + 1, start=timedelta(seconds=i), end=timedelta(seconds=i + 1), content=text)
+            for i, text in enumerate(texts)]
+
+
+SCRIPT = ("สวัสดีครับ วันนี้เราจะมาพูดถึงการทำอาหารไทย "
+          "เริ่มจากต้มยำกุ้งที่ทุกคนรู้จัก แล้วต่อด้วยผัดไทยที่ทำง่ายมาก")
+
+
+def test_align_characters_is_monotonic():
+    matches = align_characters("abcdefghij", "abcxyzghij")
+    assert matches == sorted(matches)
+    assert [s for _, s in matches] == sorted(s for _, s in matches)
+    assert (0, 0) in matches and (9, 9) in matches
+    # The replaced middle is not matched
+    assert not any(t in (3, 4, 5) for t, _ in matches)
+
+
+def test_subtitles_get_the_script_text_and_keep_their_timing():
+    subtitles = _subtitles("สวัสดีครับ วันนี้เราจะมาพูดถึง", "การทำอาหารไทย เริ่มจากต้มยำกุ้ง",
+                           "ที่ทุกคนรู้จัก แล้วต่อด้วยผัดไทยที่ทำง่ายมาก")
+    aligned = align_thai_script(SCRIPT, subtitles)
+    assert [sub.start for sub in aligned] == [sub.start for sub in subtitles]
+    assert [sub.end for sub in aligned] == [sub.end for sub in subtitles]
+    assert "".join(sub.content for sub in aligned).replace(" ", "") == SCRIPT.replace(" ", "")
+    assert aligned[0].content.startswith("สวัสดีครับ")
+    assert aligned[-1].content.endswith("ทำง่ายมาก")
+
+
+def test_transcription_errors_are_replaced_by_the_script():
+    subtitles = _subtitles("สวัสดีคับ วันนี้เราจะมาพูดถึงการทำอาหารไท",
+                           "เริ่มจากต้มยำกุ้งที่ทุกคนรู้จัก แล้วต่อด้วยผัดไทยที่ทำง่ายมาก")
+    aligned = align_thai_script(SCRIPT, subtitles)
+    assert "สวัสดีครับ" in aligned[0].content
+    assert "อาหารไทย" in aligned[0].content
+    assert aligned[1].content.startswith("เริ่มจาก")
+
+
+def test_unrelated_script_keeps_the_transcription_without_hallucinations():
+    subtitles = _subtitles("hello everyone and", "minecraft is fun")
+    aligned = align_thai_script(SCRIPT, subtitles)
+    assert [sub.content for sub in aligned] == ["hello everyone ", " is fun"]
+    assert [sub.start for sub in aligned] == [sub.start for sub in subtitles]
+
+
+def test_unrelated_script_matches_subtitles_by_their_words():
+    script = "zz " * 30 + "the quick brown fox jumps"
+    subtitles = _subtitles("a quick brown fox", "nothing else in this video matches any of it")
+    aligned = align_thai_script(script, subtitles)
+    assert aligned[0].content == "quick brown fox"
+    assert aligned[1].content == "nothing else in this video matches any of it"
+
+
+def test_clean_hallucinations():
+    assert clean_hallucinations("play minecraft now and ") == "play  now "
+    assert clean_hallucinations("band plays") == "band plays"
+
+
+def test_empty_inputs():
+    subtitles = _subtitles("สวัสดี")
+    assert [sub.content for sub in align_thai_script("", subtitles)] == ["สวัสดี"]
+    assert align_thai_script(SCRIPT, []) == []
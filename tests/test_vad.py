@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from services.v1.media.vad import SpeechMap, detect_speech, split_at_silence
+
+SAMPLE_RATE = 16000
+
+
+def _audio(*parts):
+    """Concatenate (seconds, amplitude) parts of a 440 Hz tone; amplitude 0 is silence."""
+    pieces = []
+    for seconds, amplitude in parts:
+        t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+        pieces.append((amplitude * np.sin(2 * np.pi * 440 * t)).astype(np.int16))
+    return np.concatenate(pieces)
+
+
+def test_empty_map_is_the_identity():
+    speech_map = SpeechMap()
+    assert speech_map.to_original([1.0, 2.5]) == [1.0, 2.5]
+    segments = [{"start": 1.0, "end": 2.0}]
+    assert speech_map.remap_segments(segments) == [{"start": 1.0, "end": 2.0}]
+
+
+def test_times_map_into_their_region():
+    speech_map = SpeechMap([(10.0, 15.0), (30.0, 40.0)])
+    assert speech_map.to_original([0.0, 2.0, 6.0, 15.0]) == [10.0, 12.0, 31.0, 40.0]
+    assert speech_map.to_original(4.0) == 14.0
+
+
+def test_join_belongs_to_the_next_region_unless_it_ends_a_segment():
+    speech_map = SpeechMap([(10.0, 15.0), (30.0, 40.0)])
+    assert speech_map.to_original([5.0]) == [30.0]
+    assert speech_map.to_original([5.0], is_end=True) == [15.0]
+
+
+def test_remap_segments_and_words_in_place():
+    speech_map = SpeechMap([(10.0, 15.0), (30.0, 40.0)])
+    segments = [
+        {"start": 1.0, "end": 5.0, "text": "a", "words": [{"start": 1.0, "end": 2.0}, {"start": 4.5, "end": 5.0}]},
+        {"start": 5.0, "end": 7.0, "text": "b"},
+        {"start": None, "end": None, "text": "untimed"},
+    ]
+    assert speech_map.remap_segments(segments) is segments
+    assert (segments[0]["start"], segments[0]["end"]) == (11.0, 15.0)
+    assert [(w["start"], w["end"]) for w in segments[0]["words"]] == [(11.0, 12.0), (14.5, 15.0)]
+    assert (segments[1]["start"], segments[1]["end"]) == (30.0, 32.0)
+    assert (segments[2]["start"], segments[2]["end"]) == (10.0, 10.0)
+
+
+def test_end_never_precedes_start():
+    speech_map = SpeechMap([(10.0, 15.0), (30.0, 40.0)])
+    # A zero-length segment at the join would otherwise end in the previous region
+    segments = speech_map.remap_segments([{"start": 5.0, "end": 5.0}])
+    assert segments[0]["start"] <= segments[0]["end"]
+
+
+def test_detect_speech_finds_the_tones():
+    samples = _audio((2, 0), (1, 8000), (3, 0), (1, 8000), (2, 0))
+    regions = detect_speech(samples, SAMPLE_RATE, padding=0.1, min_silence=1.0)
+    assert len(regions) == 2
+    assert regions[0] == pytest.approx((1.9, 3.1), abs=0.05)
+    assert regions[1] == pytest.approx((5.9, 7.1), abs=0.05)
+
+
+def test_detect_speech_joins_short_pauses():
+    samples = _audio((1, 0), (1, 8000), (0.5, 0), (1, 8000), (1, 0))
+    assert len(detect_speech(samples, SAMPLE_RATE, padding=0.1, min_silence=1.0)) == 1
+
+
+def test_detect_speech_in_silence():
+    assert detect_speech(np.zeros(SAMPLE_RATE * 3, dtype=np.int16), SAMPLE_RATE) == []
+    assert detect_speech(np.zeros(0, dtype=np.int16), SAMPLE_RATE) == []
+
+
+def test_split_at_silence_cuts_in_the_pauses():
+    samples = _audio((8, 8000), (1, 0), (8, 8000), (1, 0), (5, 8000))
+    cuts = split_at_silence(samples, 10, search_seconds=3, sample_rate=SAMPLE_RATE)
+    assert len(cuts) == 2
+    assert 8.0 <= cuts[0] < 9.0
+    assert 17.0 <= cuts[1] < 18.0